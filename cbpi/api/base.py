@@ -8,6 +8,10 @@ import logging
 
 class CBPiBase(metaclass=ABCMeta):
 
+    @property
+    def clock(self):
+        return self.cbpi.clock
+
     def get_static_config_value(self,name,default):
         return self.cbpi.static_config.get(name, default)
 
@@ -51,6 +55,57 @@ class CBPiBase(metaclass=ABCMeta):
         
         return self.cbpi.sensor.get_sensor_value(id)
 
+    def get_sensor_reading(self, id, max_age=None):
+        '''
+        Last value of a sensor with its age and quality (good, stale or missing)
+        '''
+        return self.cbpi.sensor.get_reading(id, max_age)
+
+    async def wait_for_sensor_value(self, id, max_age=None, timeout=None):
+        '''
+        Wait until the sensor pushed a value which is not stale and return it
+        '''
+        reading = await self.cbpi.sensor.wait_for_fresh(id, max_age, timeout)
+        return reading.value
+
+    async def wait_for_sensor(self, id, actors=(), timeout=None):
+        '''
+        Wait until the sensor delivers a value. If it doesn't deliver within the timeout a warning is shown and
+        the actors are switched off, then it keeps waiting.
+
+        :param id: sensor id
+        :param actors: ids of the actors to switch off, None entries are ignored
+        :param timeout: seconds, static config sensor_timeout (default 60) if None
+        :return: value
+        '''
+        from cbpi.api.dataclasses import NotificationType
+        timeout = float(self.get_static_config_value("sensor_timeout", 60)) if timeout is None else timeout
+        warned = False
+        while True:
+            try:
+                value = await self.wait_for_sensor_value(id, timeout=timeout)
+                if value is not None:
+                    return value
+                # the sensor doesn't exist
+                await self.clock.sleep(timeout)
+            except asyncio.TimeoutError:
+                pass
+            for actor in actors:
+                if actor is not None:
+                    await self.actor_off(actor)
+            if warned is False:
+                warned = True
+                sensor = self.get_sensor(id)
+                logging.warning("No value from sensor {} within {} seconds".format(id, timeout))
+                self.cbpi.notify("Sensor", "No value from sensor {} - actors switched off".format(sensor.name if sensor is not None else id), NotificationType.WARNING)
+
+    def get_good_sensor_value(self, id):
+        '''
+        :return: value of the sensor or None if it's missing or stale
+        '''
+        reading = self.get_sensor_reading(id)
+        return reading.value if reading.quality == "good" else None
+
     def get_actor(self,id):
         return self.cbpi.actor.find_by_id(id)
 
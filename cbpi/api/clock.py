@@ -0,0 +1,118 @@
+import asyncio
+import heapq
+import itertools
+import time
+
+__all__ = ["Clock", "VirtualClock", "create_clock"]
+
+
+class Clock(object):
+    '''
+    Time source of CraftBeerPi. Durations are measured with monotonic time, so they are not affected by
+    changes of the system time. time() is only meant for display, e.g. estimated completion times.
+    '''
+
+    def time(self):
+        return time.time()
+
+    def monotonic(self):
+        return time.monotonic()
+
+    async def sleep(self, seconds):
+        await asyncio.sleep(max(seconds, 0))
+
+    async def wait_for(self, awaitable, timeout):
+        '''
+        Like asyncio.wait_for with the timeout in seconds of this clock
+        '''
+        return await asyncio.wait_for(awaitable, timeout)
+
+
+class VirtualClock(Clock):
+    '''
+    Clock for simulations and tests.
+    With a speed the time runs that many times faster than real time.
+    Without a speed the time stands still until advance is called, so long schedules can be replayed deterministically.
+
+    clock = VirtualClock()
+    ...
+    await clock.advance(14 * 86400)
+    '''
+
+    def __init__(self, speed=None, start=None):
+        self.speed = float(speed) if speed else None
+        # unix time of virtual time 0
+        self.start = time.time() if start is None else start
+        self.offset = 0
+        self.real_start = time.monotonic()
+        self.sleepers = []
+        self.counter = itertools.count()
+
+    def monotonic(self):
+        if self.speed is None:
+            return self.offset
+        return self.offset + (time.monotonic() - self.real_start) * self.speed
+
+    def time(self):
+        return self.start + self.monotonic()
+
+    async def sleep(self, seconds):
+        if self.speed is not None:
+            await asyncio.sleep(max(seconds, 0) / self.speed)
+            return
+        if seconds <= 0:
+            await asyncio.sleep(0)
+            return
+        future = asyncio.get_running_loop().create_future()
+        heapq.heappush(self.sleepers, (self.monotonic() + seconds, next(self.counter), future))
+        await future
+
+    async def wait_for(self, awaitable, timeout):
+        if timeout is None:
+            return await awaitable
+        if self.speed is not None:
+            return await asyncio.wait_for(awaitable, timeout / self.speed)
+        task = asyncio.ensure_future(awaitable)
+        sleeper = asyncio.ensure_future(self.sleep(timeout))
+        try:
+            await asyncio.wait([task, sleeper], return_when=asyncio.FIRST_COMPLETED)
+        finally:
+            sleeper.cancel()
+        if task.done():
+            return task.result()
+        task.cancel()
+        raise asyncio.TimeoutError()
+
+    async def advance(self, seconds):
+        '''
+        Move the time forward. Sleepers are woken in order of their deadline and get the chance to run
+        before the time moves on.
+
+        :param seconds: virtual seconds
+        :return: None
+        '''
+        target = self.monotonic() + seconds
+        await self._settle()
+        while len(self.sleepers) > 0 and self.sleepers[0][0] <= target:
+            deadline, _, future = heapq.heappop(self.sleepers)
+            if future.done():
+                continue
+            self.offset = max(self.offset, deadline)
+            future.set_result(None)
+            await self._settle()
+        self.offset = max(self.offset, target)
+        await self._settle()
+
+    async def _settle(self, rounds=20):
+        # let woken tasks run until they wait again
+        for i in range(rounds):
+            await asyncio.sleep(0)
+
+
+def create_clock(static_config):
+    '''
+    Clock from config.yaml: clock: real (default) or virtual, clock_speed: speed of the virtual clock
+    '''
+    if str(static_config.get("clock", "real")).lower() == "virtual":
+        return VirtualClock(speed=static_config.get("clock_speed", None))
+    return Clock()
@@ -2,94 +2,237 @@ from cbpi.api.config import ConfigType
 from enum import Enum
 from typing import Any
 from cbpi.api.step import StepState
-from dataclasses import dataclass, field
+from dataclasses import dataclass, field, fields
 from typing import List
+import logging
+import time
 
-class Props:
+def _to_int(value):
+    return value if isinstance(value, int) else int(float(value))
+
+
+class Props(dict):
+    '''
+    Properties of actors, sensors, kettles, steps and fermenters.
+    Values can be read as attribute (None if missing), by key or with get. Props is a dict, so key access runs
+    without any python level dispatch.
+
+    Attributes resolve to the methods first. A property named like a dict method or a helper (keys, values, items,
+    update, copy, pop, float, int, ...) has to be read by key, props["values"] instead of props.values.
+    '''
+    __slots__ = ("_dict",)
 
     def __init__(self, data={}):
-        super(Props, self).__setattr__('__data__', {})
-        for key, value in data.items():
-            self.__setattr__(key, value)
+        super(Props, self).__init__(data)
+        shadowed = [key for key in self if isinstance(key, str) and hasattr(Props, key)]
+        if len(shadowed) > 0:
+            logging.warning("Props {} can't be read as attribute, use props[name]".format(", ".join(shadowed)))
+        # serialized dict, reset on every change
+        object.__setattr__(self, "_dict", None)
+
     def __getattr__(self, name):
-        return self.__data__.get(name)
+        # only called if there is no regular attribute
+        if name.startswith("__"):
+            raise AttributeError(name)
+        return dict.get(self, name)
     
     def __setattr__(self, name, value):
-        self.__data__[name] = value
-
-    def __str__(self):
-        return self.__data__.__str__()
+        self[name] = value
 
+    def __reduce__(self):
+        # copy and pickle only the values, not the caches
+        return (Props, (dict(self),))
 
-    def __getitem__(self, key):
-        return self.__data__[key]
+    def _changed(self):
+        object.__setattr__(self, "_dict", None)
 
     def __setitem__(self, key, value):
-        self.__data__[key] = value
+        dict.__setitem__(self, key, value)
+        self._changed()
+
+    def __delitem__(self, key):
+        dict.__delitem__(self, key)
+        self._changed()
 
-    def __contains__(self, key):
-        return key in self.__data__
+    def update(self, *args, **kwargs):
+        dict.update(self, *args, **kwargs)
+        self._changed()
+
+    def __ior__(self, other):
+        dict.__ior__(self, other)
+        self._changed()
+        return self
+
+    def setdefault(self, key, default=None):
+        self._changed()
+        return dict.setdefault(self, key, default)
+
+    def pop(self, *args):
+        self._changed()
+        return dict.pop(self, *args)
+
+    def popitem(self):
+        self._changed()
+        return dict.popitem(self)
+
+    def clear(self):
+        dict.clear(self)
+        self._changed()
 
     def get(self, key, d=None):
-        if key in self.__data__ and self.__data__[key] != "": 
-            return self.__data__[key]
-        else:
-            return d
-    
+        value = dict.get(self, key, d)
+        return d if value == "" else value
+
+    def float(self, key, default=None):
+        '''
+        :param key: property name
+        :param default: returned if the property is missing, empty or not a number
+        :return: float
+        '''
+        try:
+            return float(self.get(key, default))
+        except (TypeError, ValueError):
+            return default
+
+    def int(self, key, default=None):
+        '''
+        Value as int. Decimal values like "65.5" are truncated.
+        '''
+        try:
+            return _to_int(self.get(key, default))
+        except (TypeError, ValueError):
+            return default
 
     def to_dict(self):
+        '''
+        The result is cached and shared, it must not be modified.
+        Props containing nested Props or lists are serialized on every call because changes of the nested values are not tracked.
+        '''
+        if self._dict is not None:
+            return self._dict
+
+        nested = False
         def parse_object(value):
+            nonlocal nested
             if isinstance(value, Props):
+                nested = True
                 return value.to_dict()
             elif isinstance(value, list):
+                nested = True
                 return list(map(parse_object, value))
             else:
                 return value
 
-        return dict((key, parse_object(value)) for (key, value) in self.__data__.items())
+        result = dict((key, parse_object(value)) for (key, value) in self.items())
+        if nested is False:
+            object.__setattr__(self, "_dict", result)
+        return result
 
 
+def slotted(cls):
+    '''
+    Recreate a dataclass with __slots__ for its fields, like @dataclass(slots=True) which requires python 3.10
+    '''
+    cls_dict = dict(cls.__dict__)
+    field_names = tuple(f.name for f in fields(cls))
+    cls_dict["__slots__"] = field_names
+    for name in field_names:
+        # defaults are kept by the generated __init__
+        cls_dict.pop(name, None)
+    cls_dict.pop("__dict__", None)
+    cls_dict.pop("__weakref__", None)
+    return type(cls)(cls.__name__, cls.__bases__, cls_dict)
+
+
+class CachedDict:
+    '''
+    Caches the result of to_dict for the entity dataclasses.
+    The cache is dropped whenever a field is assigned. Values which are changed elsewhere (props, instance state, steps)
+    are passed as key and compared on every call.
+    '''
+
+    __slots__ = ()
+
+    def __setattr__(self, name, value):
+        object.__setattr__(self, name, value)
+        if name != "_cache":
+            object.__setattr__(self, "_cache", None)
+
+    def _cached_dict(self, key, build):
+        cache = self._cache
+        if cache is not None and len(cache[0]) == len(key) and all(a is b or a == b for a, b in zip(cache[0], key)):
+            return cache[1]
+        result = build()
+        object.__setattr__(self, "_cache", (key, result))
+        return result
+
+
+@slotted
 @dataclass
-class Actor:
+class Actor(CachedDict):
     id: str = None
     name: str = None
-    props: Props = Props()
+    props: Props = field(default_factory=Props)
     state: bool = False
     power: int = 100
     type: str = None
     instance: str = None
+    _cache: Any = field(default=None, init=False, repr=False, compare=False)
 
     def __str__(self):
         return "name={} props={}, state={}, type={}, power={}".format(self.name, self.props, self.state, self.type, self.power)
     def to_dict(self):
-        return dict(id=self.id, name=self.name, type=self.type, props=self.props.to_dict(), state=self.instance.get_state(), power=self.power)
+        props = self.props.to_dict()
+        state = self.instance.get_state()
+        return self._cached_dict((props, state), lambda: dict(id=self.id, name=self.name, type=self.type, props=props, state=state, power=self.power))
 
 
+@slotted
 @dataclass
-class Sensor:
+class Sensor(CachedDict):
     id: str = None
     name: str = None
-    props: Props = Props()
+    props: Props = field(default_factory=Props)
     state: bool = False
     type: str = None
     instance: str = None
+    _cache: Any = field(default=None, init=False, repr=False, compare=False)
 
     def __str__(self):
         return "name={} props={}, state={}".format(self.name, self.props, self.state)
     def to_dict(self):
-        return dict(id=self.id, name=self.name, type=self.type, props=self.props.to_dict(), state=self.state)
+        props = self.props.to_dict()
+        return self._cached_dict((props,), lambda: dict(id=self.id, name=self.name, type=self.type, props=props, state=self.state))
 
 @dataclass
-class Kettle:
+class SensorReading:
+    value: Any = None
+    # clock.monotonic() of the update
+    timestamp: float = None
+    # good, stale or missing
+    quality: str = "missing"
+
+    def age(self, now=None):
+        if self.timestamp is None:
+            return None
+        return (time.monotonic() if now is None else now) - self.timestamp
+
+    def to_dict(self, now=None):
+        return dict(value=self.value, age=self.age(now), quality=self.quality)
+
+@slotted
+@dataclass
+class Kettle(CachedDict):
     id: str = None
     name: str = None
-    props: Props = Props()
+    props: Props = field(default_factory=Props)
     instance: str = None
     agitator: Actor = None
     heater: Actor = None
     sensor: Sensor = None
     type: str = None
     target_temp: int = 0
+    _cache: Any = field(default=None, init=False, repr=False, compare=False)
 
     def __str__(self):
         return "name={} props={} temp={}".format(self.name, self.props, self.target_temp)
@@ -101,28 +244,33 @@ class Kettle:
 
         else:
             state = False
-        return dict(id=self.id, name=self.name, state=state,  target_temp=self.target_temp, heater=self.heater, agitator=self.agitator, sensor=self.sensor, type=self.type, props=self.props.to_dict())
+        props = self.props.to_dict()
+        return self._cached_dict((props, state), lambda: dict(id=self.id, name=self.name, state=state,  target_temp=self.target_temp, heater=self.heater, agitator=self.agitator, sensor=self.sensor, type=self.type, props=props))
 
 
 
+@slotted
 @dataclass
-class Step:
+class Step(CachedDict):
     id: str = None
     name: str = None
-    props: Props = Props()
+    props: Props = field(default_factory=Props)
     type: str = None
     status: StepState = StepState.INITIAL
     instance: str = None
+    _cache: Any = field(default=None, init=False, repr=False, compare=False)
 
     def __str__(self):
         return "name={} props={}, type={}, instance={}".format(self.name, self.props, self.type, self.instance)
     def to_dict(self):
 
         msg = self.instance.summary if self.instance is not None else ""
-        return dict(id=self.id, name=self.name, state_text=msg, type=self.type, status=self.status.value, props=self.props.to_dict())
+        props = self.props.to_dict()
+        return self._cached_dict((props, msg), lambda: dict(id=self.id, name=self.name, state_text=msg, type=self.type, status=self.status.value, props=props))
 
+@slotted
 @dataclass
-class Fermenter:
+class Fermenter(CachedDict):
     id: str = None
     name: str = None
     sensor: Sensor = None
@@ -132,13 +280,13 @@ class Fermenter:
     valve: Actor = None
     brewname: str = None
     description : str = None
-    props: Props = Props()
+    props: Props = field(default_factory=Props)
     target_temp: float = 0 
     target_pressure: float = 0
     type: str = None
     steps: List[Step]= field(default_factory=list)
     instance: str = None
-
+    _cache: Any = field(default=None, init=False, repr=False, compare=False)
 
     def __str__(self):
         return "name={} props={} temp={}".format(self.name, self.props, self.target_temp, self.target_pressure)
@@ -153,26 +301,31 @@ class Fermenter:
             state = False
 
         steps = list(map(lambda item: item.to_dict(), self.steps))
-        return dict(id=self.id, name=self.name, state=state, sensor=self.sensor, pressure_sensor=self.pressure_sensor, heater=self.heater, cooler=self.cooler, valve=self.valve, brewname=self.brewname, description=self.description, props=self.props.to_dict() if self.props is not None else None, target_temp=self.target_temp, target_pressure=self.target_pressure, type=self.type, steps=steps)
+        props = self.props.to_dict() if self.props is not None else None
+        # the step dicts are cached as well, the list is only equal if no step was changed
+        return self._cached_dict((props, state, steps), lambda: dict(id=self.id, name=self.name, state=state, sensor=self.sensor, pressure_sensor=self.pressure_sensor, heater=self.heater, cooler=self.cooler, valve=self.valve, brewname=self.brewname, description=self.description, props=props, target_temp=self.target_temp, target_pressure=self.target_pressure, type=self.type, steps=steps))
 
 
+@slotted
 @dataclass
-class FermenterStep:
+class FermenterStep(CachedDict):
     id: str = None
     name: str = None
     fermenter: Fermenter = None
-    props: Props = Props()
+    props: Props = field(default_factory=Props)
     type: str = None
     status: StepState = StepState.INITIAL
     endtime: int = 0 # endtime if step is active and timer is running
     instance: str = None
     step: dict = None 
+    _cache: Any = field(default=None, init=False, repr=False, compare=False)
 
     def __str__(self):
         return "name={} props={}, type={}, instance={}".format(self.name, self.props, self.type, self.instance)
     def to_dict(self):
         msg = self.instance.summary if self.instance is not None else ""
-        return dict(id=self.id, name=self.name, state_text=msg, type=self.type, status=self.status.value, endtime=self.endtime, props=self.props.to_dict())
+        props = self.props.to_dict()
+        return self._cached_dict((props, msg), lambda: dict(id=self.id, name=self.name, state_text=msg, type=self.type, status=self.status.value, endtime=self.endtime, props=props))
 
 
 
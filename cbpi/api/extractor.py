@@ -0,0 +1,91 @@
+import json
+import re
+
+try:
+    import orjson
+    _loads = orjson.loads
+    _decode_error = (orjson.JSONDecodeError, ValueError)
+except ImportError:
+    _loads = json.loads
+    _decode_error = (ValueError,)
+
+__all__ = ["PayloadExtractor"]
+
+_token = re.compile(r"\[(\d+)\]|\[['\"]([^'\"]*)['\"]\]|([^.\[\]]+)")
+
+
+class PayloadExtractor(object):
+    '''
+    Extracts a numeric value from a message payload.
+    The path is compiled once, e.g. "StatusSNS.DS18B20[0].Temperature", "$.values.1" or "['key.with.dot']".
+    Without a path plain numbers are read without parsing the payload as json.
+    orjson is used for parsing if it is installed.
+    '''
+
+    def __init__(self, path=None):
+        self.path = path
+        self.steps = self.compile(path)
+
+    @classmethod
+    def compile(cls, path):
+        if path is None:
+            return ()
+        path = path.strip()
+        if path.startswith("$"):
+            path = path[1:]
+        steps = []
+        pos = 0
+        while pos < len(path):
+            if path[pos] == ".":
+                pos += 1
+                continue
+            match = _token.match(path, pos)
+            if match is None:
+                raise ValueError("Invalid payload path {} at position {}".format(path, pos))
+            index, quoted, key = match.groups()
+            if index is not None:
+                steps.append(int(index))
+            elif quoted is not None:
+                steps.append(quoted)
+            elif key.isdigit():
+                # dotted index like values.1 - works for lists and dicts with numeric keys
+                steps.append((key, int(key)))
+            else:
+                steps.append(key)
+            pos = match.end()
+        return tuple(steps)
+
+    def extract(self, payload):
+        '''
+        :param payload: str or bytes
+        :return: float or None if the value is missing or not numeric
+        '''
+        if len(self.steps) == 0:
+            try:
+                return float(payload)
+            except (TypeError, ValueError):
+                pass
+        try:
+            value = _loads(payload)
+        except _decode_error:
+            return None
+        for step in self.steps:
+            try:
+                if isinstance(step, tuple):
+                    value = value[step[1]] if isinstance(value, list) else value[step[0]]
+                else:
+                    value = value[step]
+            except (KeyError, IndexError, TypeError):
+                return None
+        return self.coerce(value)
+
+    @staticmethod
+    def coerce(value):
+        if isinstance(value, (int, float)):
+            return float(value)
+        if isinstance(value, str):
+            try:
+                return float(value)
+            except ValueError:
+                return None
+        return None
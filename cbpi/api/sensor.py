@@ -8,6 +8,9 @@ from cbpi.api.base import CBPiBase
 
 class CBPiSensor(CBPiBase, metaclass=ABCMeta):
 
+    # seconds between two calls of read by the sensor scheduler, None if the sensor runs its own loop
+    sampling_interval = None
+
     def __init__(self, cbpi, id, props):
         self.cbpi = cbpi
         self.id = id
@@ -16,6 +19,7 @@ class CBPiSensor(CBPiBase, metaclass=ABCMeta):
         self.data_logger = None
         self.state = False
         self.running = False
+        self.stopped = asyncio.Event()
 
     def init(self):
         pass
@@ -32,9 +36,35 @@ class CBPiSensor(CBPiBase, metaclass=ABCMeta):
     def get_unit(self):
         pass
 
-    def push_update(self, value, mqtt = True):
+    def expected_interval(self):
+        '''
+        Seconds between two values of the sensor. Sensors which push their values themselves override this,
+        e.g. with their timeout. Values of sensors without a known interval are never stale.
+
+        :return: seconds or None if unknown
+        '''
+        return self.sampling_interval
+
+    def publish(self, value):
+        '''
+        Log and push a new value after the filters of the sensor
+
+        :param value: raw value
+        :return: filtered value
+        '''
+        value = self.cbpi.sensor.filter_value(self.id, value)
         try:
-            self.cbpi.ws.send(dict(topic="sensorstate", id=self.id, value=value))
+            self.log_data(value)
+        except Exception as e:
+            logging.error("Failed to log sensor value {} - {}".format(self.id, e))
+        self.push_update(value)
+        return value
+
+    def push_update(self, value, mqtt = True, ws = True):
+        try:
+            self.cbpi.sensor.set_reading(self.id, value)
+            if ws:
+                self.cbpi.ws.send(dict(topic="sensorstate", id=self.id, value=value))
             if mqtt:
                 self.cbpi.push_update("cbpi/sensordata/{}".format(self.id), dict(id=self.id, value=value), retain=True)
 #            self.cbpi.push_update("cbpi/sensor/{}/udpate".format(self.id), dict(id=self.id, value=value), retain=True)
@@ -53,8 +83,17 @@ class CBPiSensor(CBPiBase, metaclass=ABCMeta):
     async def on_stop(self):
         pass
 
+    async def read(self):
+        '''
+        Sample the sensor. Called by the sensor scheduler every sampling_interval seconds.
+
+        :return: value to log and push or None
+        '''
+        return None
+
     async def run(self):
-        pass
+        # scheduled and push driven sensors have no loop of their own
+        await self.stopped.wait()
     
     async def _run(self):
 
@@ -198,7 +198,9 @@ class CBPiFermentationStep(CBPiBase):
         try:
             await self.on_start()
             await self.run()
-            self.cancel_reason = StepResult.DONE
+            if self.running == True:
+                # otherwise next or stop set the reason
+                self.cancel_reason = StepResult.DONE
         except asyncio.CancelledError as e:
             pass
         finally:
@@ -1,50 +1,180 @@
-import time
 import asyncio
+import heapq
+import itertools
+import logging
 import math
+import weakref
+
+from cbpi.api.clock import Clock
+
+logger = logging.getLogger(__name__)
+
+
+class TimerService(object):
+    '''
+    Runs all timers of a clock with one task.
+    Deadlines are kept in a heap, so starting, stopping and extending a timer costs O(log n).
+    Stopped or extended timers leave their old entry in the heap, it's dropped when it comes up.
+    The countdown updates of all running timers are sent together once per tick.
+    '''
+
+    # clock -> service
+    services = weakref.WeakKeyDictionary()
+    default_clock = Clock()
+
+    def __init__(self, clock=None, tick=1):
+        self.clock = clock if clock is not None else self.default_clock
+        self.tick = tick
+        self.heap = []
+        self.timers = set()
+        # started timers which get their first update on the next run
+        self.pending = []
+        self.counter = itertools.count()
+        self.task = None
+        self.wakeup = None
+        self.next_tick = None
+        # running expire and on_done tasks, the loop only keeps weak references
+        self.callbacks = set()
+
+    @classmethod
+    def default(cls, clock=None):
+        '''
+        :param clock: clock of the timers, the real time clock if None
+        :return: the shared service of the clock
+        '''
+        clock = clock if clock is not None else cls.default_clock
+        service = cls.services.get(clock)
+        if service is None:
+            service = cls.services[clock] = cls(clock)
+        return service
+
+    def schedule(self, timer):
+        entry = (timer.end_time, next(self.counter), timer)
+        timer._entry = entry
+        heapq.heappush(self.heap, entry)
+        if timer not in self.timers:
+            self.timers.add(timer)
+            self.pending.append(timer)
+        if self.task is None or self.task.done():
+            self.wakeup = asyncio.Event()
+            self.next_tick = self.clock.monotonic() + self.tick
+            self.task = asyncio.get_running_loop().create_task(self.run())
+        self.wakeup.set()
+
+    def cancel(self, timer):
+        timer._entry = None
+        self.timers.discard(timer)
+
+    async def run(self):
+        while len(self.timers) > 0:
+            while len(self.heap) > 0 and self.heap[0][2]._entry is not self.heap[0]:
+                heapq.heappop(self.heap)
+            now = self.clock.monotonic()
+            if len(self.pending) > 0:
+                timers, self.pending = self.pending, []
+                await self.update([timer for timer in timers if timer in self.timers], now)
+            while len(self.heap) > 0 and self.heap[0][0] <= now:
+                entry = heapq.heappop(self.heap)
+                timer = entry[2]
+                if timer._entry is entry:
+                    self.cancel(timer)
+                    self.spawn(timer._expire())
+            if now >= self.next_tick:
+                await self.update(list(self.timers), now)
+                self.next_tick += self.tick
+                if self.next_tick <= now:
+                    self.next_tick = now + self.tick
+            if len(self.timers) == 0:
+                break
+            timeout = self.next_tick
+            if len(self.heap) > 0:
+                timeout = min(timeout, self.heap[0][0])
+            self.wakeup.clear()
+            try:
+                await self.clock.wait_for(self.wakeup.wait(), max(timeout - self.clock.monotonic(), 0))
+            except asyncio.TimeoutError:
+                pass
+        self.task = None
+
+    async def update(self, timers, now):
+        timers = [timer for timer in timers if timer._update is not None]
+        if len(timers) == 0:
+            return
+        results = await asyncio.gather(*[timer._update(timer, timer.remaining(now)) for timer in timers], return_exceptions=True)
+        for timer, result in zip(timers, results):
+            if isinstance(result, Exception):
+                logger.error("Timer update failed - {}".format(result))
+
+    def spawn(self, coro):
+        task = asyncio.get_running_loop().create_task(coro)
+        self.callbacks.add(task)
+        task.add_done_callback(self.callbacks.discard)
+        return task
+
+    async def close(self):
+        self.timers = set()
+        self.heap = []
+        if self.task is not None:
+            self.task.cancel()
+            await asyncio.gather(self.task, return_exceptions=True)
+            self.task = None
 
 
 class Timer(object):
 
-    def __init__(self, timeout, on_done = None, on_update = None) -> None:
+    def __init__(self, timeout, on_done = None, on_update = None, clock = None, service = None) -> None:
         super().__init__()
+        # the remaining time is measured with clock.monotonic(), so changes of the system time don't affect it
+        self.service = service if service is not None else TimerService.default(clock)
+        self.clock = self.service.clock
         self.timeout = timeout
         self._timemout = self.timeout
-        self._task = None
+        self._entry = None
         self._callback = on_done
         self._update = on_update
         self.start_time = None
         self.end_time = None
-    
-    def done(self, task):
+        self.count = int(round(self.timeout, 0))
+
+    def done(self, task=None):
+        # on_done is called when the timer expires or is stopped
         if self._callback is not None:
-            asyncio.create_task(self._callback(self))
+            self.service.spawn(self._callback(self))
 
-    async def _job(self):
-        self.start_time = int(time.time())
-        self.end_time = self.start_time + int(round(self._timemout, 0))
-        self.count = self.end_time - self.start_time
-        try:
-            while self.count > 0:
-                self.count = (self.end_time - int(time.time()))
-                if self._update is not None:
-                    await self._update(self,self.count)
-                await asyncio.sleep(1)
-        except asyncio.CancelledError:
-            end = int(time.time())
-            duration = end - self.start_time
-            self._timemout = self._timemout - duration
+    def remaining(self, now=None):
+        now = self.clock.monotonic() if now is None else now
+        self.count = max(math.ceil(self.end_time - now), 0)
+        return self.count
+
+    async def _expire(self):
+        self.count = 0
+        if self._update is not None:
+            try:
+                await self._update(self, 0)
+            except Exception as e:
+                logger.error("Timer update failed - {}".format(e))
+        self.done()
 
     async def add(self, seconds):
+        if self._entry is None:
+            self._timemout = self._timemout + seconds
+            return
         self.end_time = self.end_time + seconds
+        self.service.schedule(self)
 
     def start(self):
-        self._task = asyncio.create_task(self._job())
-        self._task.add_done_callback(self.done)
+        if self._entry is not None:
+            return
+        self.start_time = self.clock.monotonic()
+        self.end_time = self.start_time + int(round(self._timemout, 0))
+        self.service.schedule(self)
 
     async def stop(self):
-        if self._task and self._task.done() is False:
-            self._task.cancel()
-            await self._task
+        if self._entry is None:
+            return
+        self.service.cancel(self)
+        self._timemout = max(self.end_time - self.clock.monotonic(), 0)
+        self.done()
 
     def reset(self):
         if self.is_running is True:
@@ -52,7 +182,7 @@ class Timer(object):
         self._timemout = self.timeout
 
     def is_running(self):
-        return not self._task.done()
+        return self._entry is not None
 
     def set_time(self,timeout):
         if self.is_running is True:
@@ -1,18 +1,17 @@
+import asyncio
 import logging
+import logging.handlers
 from pathlib import Path
 import requests
 from cbpi.configFolder import ConfigFolder
 from cbpi.utils.utils import load_config
 from zipfile import ZipFile
-from cbpi.craftbeerpi import CraftBeerPi
 import os
-import pkgutil
 import shutil
 import click
 import pathlib
 from subprocess import call
 from colorama import Fore, Back, Style
-import importlib
 from importlib_metadata import metadata
 from tabulate import tabulate
 from inquirer import prompt
@@ -33,9 +32,48 @@ class CraftBeerPiCli():
         if self.config.check_for_setup() is False:
             return
         print("START")
+        from cbpi.craftbeerpi import CraftBeerPi
         cbpi = CraftBeerPi(self.config)
         cbpi.start()
 
+    def profile_startup(self):
+        '''
+        Import and initialize CraftBeerPi without serving http and print the timings.
+        Sensors and actors are started like on a regular start.
+        '''
+        if self.config.check_for_setup() is False:
+            return
+        from cbpi.utils.startup import ImportProfiler
+
+        start = time.perf_counter()
+        with ImportProfiler() as profiler:
+            from cbpi.craftbeerpi import CraftBeerPi
+        imported = time.perf_counter()
+        cbpi = CraftBeerPi(self.config)
+        created = time.perf_counter()
+
+        async def init():
+            await cbpi.init_serivces()
+            initialized = time.perf_counter()
+            cbpi.app.freeze()
+            await cbpi.app.shutdown()
+            await cbpi.app.cleanup()
+            return initialized
+
+        initialized = asyncio.run(init())
+
+        print("")
+        print(Fore.LIGHTYELLOW_EX, "Imports", Style.RESET_ALL)
+        print(profiler.report())
+        print("")
+        print(Fore.LIGHTYELLOW_EX, "Plugins", Style.RESET_ALL)
+        print(tabulate([[name, "%.3f" % duration] for name, duration in sorted(cbpi.plugin.timings.items(), key=lambda item: -item[1])], headers=["Plugin", "Import and setup (s)"]))
+        print("")
+        print(Fore.LIGHTYELLOW_EX, "Startup", Style.RESET_ALL)
+        print(cbpi.startup.report())
+        print("")
+        print(Fore.LIGHTGREEN_EX, "Import %.3fs, create %.3fs, init %.3fs, total %.3fs" % (imported - start, created - imported, initialized - created, initialized - start), Style.RESET_ALL)
+
     def setup_one_wire(self):
         print("Setting up 1Wire")
         with open('/boot/config.txt', 'w') as f:
@@ -54,25 +92,27 @@ class CraftBeerPiCli():
             print(e)
 
     def plugins_list(self):
+        from cbpi.controller.plugin_controller import PluginManifest
         result = []
         print("")
         print(Fore.LIGHTYELLOW_EX,"List of active plugins", Style.RESET_ALL)
         print("")
-        discovered_plugins = {
-            name: importlib.import_module(name)
-            for finder, name, ispkg
-            in pkgutil.iter_modules()
-            if name.startswith('cbpi') and len(name) > 4
-        }
-        for key, module in discovered_plugins.items():
+        manifest = PluginManifest(self.config.get_file_path("plugin_manifest.json")).load()
+        for plugin in manifest["plugins"]:
             try:
-                meta = metadata(key)
+                meta = metadata(plugin["name"])
                 result.append(dict(Name=meta["Name"], Version=meta["Version"], Author=meta["Author"], Homepage=meta["Home-page"], Summary=meta["Summary"]))
                             
             except Exception as e:
                 print(e)
         print(Fore.LIGHTGREEN_EX, tabulate(result, headers="keys"), Style.RESET_ALL)
 
+    def plugins_rebuild(self):
+        from cbpi.controller.plugin_controller import PluginManifest
+        manifest = PluginManifest(self.config.get_file_path("plugin_manifest.json")).rebuild()
+        print("Plugin manifest rebuilt")
+        print(Fore.LIGHTGREEN_EX, tabulate([[name, "extension", ""] for name in manifest["extensions"]] + [[plugin["name"], "plugin", plugin["version"]] for plugin in manifest["plugins"]], headers=["Name", "Type", "Version"]), Style.RESET_ALL)
+
 
     def plugin_create(self):
         print("Plugin Creation")
@@ -227,19 +267,19 @@ class CraftBeerPiCli():
             return
 
 
-@click.group()
+@click.group(invoke_without_command=True)
 @click.pass_context
+@click.option('--profile-startup', is_flag=True, help="Initialize CraftBeerPi without starting the server and print import and startup timings per module and plugin.")
 @click.option('--config-folder-path', '-c', default="./config", type=click.Path(), help="Specify where the config folder is located. Defaults to './config'.")
 @click.option('--logs-folder-path', '-l', default="", type=click.Path(), help="Specify where the log folder is located. Defaults to '../logs' relative from the config folder.")
 @click.option('--debug-log-level', '-d', default="30", type=int,  help="Specify the log level you want to write to all logs. 0=ALL, 10=DEBUG, 20=INFO 30(default)=WARNING, 40=ERROR, 50=CRITICAL")
-def main(context, config_folder_path, logs_folder_path, debug_log_level):
+def main(context, profile_startup, config_folder_path, logs_folder_path, debug_log_level):
     print("---------------------")
     print("Welcome to CBPi")
     print("---------------------")
     if logs_folder_path == "":
         logs_folder_path = os.path.join(Path(config_folder_path).absolute().parent, 'logs')
-    formatter = logging.Formatter('%(asctime)s - %(levelname)s - %(name)s - %(message)s')
-    logging.basicConfig(format=formatter, stream=logging.StreamHandler())
+    logging.basicConfig(format='%(asctime)s - %(levelname)s - %(name)s - %(message)s')
     logger = logging.getLogger()
     logger.setLevel(debug_log_level)
     try:
@@ -253,6 +293,10 @@ def main(context, config_folder_path, logs_folder_path, debug_log_level):
         logging.critical(e, exc_info=True)
     cbpi_cli = CraftBeerPiCli(ConfigFolder(config_folder_path, logs_folder_path))
     context.obj = cbpi_cli
+    if profile_startup is True:
+        cbpi_cli.profile_startup()
+    elif context.invoked_subcommand is None:
+        click.echo(context.get_help())
 
 @main.command()
 @click.pass_context
@@ -282,6 +326,12 @@ def plugins(context):
     '''List active plugins'''
     context.obj.plugins_list()
 
+@main.command(name="rebuild-plugins")
+@click.pass_context
+def rebuild_plugins(context):
+    '''Rebuild the cached list of installed plugins'''
+    context.obj.plugins_rebuild()
+
 @main.command()
 @click.pass_context
 def create(context):
@@ -1,7 +1,6 @@
 from cbpi.api.dataclasses import Actor
 from cbpi.controller.basic_controller2 import BasicController
 import logging
-from tabulate import tabulate
 class ActorController(BasicController):
 
     def __init__(self, cbpi):
@@ -7,7 +7,6 @@ import sys, os
 import shortuuid
 import asyncio
 
-from tabulate import tabulate
 
 class BasicController:
 
@@ -22,7 +21,11 @@ class BasicController:
         self.types = {}
         self.logger = logging.getLogger(__name__)
         self.data = []
+        # id -> position in self.data, rebuilt whenever self.data changes
+        self._index = {}
         self.autostart = True
+        # seconds to wait for a single item to start during load
+        self.start_timeout = float(self.cbpi.static_config.get("start_timeout", 10))
         #self._loop = asyncio.get_event_loop() 
         self.path = self.cbpi.config_folder.get_file_path(file)
         self.cbpi.app.on_cleanup.append(self.shutdown)
@@ -41,19 +44,20 @@ class BasicController:
             
             for i in data["data"]:
                 self.data.append(self.create(i))
+            self._reindex()
    
             if self.autostart is True:
-                for item in self.data:
-                    logging.info("{} Starting ".format(self.name))
-                    await self.start(item.id)
+                # items are started concurrently, a hanging item does not block the others
+                await asyncio.gather(*[self._start_with_timeout(item.id) for item in self.data])
                 await self.push_udpate()
         
     async def save(self):
         logging.info("{} Save ".format(self.name))
-        data = dict(data=list(map(lambda actor: actor.to_dict(), self.data))) 
-        with open(self.path, "w") as file:
-            json.dump(data, file, indent=4, sort_keys=True)
+        self.cbpi.persistence.mark_dirty(self.path, self._save_data)
         await self.push_udpate()
+
+    def _save_data(self):
+        return dict(data=list(map(lambda actor: actor.to_dict(), self.data)))
         
     async def push_udpate(self):
         self.cbpi.ws.send(dict(topic=self.update_key, data=list(map(lambda item: item.to_dict(), self.data))),self.sorting)
@@ -61,11 +65,23 @@ class BasicController:
         for item in self.data:
             self.cbpi.push_update("cbpi/{}/{}".format(self.update_key,item.id), item.to_dict())
 
+    def _reindex(self):
+        self._index = {item.id: i for i, item in enumerate(self.data)}
+
     def find_by_id(self, id):
-        return next((item for item in self.data if item.id == id), None)
+        index = self.get_index_by_id(id)
+        return self.data[index] if index is not None else None
     
     def get_index_by_id(self, id):
-        return next((i for i, item in enumerate(self.data) if item.id == id), None)
+        index = self._index.get(id)
+        if index is None:
+            if len(self._index) == len(self.data):
+                return None
+        elif index < len(self.data) and self.data[index].id == id:
+            return index
+        # self.data was changed without reindexing
+        self._reindex()
+        return self._index.get(id)
 
     async def shutdown(self, app):    
         logging.info("{} Shutdown ".format(self.name))
@@ -87,6 +103,13 @@ class BasicController:
         except Exception as e:
             logging.error("{} Cant stop {} - {}".format(self.name, id, e))
 
+    async def _start_with_timeout(self, id):
+        logging.info("{} Starting ".format(self.name))
+        try:
+            await asyncio.wait_for(self.start(id), timeout=self.start_timeout)
+        except asyncio.TimeoutError:
+            logging.error("{} Start of {} timed out after {}s".format(self.name, id, self.start_timeout))
+
     async def start(self, id):
         logging.info("{} Start Id {} ".format(self.name, id))
         try:
@@ -126,6 +149,7 @@ class BasicController:
         logging.info("{} Add".format(self.name))
         item.id = shortuuid.uuid()
         self.data.append(item)
+        self._index[item.id] = len(self.data) - 1
         if self.autostart is True:
             await self.start(item.id)
         await self.save()
@@ -135,7 +159,9 @@ class BasicController:
         logging.info("{} Get Update".format(self.name))
         await self.stop(item.id)
         
-        self.data = list(map(lambda old_item: item if old_item.id == item.id else old_item, self.data))
+        index = self.get_index_by_id(item.id)
+        if index is not None:
+            self.data[index] = item
         if self.autostart is True:
             await self.start(item.id)    
         await self.save()
@@ -145,6 +171,7 @@ class BasicController:
         logging.info("{} Delete".format(self.name))
         await self.stop(id)
         self.data = list(filter(lambda x: x.id != id, self.data))
+        self._reindex()
         await self.save()
 
     async def call_action(self, id, action, parameter) -> None:
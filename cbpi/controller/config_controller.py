@@ -5,13 +5,55 @@ from pathlib import Path
 
 from cbpi.api.config import ConfigType
 from cbpi.utils import load_config
+import contextlib
 import json
+import weakref
+
+
+class ConfigSnapshot:
+    '''
+    Config values as plain attributes for hot paths. The values are converted to the type of the default
+    and updated by the ConfigController whenever one of the values is changed.
+
+    settings = cbpi.config.snapshot(TEMP_UNIT="C", SENSOR_LOG_MAX_BYTES=100000)
+    settings.TEMP_UNIT
+    '''
+
+    def __init__(self, config, defaults):
+        self._config = config
+        self._defaults = defaults
+        for name in defaults:
+            self._update(name)
+
+    def _update(self, name):
+        default = self._defaults[name]
+        value = self._config.get(name, default)
+        if isinstance(default, bool):
+            # select options are stored as "Yes" / "No"
+            value = value in (True, "Yes", "yes", "true", "True", 1, "1")
+        elif default is not None and not isinstance(value, type(default)):
+            try:
+                value = type(default)(value)
+            except (TypeError, ValueError):
+                value = default
+        setattr(self, name, value)
+
+    def __repr__(self):
+        return "ConfigSnapshot({})".format(", ".join("{}={!r}".format(name, getattr(self, name)) for name in self._defaults))
+
 
 class ConfigController:
     
 
     def __init__(self, cbpi):
         self.cache = {}
+        # name -> list of methods called with (name, value) on change
+        self.listeners = {}
+        self.snapshots = weakref.WeakSet()
+        # name -> (value, type, description, options) added by apply_defaults if missing
+        self.defaults = {}
+        self._batch = 0
+        self._batch_dirty = False
         self.logger = logging.getLogger(__name__)
         self.cbpi = cbpi
         self.cbpi.register(self)
@@ -34,9 +76,11 @@ class ConfigController:
             data = json.load(json_file)
             for key, value in data.items():
                 self.cache[key] = Config(name=value.get("name"), value=value.get("value"), description=value.get("description"), type=ConfigType(value.get("type", "string")), options=value.get("options", None) )
+        for snapshot in list(self.snapshots):
+            for name in snapshot._defaults:
+                snapshot._update(name)
 
     def get(self, name, default=None):
-        self.logger.debug("GET CONFIG VALUE %s (default %s)" % (name, default))
         if name in self.cache and self.cache[name].value is not None and self.cache[name].value != "":
             return self.cache[name].value
         else:
@@ -46,17 +90,96 @@ class ConfigController:
         if name in self.cache:
             
             self.cache[name].value = value
-
-            data = {}
-            for key, value in self.cache.items():
-                data[key] = value.to_dict()
-            with open(self.path, "w") as file:
-                json.dump(data, file, indent=4, sort_keys=True)
+            self._save()
+            self._changed(name)
 
     async def add(self, name, value, type: ConfigType, description, options=None):
-        self.cache[name] = Config(name,value,description,type,options)
+        config = Config(name,value,description,type,options)
+        if self.cache.get(name) == config:
+            return
+        self.cache[name] = config
+        self._save()
+        self._changed(name)
+
+    def _save(self):
+        if self._batch > 0:
+            self._batch_dirty = True
+        else:
+            self.cbpi.persistence.mark_dirty(self.path, self._save_data)
+
+    @contextlib.asynccontextmanager
+    async def batch(self):
+        '''
+        Group config changes, config.json is saved once when the outermost batch ends
+
+        async with cbpi.config.batch():
+            await cbpi.config.add(...)
+        '''
+        self._batch += 1
+        try:
+            yield self
+        finally:
+            self._batch -= 1
+            if self._batch == 0 and self._batch_dirty is True:
+                self._batch_dirty = False
+                self._save()
+
+    def ensure(self, name, value, type: ConfigType, description, options=None):
+        '''
+        Register a default config value. It's added by apply_defaults after all plugins are loaded if the value is missing or empty.
+        '''
+        self.defaults[name] = (value, type, description, options)
+
+    async def apply_defaults(self):
+        async with self.batch():
+            for name, (value, type, description, options) in self.defaults.items():
+                if self.get(name, None) is None:
+                    self.logger.info("INIT config value {}".format(name))
+                    try:
+                        await self.add(name, value, type, description, options)
+                    except Exception as e:
+                        self.logger.warning("Unable to add config value {} - {}".format(name, e))
+
+    def subscribe(self, name, method):
+        '''
+        Call method(name, value) whenever the config value is set
+
+        :param name: config name
+        :param method: callable
+        :return: None
+        '''
+        self.listeners.setdefault(name, []).append(method)
+
+    def unsubscribe(self, name, method):
+        try:
+            self.listeners[name].remove(method)
+        except (KeyError, ValueError):
+            pass
+
+    def snapshot(self, **defaults):
+        '''
+        Typed snapshot of config values which is kept up to date. Snapshots are dropped when they are no longer referenced.
+
+        :param defaults: config names with default values, the type of the default is used for the value
+        :return: ConfigSnapshot
+        '''
+        snapshot = ConfigSnapshot(self, defaults)
+        self.snapshots.add(snapshot)
+        return snapshot
+
+    def _changed(self, name):
+        for snapshot in list(self.snapshots):
+            if name in snapshot._defaults:
+                snapshot._update(name)
+        value = self.get(name)
+        for method in list(self.listeners.get(name, [])):
+            try:
+                method(name, value)
+            except Exception as e:
+                self.logger.error("Config listener for {} failed - {}".format(name, e))
+
+    def _save_data(self):
         data = {}
         for key, value in self.cache.items():
             data[key] = value.to_dict()
-        with open(self.path, "w") as file:
-            json.dump(data, file, indent=4, sort_keys=True)
+        return data
@@ -27,6 +27,9 @@ class DashboardController:
         try:
             self.path = self.cbpi.config_folder.get_dashboard_path("cbpi_dashboard_"+ str(dashboard_id) +".json")
             logging.info(self.path)
+            data = self.cbpi.persistence.pending(self.path)
+            if data is not None:
+                return data
             with open(self.path) as json_file:
                 data = json.load(json_file)
                 return data
@@ -36,13 +39,13 @@ class DashboardController:
     async def add_content(self, dashboard_id, data):
         #print(data)
         self.path = self.cbpi.config_folder.get_dashboard_path("cbpi_dashboard_" + str(dashboard_id)+ ".json")
-        with open(self.path, 'w') as outfile:
-            json.dump(data, outfile, indent=4, sort_keys=True)
+        self.cbpi.persistence.mark_dirty(self.path, lambda: data)
         self.cbpi.notify(title="Dashboard {}".format(dashboard_id), message="Saved Successfully", type=NotificationType.SUCCESS)
         return {"status": "OK"}
 
     async def delete_content(self, dashboard_id):
         self.path = self.cbpi.config_folder.get_dashboard_path("cbpi_dashboard_"+ str(dashboard_id)+ ".json")
+        self.cbpi.persistence.discard(self.path)
         if os.path.exists(self.path):
             os.remove(self.path)
             self.cbpi.notify(title="Dashboard {}".format(dashboard_id), message="Deleted Successfully", type=NotificationType.SUCCESS)
@@ -12,7 +12,6 @@ from os.path import isfile, join
 import shortuuid
 from cbpi.api.dataclasses import  Fermenter, FermenterStep, Props, Step
 from cbpi.controller.basic_controller2 import BasicController
-from tabulate import tabulate
 import sys, os
 from ..api.step import CBPiStep, StepMove, StepResult, StepState, CBPiFermentationStep
           
@@ -24,6 +23,9 @@ class FermentationController:
         self.logger = logging.getLogger(__name__)
         self.path = self.cbpi.config_folder.get_file_path("fermenter_data.json")
         self.data = []
+        # id -> fermenter and step id -> step, rebuilt whenever fermenters or steps change
+        self._index = {}
+        self._step_index = {}
         self.types = {}
         self.steptypes = {}
         self.cbpi.app.on_cleanup.append(self.shutdown)
@@ -77,6 +79,7 @@ class FermentationController:
 
                 for i in data["data"]:
                     self.data.append(self._create(i))
+            self._reindex()
         except:
             logging.warning("Invalid fermenter_data.json file - Creating empty file")
             os.remove(self.path)
@@ -88,6 +91,7 @@ class FermentationController:
             json.dump(data,open(destfile,'w'),indent=4, sort_keys=True)
             for i in data["data"]:
                     self.data.append(self._create(i))
+            self._reindex()
                  
     def _create_step(self, fermenter, item):
         id = item.get("id")
@@ -144,8 +148,12 @@ class FermentationController:
             return
 
         
+    def _reindex(self):
+        self._index = {item.id: item for item in self.data if item is not None}
+        self._step_index = {step.id: step for item in self._index.values() for step in item.steps if step is not None}
+
     def _find_by_id(self, id):
-        return next((item for item in self.data if item.id == id), None)
+        return self._index.get(id)
 
     async def get_all(self):
         return list(map(lambda x: x.to_dict(), self.data))
@@ -189,12 +197,7 @@ class FermentationController:
         return fermentersteps
 
     async def find_step_by_id(self, id):
-        actionstep = None
-        for item in self.data:
-            step = self._find_step_by_id(item.steps, id)
-            if step is not None:
-                actionstep=step
-        return actionstep
+        return self._step_index.get(id)
 
 
     async def get(self, id: str ):
@@ -203,6 +206,7 @@ class FermentationController:
     async def create(self, data: Fermenter ):
         data.id = shortuuid.uuid()
         self.data.append(data)
+        self._reindex()
         self.save()
         self.push_update()
         return data
@@ -229,13 +233,14 @@ class FermentationController:
         self.push_update()
         return item
 
-    async def set_target_temp(self, id: str, target_temp):
+    async def set_target_temp(self, id: str, target_temp, persist=True):
         try:
             item = self._find_by_id(id)
             logging.info(item.target_temp)
             if item:
                 item.target_temp = target_temp
-                self.save()
+                if persist:
+                    self.save()
                 self.push_update()
         except Exception as e:
             logging.error("Failed to set Target Temp {} {}".format(id, e))
@@ -254,13 +259,15 @@ class FermentationController:
     async def delete(self, id: str ):
         item = self._find_by_id(id)
         self.data = list(filter(lambda item: item.id != id, self.data))
+        self._reindex()
         self.save()
         self.push_update()
 
     def save(self):
-        data = dict(data=list(map(lambda item: item.to_dict(), self.data)))         
-        with open(self.path, "w") as file:
-            json.dump(data, file, indent=4, sort_keys=True)
+        self.cbpi.persistence.mark_dirty(self.path, self._save_data)
+
+    def _save_data(self):
+        return dict(data=list(map(lambda item: item.to_dict(), self.data)))
 
     def create_step(self, id, item):
         try:
@@ -312,6 +319,7 @@ class FermentationController:
             fermenter.steps = list(map(lambda old: step if old.id == step.id else old, fermenter.steps))
         except Exception as e:
             logging.info(e)
+        self._reindex()
 
         self.save()
 
@@ -321,6 +329,7 @@ class FermentationController:
         item = self._find_by_id(id)
         # might require later check if step is active
         item.steps = list(filter(lambda item: item.id != stepid, item.steps))
+        self._reindex()
         self.save()
         self.push_update("fermenterstepupdate")
     
@@ -328,6 +337,7 @@ class FermentationController:
         item = self._find_by_id(id)
         # might require later check if step is active
         item.steps = []
+        self._reindex()
         item.brewname = ""
         self.push_update()
         self.save()
@@ -602,7 +612,7 @@ class FermentationController:
         fermenter.steps=[]
         for item in data.get("steps"):
             fermenter.steps.append(self.create_step(fermenterid, item))
-        
+        self._reindex()
         self.save()
         self.push_update("fermenterstepupdate")
         
@@ -610,6 +620,7 @@ class FermentationController:
         fermenter = self._find_by_id(fermenterid)
         step = self.create_step(fermenterid, newstep)
         fermenter.steps.append(step)
+        self._reindex()
         self.save()
         self.push_update("fermenterstepupdate")
         return step
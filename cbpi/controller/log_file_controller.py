@@ -4,10 +4,8 @@ import logging
 import os
 from logging.handlers import RotatingFileHandler
 from time import strftime, localtime
-import pandas as pd
 import zipfile
 import base64
-import urllib3
 from pathlib import Path
 from cbpi.api import *
 from cbpi.api.config import ConfigType
@@ -26,46 +24,68 @@ class LogController:
         self.logger = logging.getLogger(__name__)
         self.configuration = False
         self.datalogger = {}
+        self.settings = self.cbpi.config.snapshot(CSVLOGFILES="Yes", INFLUXDB="No", SENSOR_LOG_MAX_BYTES=100000, SENSOR_LOG_BACKUP_COUNT=3,
+                                                  INFLUXDBCLOUD="No", INFLUXDBADDR=None, INFLUXDBPORT=None, INFLUXDBNAME=None,
+                                                  INFLUXDBUSER=None, INFLUXDBPWD=None, INFLUXDBMEASUREMENT="measurement")
         self.logsFolderPath = self.cbpi.config_folder.logsFolderPath
         self.logger.info("Log folder path  : " + self.logsFolderPath)
 
     def log_data(self, name: str, value: str) -> None:
-        self.logfiles = self.cbpi.config.get("CSVLOGFILES", "Yes")
-        self.influxdb = self.cbpi.config.get("INFLUXDB", "No")
-        if self.logfiles == "Yes":
-            if name not in self.datalogger:
-                max_bytes = int(self.cbpi.config.get("SENSOR_LOG_MAX_BYTES", 100000))
-                backup_count = int(self.cbpi.config.get("SENSOR_LOG_BACKUP_COUNT", 3))
-    
-                data_logger = logging.getLogger('cbpi.sensor.%s' % name)
-                data_logger.propagate = False
-                data_logger.setLevel(logging.DEBUG)
-                handler = RotatingFileHandler(os.path.join(self.logsFolderPath, f"sensor_{name}.log"), maxBytes=max_bytes, backupCount=backup_count)
-                data_logger.addHandler(handler)
-                self.datalogger[name] = data_logger
+        self.log_batch([(name, value)])
+
+    def log_batch(self, values) -> None:
+        '''
+        Log the values of several sensors in one pass. All values go to InfluxDB with one request.
 
+        :param values: list of (sensor id, value)
+        '''
+        self.logfiles = self.settings.CSVLOGFILES
+        self.influxdb = self.settings.INFLUXDB
+        if len(values) == 0:
+            return
+        if self.logfiles == "Yes":
             formatted_time = strftime("%Y-%m-%d %H:%M:%S", localtime())
-            self.datalogger[name].info("%s,%s" % (formatted_time, str(value)))
+            for name, value in values:
+                if name not in self.datalogger:
+                    max_bytes = self.settings.SENSOR_LOG_MAX_BYTES
+                    backup_count = self.settings.SENSOR_LOG_BACKUP_COUNT
+        
+                    data_logger = logging.getLogger('cbpi.sensor.%s' % name)
+                    data_logger.propagate = False
+                    data_logger.setLevel(logging.DEBUG)
+                    handler = RotatingFileHandler(os.path.join(self.logsFolderPath, f"sensor_{name}.log"), maxBytes=max_bytes, backupCount=backup_count)
+                    data_logger.addHandler(handler)
+                    self.datalogger[name] = data_logger
+
+                self.datalogger[name].info("%s,%s" % (formatted_time, str(value)))
         if self.influxdb == "Yes":
-            self.influxdbcloud = self.cbpi.config.get("INFLUXDBCLOUD", "No")
-            self.influxdbaddr = self.cbpi.config.get("INFLUXDBADDR", None)
-            self.influxdbport = self.cbpi.config.get("INFLUXDBPORT", None)
-            self.influxdbname = self.cbpi.config.get("INFLUXDBNAME", None)
-            self.influxdbuser = self.cbpi.config.get("INFLUXDBUSER", None)
-            self.influxdbpwd = self.cbpi.config.get("INFLUXDBPWD", None)
-            self.influxdbmeasurement = self.cbpi.config.get("INFLUXDBMEASUREMENT", "measurement")
+            self.influxdbcloud = self.settings.INFLUXDBCLOUD
+            self.influxdbaddr = self.settings.INFLUXDBADDR
+            self.influxdbport = self.settings.INFLUXDBPORT
+            self.influxdbname = self.settings.INFLUXDBNAME
+            self.influxdbuser = self.settings.INFLUXDBUSER
+            self.influxdbpwd = self.settings.INFLUXDBPWD
+            self.influxdbmeasurement = self.settings.INFLUXDBMEASUREMENT
             
-            id = name
-            try:
-                chars = {'ö':'oe','ä':'ae','ü':'ue','Ö':'Oe','Ä':'Ae','Ü':'Ue'}
-                sensor=self.cbpi.sensor.find_by_id(name)
-                if sensor is not None:
-                    itemname=sensor.name.replace(" ", "_")
-                    for char in chars:
-                        itemname = itemname.replace(char,chars[char])
-                    out=str(self.influxdbmeasurement)+",source=" + itemname + ",itemID=" + str(id) + " value="+str(value)
-            except Exception as e:
-                logging.error("InfluxDB ID Error: {}".format(e))
+            lines = []
+            for id, value in values:
+                try:
+                    chars = {'ö':'oe','ä':'ae','ü':'ue','Ö':'Oe','Ä':'Ae','Ü':'Ue'}
+                    sensor=self.cbpi.sensor.find_by_id(id)
+                    if sensor is not None:
+                        itemname=sensor.name.replace(" ", "_")
+                        for char in chars:
+                            itemname = itemname.replace(char,chars[char])
+                        lines.append(str(self.influxdbmeasurement)+",source=" + itemname + ",itemID=" + str(id) + " value="+str(value))
+                except Exception as e:
+                    logging.error("InfluxDB ID Error: {}".format(e))
+            if len(lines) == 0:
+                return
+            # line protocol, one line per value
+            out = "\n".join(lines)
+            name = values[0][0] if len(values) == 1 else "CraftBeerPi"
+            # urllib3 is only needed if influxdb is enabled
+            import urllib3
 
             if self.influxdbcloud == "Yes":
                 self.influxdburl="https://" + self.influxdbaddr + "/api/v2/write?org=" + self.influxdbuser + "&bucket=" + self.influxdbname + "&precision=s"
@@ -95,6 +115,8 @@ class LogController:
         :param sample_rate: rate for resampling the data
         :return:
         '''
+        # pandas takes seconds to import on a Raspberry Pi, so it's only imported when logs are queried
+        import pandas as pd
         # make string to array
         if isinstance(names, list) is False:
             names = [names]
@@ -154,6 +176,7 @@ class LogController:
         return data
 
     async def get_data2(self, ids) -> dict:
+        import pandas as pd
         
         dateparse = lambda dates: [datetime.datetime.strptime(d, '%Y-%m-%d %H:%M:%S') for d in dates]       
         result = dict()
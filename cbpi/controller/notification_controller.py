@@ -12,13 +12,13 @@ class NotificationController:
         '''
         self.cbpi = cbpi
         self.logger = logging.getLogger(__name__)
+        self.settings = self.cbpi.config.snapshot(NOTIFY_ON_ERROR="No")
         logging.root.addFilter(self.notify_log_event)
         self.callback_cache = {}    
         self.listener = {}
     
     def notify_log_event(self, record):
-        NOTIFY_ON_ERROR = self.cbpi.config.get("NOTIFY_ON_ERROR", "No")
-        if NOTIFY_ON_ERROR == "Yes":
+        if self.settings.NOTIFY_ON_ERROR == "Yes":
             try:
                 if record.levelno > 20:
                     # on log events higher then INFO we want to notify all clients
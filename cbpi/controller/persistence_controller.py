@@ -0,0 +1,124 @@
+import asyncio
+import json
+import logging
+import os
+import shutil
+import tempfile
+import time
+
+
+class PersistenceController:
+    '''
+    Writes the json files of the controllers.
+    Changes are only marked dirty and written at most once per persistence_interval (config.yaml, default 2 seconds).
+    Files are written on a worker thread to a temp file which is renamed afterwards, so a file is never left half written.
+    Pending writes are flushed on shutdown.
+    '''
+
+    def __init__(self, cbpi):
+        self.cbpi = cbpi
+        self.logger = logging.getLogger(__name__)
+        self.interval = float(self.cbpi.static_config.get("persistence_interval", 2))
+        # path -> method which returns the data to write
+        self.dirty = {}
+        self.tasks = {}
+        self.closed = False
+        self.writes = 0
+        self.cbpi.app.on_cleanup.append(self.shutdown)
+
+    def mark_dirty(self, path, producer):
+        '''
+        Schedule a write of the file
+
+        :param path: file path
+        :param producer: method without parameters which returns the data. It's called when the file is written.
+        :return: None
+        '''
+        self.dirty[path] = producer
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            loop = None
+        if self.closed is True or loop is None:
+            # no loop to write in the background, e.g. during shutdown
+            self._write_dirty(path)
+            return
+        if path not in self.tasks:
+            self.tasks[path] = loop.create_task(self._delayed_write(path))
+
+    def pending(self, path):
+        '''
+        Data of a file which is not written yet or None
+        '''
+        producer = self.dirty.get(path)
+        return producer() if producer is not None else None
+
+    def discard(self, path):
+        self.dirty.pop(path, None)
+
+    async def write(self, path, data):
+        '''
+        Write a file immediately. Pending changes for the file are dropped.
+        '''
+        self.dirty.pop(path, None)
+        await asyncio.get_running_loop().run_in_executor(None, self.write_atomic, path, self.serialize(data))
+
+    async def flush(self, path=None):
+        for p in ([path] if path is not None else list(self.dirty.keys())):
+            producer = self.dirty.pop(p, None)
+            if producer is not None:
+                await self.write(p, producer())
+
+    async def shutdown(self, app=None):
+        self.closed = True
+        for task in self.tasks.values():
+            task.cancel()
+        await asyncio.gather(*self.tasks.values(), return_exceptions=True)
+        self.tasks = {}
+        await self.flush()
+
+    async def _delayed_write(self, path):
+        try:
+            await asyncio.sleep(self.interval)
+            await self.flush(path)
+        except asyncio.CancelledError:
+            pass
+        except Exception as e:
+            self.logger.error("Failed to write {} - {}".format(path, e))
+        finally:
+            self.tasks.pop(path, None)
+            if path in self.dirty and self.closed is False:
+                # changed while the file was written
+                self.tasks[path] = asyncio.get_running_loop().create_task(self._delayed_write(path))
+
+    def _write_dirty(self, path):
+        producer = self.dirty.pop(path, None)
+        if producer is not None:
+            try:
+                self.write_atomic(path, self.serialize(producer()))
+            except Exception as e:
+                self.logger.error("Failed to write {} - {}".format(path, e))
+
+    @staticmethod
+    def serialize(data):
+        return json.dumps(data, indent=4, sort_keys=True)
+
+    def write_atomic(self, path, content):
+        start = time.perf_counter()
+        folder = os.path.dirname(os.path.abspath(path))
+        fd, tmp = tempfile.mkstemp(prefix=".{}.".format(os.path.basename(path)), suffix=".tmp", dir=folder)
+        try:
+            with os.fdopen(fd, "w") as file:
+                file.write(content)
+                file.flush()
+                os.fsync(file.fileno())
+            if os.path.exists(path):
+                shutil.copymode(path, tmp)
+            else:
+                os.chmod(tmp, 0o644)
+            os.replace(tmp, path)
+        except:
+            os.remove(tmp)
+            raise
+        self.writes += 1
+        self.logger.debug("Saved {} in {:.1f}ms".format(path, (time.perf_counter() - start) * 1000))
@@ -1,64 +1,143 @@
 
+import hashlib
 import importlib
+import json
 import logging
 import os
 import pkgutil
+import sys
+import time
 
 from importlib import import_module
 
+from cbpi import __version__
 from cbpi.api import *
 from cbpi.utils.utils import load_config
-from importlib_metadata import metadata, version
 
 logger = logging.getLogger(__name__)
 
+EXTENSION_FOLDER = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "extension")
+
+
+class PluginManifest:
+    '''
+    Cached result of the plugin discovery, stored as plugin_manifest.json in the config folder.
+    Contains the active built-in extensions and the installed cbpi* plugins with their versions.
+    The cache is rebuilt if the cbpi version, an extension config.yaml or one of the sys.path folders changed,
+    e.g. when a package was installed or removed. Discovery only lists module names, nothing is imported.
+    '''
+
+    def __init__(self, path):
+        self.path = path
+        self.data = None
+
+    def fingerprint(self):
+        parts = [__version__]
+        for filename in sorted(os.listdir(EXTENSION_FOLDER)):
+            parts.append(self._mtime(os.path.join(EXTENSION_FOLDER, filename, "config.yaml")))
+        for folder in sys.path:
+            parts.append(self._mtime(folder or "."))
+        return hashlib.sha1("|".join(map(str, parts)).encode()).hexdigest()
+
+    @staticmethod
+    def _mtime(path):
+        try:
+            return os.stat(path).st_mtime_ns
+        except OSError:
+            return 0
+
+    def load(self):
+        '''
+        Read the manifest and rebuild it if it's missing or outdated
+        :return: manifest data
+        '''
+        fingerprint = self.fingerprint()
+        try:
+            with open(self.path) as file:
+                data = json.load(file)
+            if data.get("fingerprint") == fingerprint:
+                self.data = data
+                return data
+        except (OSError, ValueError):
+            pass
+        return self.rebuild(fingerprint)
+
+    def rebuild(self, fingerprint=None):
+        start = time.perf_counter()
+        data = dict(fingerprint=fingerprint or self.fingerprint(), extensions=self.discover_extensions(), plugins=self.discover_plugins())
+        try:
+            with open(self.path, "w") as file:
+                json.dump(data, file, indent=4)
+        except OSError as e:
+            logger.warning("Failed to write plugin manifest {} - {}".format(self.path, e))
+        logger.info("Plugin manifest rebuilt in %.3fs" % (time.perf_counter() - start))
+        self.data = data
+        return data
+
+    @staticmethod
+    def discover_extensions():
+        result = []
+        for filename in sorted(os.listdir(EXTENSION_FOLDER)):
+            if os.path.isdir(os.path.join(EXTENSION_FOLDER, filename)) is False or filename == "__pycache__":
+                continue
+            try:
+                data = load_config(os.path.join(EXTENSION_FOLDER, filename, "config.yaml"))
+                if data.get("active") is True and data.get("version") == 4:
+                    result.append(filename)
+                else:
+                    logger.warning("Plugin %s is not supporting version 4" % filename)
+            except Exception as e:
+                logger.error(e)
+        return result
+
+    @staticmethod
+    def discover_plugins():
+        from importlib_metadata import version
+        result = []
+        for finder, name, ispkg in pkgutil.iter_modules():
+            if name.startswith('cbpi') and len(name) > 4 and name not in [plugin["name"] for plugin in result]:
+                try:
+                    plugin_version = version(name)
+                except Exception:
+                    plugin_version = None
+                result.append(dict(name=name, version=plugin_version))
+        return result
+
+
 class PluginController():
     modules = {}
     types = {}
 
     def __init__(self, cbpi):
         self.cbpi = cbpi
+        # plugin name -> seconds for import and setup
+        self.timings = {}
+        self.manifest = PluginManifest(self.cbpi.config_folder.get_file_path("plugin_manifest.json"))
 
     def load_plugins(self):
-
-        this_directory = os.sep.join(
-            os.path.abspath(__file__).split(os.sep)[:-1])
-        for filename in os.listdir(os.path.join(this_directory, "../extension")):
-            if os.path.isdir(
-                    os.path.join(this_directory, "../extension/") + filename) is False or filename == "__pycache__":
-                continue
+        if self.manifest.data is None:
+            self.manifest.load()
+        for filename in self.manifest.data["extensions"]:
             try:
                 logger.info("Trying to load plugin %s" % filename)
-                data = load_config(os.path.join(
-                    this_directory, "../extension/%s/config.yaml" % filename))
-                if (data.get("active") is True and data.get("version") == 4):
-                    self.modules[filename] = import_module(
-                        "cbpi.extension.%s" % (filename))
-                    self.modules[filename].setup(self.cbpi)
-                    # logger.info("Plugin %s loaded successful" % filename)
-                else:
-                    logger.warning(
-                        "Plugin %s is not supporting version 4" % filename)
-
+                start = time.perf_counter()
+                self.modules[filename] = import_module("cbpi.extension.%s" % (filename))
+                self.modules[filename].setup(self.cbpi)
+                self.timings[filename] = time.perf_counter() - start
             except Exception as e:
-
                 logger.error(e)
 
     def load_plugins_from_evn(self):
-
-        discovered_plugins = {
-            name: importlib.import_module(name)
-            for finder, name, ispkg
-            in pkgutil.iter_modules()
-            if name.startswith('cbpi') and len(name) > 4
-        }
-
-        for key, value in discovered_plugins.items():
-            from importlib.metadata import version
+        if self.manifest.data is None:
+            self.manifest.load()
+        for plugin in self.manifest.data["plugins"]:
+            key = plugin["name"]
             try:
-                logger.info("Try to load plugin:  {} == {} ".format(
-                    key, version(key)))
-                value.setup(self.cbpi)
+                logger.info("Try to load plugin:  {} == {} ".format(key, plugin["version"]))
+                start = time.perf_counter()
+                module = importlib.import_module(key)
+                module.setup(self.cbpi)
+                self.timings[key] = time.perf_counter() - start
                 logger.info("Plugin {} loaded successfully".format(key))
             except Exception as e:
                 logger.error("FAILED to load plugin {} ".format(key))
@@ -1,15 +1,288 @@
 
 import asyncio
+import collections
 import json
 from re import M
 from asyncio_mqtt import Client, MqttError, Will
 from contextlib import AsyncExitStack, asynccontextmanager
 from cbpi import __version__
+from cbpi.api.extractor import PayloadExtractor
 import logging
+import os
+import time
 import shortuuid
 
+
+class TopicTree(object):
+    '''
+    MQTT topic filters stored in a tree keyed on topic levels.
+    Matching a message walks its levels once instead of testing every filter.
+    '''
+
+    class Node(object):
+        __slots__ = '_children', '_content'
+
+        def __init__(self):
+            self._children = {}
+            self._content = None
+
+    def __init__(self):
+        self._root = self.Node()
+        self._filters = {}
+
+    def add(self, topic, method):
+        node = self._root
+        for sym in topic.split('/'):
+            node = node._children.setdefault(sym, self.Node())
+        if node._content is None:
+            node._content = []
+        node._content.append(method)
+        self._filters[topic] = node
+
+    def remove(self, topic, method):
+        path = [self._root]
+        for sym in topic.split('/'):
+            node = path[-1]._children.get(sym)
+            if node is None:
+                return
+            path.append(node)
+        node = path[-1]
+        if node._content is None or method not in node._content:
+            return
+        node._content.remove(method)
+        if len(node._content) > 0:
+            return
+        node._content = None
+        del self._filters[topic]
+        # prune empty branches
+        for sym, parent in zip(reversed(topic.split('/')), reversed(path[:-1])):
+            child = parent._children[sym]
+            if child._content is not None or len(child._children) > 0:
+                break
+            del parent._children[sym]
+
+    def topics(self):
+        return list(self._filters.keys())
+
+    def match(self, topic):
+        lst = topic.split('/')
+        normal = not topic.startswith('$')
+        result = []
+
+        def rec(node, i=0):
+            if i == len(lst):
+                if node._content is not None:
+                    result.extend(node._content)
+            else:
+                part = lst[i]
+                if part in node._children:
+                    rec(node._children[part], i + 1)
+                if '+' in node._children and (normal or i > 0):
+                    rec(node._children['+'], i + 1)
+            if '#' in node._children and (normal or i > 0):
+                content = node._children['#']._content
+                if content is not None:
+                    result.extend(content)
+
+        rec(self._root)
+        return result
+
+
+class MQTTSubscription(object):
+    '''
+    Handle for a topic subscription with message statistics.
+    done(), cancel() and await are supported so plugins written against the former
+    per subscription task keep working.
+    '''
+
+    def __init__(self, controller, topic, method):
+        self.controller = controller
+        self.topic = topic
+        self.method = method
+        self.messages = 0
+        self.errors = 0
+        self.processing_time = 0.0
+        self.last_message = None
+        self.cancelled = False
+
+    async def __call__(self, message):
+        self.messages += 1
+        self.last_message = time.time()
+        start = time.perf_counter()
+        try:
+            await self.method(message.payload.decode())
+        except Exception as e:
+            self.errors += 1
+            self.controller.logger.error("Sub Exception {}: {}".format(self.topic, e))
+        finally:
+            self.processing_time += time.perf_counter() - start
+
+    def done(self):
+        return self.cancelled
+
+    def cancel(self):
+        if self.cancelled is False:
+            self.cancelled = True
+            self.controller.unsubcribe(self)
+        return True
+
+    def __await__(self):
+        return iter(())
+
+    def to_dict(self):
+        avg = self.processing_time / self.messages if self.messages > 0 else 0
+        return dict(topic=self.topic, messages=self.messages, errors=self.errors, last_message=self.last_message, avg_processing_time=avg)
+
+
+class OutboundQueue(object):
+    '''
+    Bounded queue of outgoing messages which is persisted as json lines,
+    so that selected messages survive broker outages and restarts.
+    Sent messages are acknowledged with an ack line, the file is rewritten once it holds twice
+    maxsize lines or the queue is empty. Files are written in an executor.
+    '''
+
+    def __init__(self, path, maxsize=1000, collapse_retained=True):
+        self.path = path
+        self.maxsize = maxsize
+        self.collapse_retained = collapse_retained
+        self.logger = logging.getLogger(__name__)
+        # items superseded by a newer retained state stay in the deque until they reach the front
+        self.items = collections.deque()
+        self.retained = {}
+        self.superseded = set()
+        self.dropped = 0
+        self._seq = 0
+        self._lines = 0
+        self._buffer = []
+        self._rewrite = False
+        self._task = None
+
+    def __len__(self):
+        return len(self.items) - len(self.superseded)
+
+    def __iter__(self):
+        return (item for item in self.items if item["seq"] not in self.superseded)
+
+    async def load(self):
+        await asyncio.get_running_loop().run_in_executor(None, self._load)
+        self._schedule()
+
+    def _load(self):
+        acked = -1
+        try:
+            with open(self.path) as file:
+                for line in file:
+                    try:
+                        item = json.loads(line)
+                        if "ack" in item:
+                            acked = item["ack"]
+                        elif item.get("seq", self._seq) > acked:
+                            self._append(item)
+                    except (ValueError, KeyError):
+                        pass
+        except FileNotFoundError:
+            pass
+        except Exception as e:
+            self.logger.warning("Failed to load mqtt queue {}: {}".format(self.path, e))
+        # items acknowledged after they were loaded
+        while len(self.items) > 0 and self.items[0]["seq"] <= acked:
+            self._popleft()
+        self._rewrite = True
+
+    def _append(self, item):
+        item["seq"] = item.get("seq", self._seq)
+        self._seq = max(self._seq, item["seq"]) + 1
+        if self.collapse_retained is True and item["retain"] is True:
+            # only the latest retained state of a topic is relevant for the subscribers
+            old = self.retained.get(item["topic"])
+            if old is not None:
+                self.superseded.add(old["seq"])
+            self.retained[item["topic"]] = item
+        self.items.append(item)
+        if len(self) > self.maxsize:
+            self._popleft()
+            self.dropped += 1
+        self._skip()
+
+    def _popleft(self):
+        self._skip()
+        item = self.items.popleft()
+        if self.retained.get(item["topic"]) is item:
+            del self.retained[item["topic"]]
+        self._skip()
+        return item
+
+    def _skip(self):
+        while len(self.items) > 0 and self.items[0]["seq"] in self.superseded:
+            self.superseded.discard(self.items.popleft()["seq"])
+
+    def _write(self, line):
+        self._buffer.append(line)
+        self._lines += 1
+        if self._lines >= 2 * self.maxsize or len(self) == 0:
+            self._rewrite = True
+        self._schedule()
+
+    def _schedule(self):
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            # no loop to write in the background
+            self._write_file(*self._take())
+            return
+        if self._task is None or self._task.done():
+            self._task = loop.create_task(self.flush())
+
+    def _take(self):
+        if self._rewrite is True:
+            self._rewrite = False
+            lines = [json.dumps(item) for item in self]
+            self._lines = len(lines)
+            self._buffer = []
+            return lines, "w"
+        lines, self._buffer = self._buffer, []
+        return lines, "a"
+
+    async def flush(self):
+        '''
+        Write the pending lines to the file
+        '''
+        loop = asyncio.get_running_loop()
+        while len(self._buffer) > 0 or self._rewrite is True:
+            await loop.run_in_executor(None, self._write_file, *self._take())
+
+    def _write_file(self, lines, mode):
+        try:
+            if mode == "w" and len(lines) == 0:
+                if os.path.exists(self.path):
+                    os.remove(self.path)
+            elif len(lines) > 0:
+                with open(self.path, mode) as file:
+                    file.write("".join(line + "\n" for line in lines))
+        except Exception as e:
+            self.logger.warning("Failed to write mqtt queue {}: {}".format(self.path, e))
+
+    def append(self, topic, message, retain=False, qos=1):
+        item = dict(topic=topic, message=message, retain=retain, qos=qos)
+        self._append(item)
+        self._write(json.dumps(item))
+
+    def peek(self):
+        return self.items[0] if len(self.items) > 0 else None
+
+    def pop(self):
+        item = self._popleft()
+        # record the progress of the drain, sent messages aren't replayed after a restart
+        self._write(json.dumps(dict(ack=item["seq"])))
+        return item
+
+
 class SatelliteController:
 
+    # topic classes (cbpi/<class>/...) which are events. They are published in order and never collapsed.
+    EVENT_TOPICS = ["notification"]
+
     def __init__(self, cbpi):
         self.client_id = shortuuid.uuid()
         self.cbpi = cbpi
@@ -23,6 +296,20 @@ class SatelliteController:
         self.username = cbpi.static_config.get("mqtt_username", None)
         self.password = cbpi.static_config.get("mqtt_password", None)
         self.client = None
+        self.connected = False
+        self.reconnect_delay = float(cbpi.static_config.get("mqtt_reconnect_delay", 5))
+        # push_update payloads are collected per topic and published at most every publish_interval seconds
+        self.publish_interval = float(cbpi.static_config.get("mqtt_publish_interval", 0.5))
+        self.qos = cbpi.static_config.get("mqtt_qos", None) or {}
+        self.pending = {}
+        self.pending_events = []
+        self.retained = {}
+        self._publish_event = None
+        # messages of these topic classes are queued on disk while the broker is not reachable
+        self.queue_topics = cbpi.static_config.get("mqtt_queue_topics", ["actorupdate", "notification", "fermenterupdate", "fermenterstepupdate"])
+        self.queue_rate = float(cbpi.static_config.get("mqtt_queue_rate", 20))
+        self.queue = None
+        self._drain_task = None
         self.topic_filters = [
             ("cbpi/actor/+/on", self._actor_on),
             ("cbpi/actor/+/off", self._actor_off),
@@ -33,6 +320,11 @@ class SatelliteController:
             ("cbpi/updatefermenter", self._fermenterupdate),
         
         ]
+        self.topic_tree = TopicTree()
+        for topic, method in self.topic_filters:
+            self.topic_tree.add(topic, method)
+        self.subscriptions = set()
+        self.power_extractor = PayloadExtractor()
         self.tasks = set()
 
     async def init(self):
@@ -48,7 +340,13 @@ class SatelliteController:
                 except asyncio.CancelledError:
                     pass
         
-        self.client = Client(self.host, port=self.port, username=self.username, password=self.password, will=Will(topic="cbpi/disconnect", payload="CBPi Server Disconnected"),client_id=self.client_id)
+        self.queue = OutboundQueue(self.cbpi.config_folder.get_file_path("mqtt_queue.json"),
+                                   maxsize=int(self.cbpi.static_config.get("mqtt_queue_size", 1000)),
+                                   collapse_retained=str(self.cbpi.static_config.get("mqtt_queue_collapse_retained", True)).lower() == "true")
+        await self.queue.load()
+        if len(self.queue) > 0:
+            self.logger.info("MQTT {} queued messages loaded".format(len(self.queue)))
+
         self.loop = asyncio.get_event_loop()
         ## Listen for mqtt messages in an (unawaited) asyncio task
         task = self.loop.create_task(self.listen())
@@ -56,33 +354,172 @@ class SatelliteController:
         self.tasks.add(task)
         task.add_done_callback(self.tasks.remove)
 
+        self._publish_event = asyncio.Event()
+        task = self.loop.create_task(self._publish_loop())
+        self.tasks.add(task)
+        task.add_done_callback(self.tasks.remove)
+
         self.logger.info("MQTT Connected to {}:{}".format(self.host, self.port))
 
+    def _create_client(self):
+        return Client(self.host, port=self.port, username=self.username, password=self.password, will=Will(topic="cbpi/disconnect", payload="CBPi Server Disconnected"),client_id=self.client_id)
+
     async def listen(self):
         while True:
             try:
+                # the client can't be reused once the connection is lost, create a new one for every attempt
+                self.client = self._create_client()
                 async with self.client as client:
                     async with client.messages() as messages:
-                        await client.subscribe("#")
+                        # only subscribe to topics which are handled, not to the whole broker
+                        topics = self.topic_tree.topics()
+                        if len(topics) > 0:
+                            await client.subscribe([(topic, 0) for topic in topics])
+                        self.connected = True
+                        # the broker may have lost the retained values, publish them again
+                        self.retained = {}
+                        # publish everything collected while disconnected
+                        self._start_drain()
+                        self._publish_event.set()
                         async for message in messages:
-                            for topic_filter in self.topic_filters:
-                                topic = topic_filter[0]
-                                method = topic_filter[1]
-                                if message.topic.matches(topic):
-                                    await (method(message))
+                            for method in self.topic_tree.match(str(message.topic)):
+                                await method(message)
             except MqttError as e:
                 self.logger.error("MQTT Exception: {}".format(e))
             except Exception as e:
                 self.logger.error("MQTT General Exception: {}".format(e))
-            await asyncio.sleep(5)
+            self.connected = False
+            await asyncio.sleep(self.reconnect_delay)
+
+
+    def add_topic_filter(self, topic, method):
+        '''
+        Register a handler for a topic filter. The handler is called with the raw message.
+        Topics are (re)subscribed on every connect, new ones are subscribed immediately if connected.
+
+        :param topic: mqtt topic filter, wildcards + and # are supported
+        :param method: async method called with the message
+        :return: None
+        '''
+        is_new = topic not in self.topic_tree.topics()
+        self.topic_tree.add(topic, method)
+        if is_new and self.connected is True:
+            task = asyncio.create_task(self._subscribe_topic(topic))
+            self.tasks.add(task)
+            task.add_done_callback(self.tasks.discard)
+
+    def remove_topic_filter(self, topic, method):
+        self.topic_tree.remove(topic, method)
+        if topic not in self.topic_tree.topics() and self.connected is True:
+            task = asyncio.create_task(self._unsubscribe_topic(topic))
+            self.tasks.add(task)
+            task.add_done_callback(self.tasks.discard)
+
+    async def _subscribe_topic(self, topic):
+        try:
+            await self.client.subscribe(topic)
+        except Exception as e:
+            self.logger.warning("Failed to subscribe {} via mqtt: {}".format(topic, e))
+
+    async def _unsubscribe_topic(self, topic):
+        try:
+            await self.client.unsubscribe(topic)
+        except Exception as e:
+            self.logger.warning("Failed to unsubscribe {} via mqtt: {}".format(topic, e))
+
+    def get_qos(self, topic):
+        return int(self.qos.get(self._topic_class(topic), self.qos.get("default", 1)))
+
+    def _topic_class(self, topic):
+        levels = topic.split("/")
+        return levels[1] if len(levels) > 1 else levels[0]
 
+    def push(self, topic, data, retain=False):
+        '''
+        Queue a state update for publishing. Only the latest data per topic is published,
+        serialization happens once per flush instead of once per call.
 
-    async def publish(self, topic, message, retain=False):
-        if self.client is not None and self.client._connected:
+        :param topic: mqtt topic
+        :param data: json serializable data
+        :param retain: publish as retained message
+        :return: None
+        '''
+        if self._topic_class(topic) in self.EVENT_TOPICS:
+            self.pending_events.append((topic, data, retain))
+        else:
+            self.pending[topic] = (data, retain)
+        if self._publish_event is not None:
+            self._publish_event.set()
+
+    async def _publish_loop(self):
+        while True:
+            await self._publish_event.wait()
+            self._publish_event.clear()
             try:
-                await self.client.publish(topic, message, qos=1, retain=retain)
+                await self.flush()
+            except Exception as e:
+                self.logger.warning("Failed to flush mqtt updates: {}".format(e))
+            # bound the publish rate, updates arriving meanwhile are collapsed
+            await asyncio.sleep(self.publish_interval)
+
+    async def flush(self):
+        events, self.pending_events = self.pending_events, []
+        pending, self.pending = self.pending, {}
+        for topic, data, retain in events:
+            await self.publish(topic, json.dumps(data), retain, qos=self.get_qos(topic))
+        for topic, (data, retain) in pending.items():
+            if self.connected is False and self.is_queued(topic) is False:
+                # keep the latest state until the broker is reachable again
+                self.pending.setdefault(topic, (data, retain))
+                continue
+            message = json.dumps(data)
+            # the broker already holds this retained value
+            if retain is True and self.retained.get(topic) == message:
+                continue
+            if await self.publish(topic, message, retain, qos=self.get_qos(topic)) is True and retain is True:
+                self.retained[topic] = message
+
+    def is_queued(self, topic):
+        return self.queue is not None and self._topic_class(topic) in self.queue_topics
+
+    async def publish(self, topic, message, retain=False, qos=1):
+        '''
+        :return: True if the message was published or queued
+        '''
+        if self.is_queued(topic) and (self.connected is False or len(self.queue) > 0):
+            # keep the order, newer messages are published after the queued ones
+            self.queue.append(topic, message, retain, qos)
+            self._start_drain()
+            return True
+        if self.client is not None and self.connected is True:
+            try:
+                await self.client.publish(topic, message, qos=qos, retain=retain)
+                return True
             except Exception as e:
                 self.logger.warning("Failed to push data via mqtt: {}".format(e))
+                if self.is_queued(topic):
+                    self.queue.append(topic, message, retain, qos)
+                    return True
+        return False
+
+    def _start_drain(self):
+        if self.connected is True and len(self.queue) > 0 and (self._drain_task is None or self._drain_task.done()):
+            self._drain_task = asyncio.create_task(self._drain())
+
+    async def _drain(self):
+        if self.queue.dropped > 0:
+            self.logger.warning("MQTT queue was full, {} messages dropped".format(self.queue.dropped))
+            self.queue.dropped = 0
+        self.logger.info("MQTT publishing {} queued messages".format(len(self.queue)))
+        while self.connected is True and len(self.queue) > 0:
+            item = self.queue.peek()
+            try:
+                await self.client.publish(item["topic"], item["message"], qos=item["qos"], retain=item["retain"])
+            except Exception as e:
+                self.logger.warning("Failed to publish queued message via mqtt: {}".format(e))
+                break
+            self.queue.pop()
+            await asyncio.sleep(1 / self.queue_rate)
 
     async def _actor_on(self, message):
             try:
@@ -104,7 +541,7 @@ class SatelliteController:
             try:
                 topic_key = str(message.topic).split("/")
                 try:
-                    power=int(message.payload.decode())
+                    power=int(self.power_extractor.extract(message.payload))
                     if power > 100: 
                         power = 100
                     if power < 0:
@@ -149,25 +586,22 @@ class SatelliteController:
                 self.logger.warning("Failed to send sensorupdate via mqtt: {}".format(e))
 
     def subcribe(self, topic, method):
-        task = asyncio.create_task(self._subcribe(topic, method))
-        return task
+        '''
+        Subscribe a method to a topic. All subscriptions share the single message stream of listen,
+        they are resubscribed automatically after a reconnect.
 
-    async def _subcribe(self, topic, method):
-        while True:
-            try:
-                if self.client._connected.done():
-                    async with self.client.messages() as messages:
-                        await self.client.subscribe(topic)
-                        async for message in messages:
-                            if message.topic.matches(topic):
-                                await method(message.payload.decode())
-            except asyncio.CancelledError:
-                # Cancel
-                self.logger.warning("Sub Cancelled")
-            except MqttError as e:
-                self.logger.error("Sub MQTT Exception: {}".format(e))
-            except Exception as e:
-                self.logger.error("Sub Exception: {}".format(e))
+        :param topic: mqtt topic filter
+        :param method: async method called with the decoded payload
+        :return: MQTTSubscription, call cancel() to unsubscribe
+        '''
+        subscription = MQTTSubscription(self, topic, method)
+        self.subscriptions.add(subscription)
+        self.add_topic_filter(topic, subscription)
+        return subscription
+
+    def unsubcribe(self, subscription):
+        self.subscriptions.discard(subscription)
+        self.remove_topic_filter(subscription.topic, subscription)
 
-            # wait before try to resubscribe
-            await asyncio.sleep(5)
+    def get_subscription_stats(self):
+        return list(map(lambda item: item.to_dict(), self.subscriptions))
@@ -1,28 +1,371 @@
-from cbpi.api.dataclasses import Sensor
-from cbpi.controller.basic_controller2 import BasicController
+import asyncio
+import heapq
+import itertools
+import json
 import logging
+import os
+
+from cbpi.api.dataclasses import Sensor, SensorReading
+from cbpi.api.sensor import CBPiSensor
+from cbpi.controller.basic_controller2 import BasicController
+from cbpi.controller.sensor_filter import FilterChain
+
+
+class SensorScheduler:
+    '''
+    Samples all sensors which define a sampling_interval with one task.
+    Deadlines are kept in a heap. Sensors with the same interval get staggered phases so their reads are spread
+    over the interval. All sensors due within one tick are read concurrently. Their values are logged in one pass
+    and sent to the websocket clients with one task per client afterwards.
+    '''
+
+    # fraction of the golden ratio, spreads phases evenly for any number of sensors
+    PHASE_STEP = 0.6180339887
+
+    def __init__(self, cbpi, tick=0.05):
+        self.cbpi = cbpi
+        self.clock = cbpi.clock
+        self.logger = logging.getLogger(__name__)
+        self.tick = tick
+        self.heap = []
+        # sensor id -> entry
+        self.entries = {}
+        self.counter = itertools.count()
+        self.phases = {}
+        self.task = None
+        self.wakeup = None
+
+    class Entry:
+        __slots__ = ("instance", "interval", "deadline", "samples", "jitter", "max_jitter", "total_jitter", "errors")
+
+        def __init__(self, instance, interval, deadline):
+            self.instance = instance
+            self.interval = interval
+            self.deadline = deadline
+            self.samples = 0
+            self.jitter = 0
+            self.max_jitter = 0
+            self.total_jitter = 0
+            self.errors = 0
+
+    def add(self, instance):
+        '''
+        :param instance: sensor instance with a sampling_interval
+        :return: None
+        '''
+        interval = float(instance.sampling_interval)
+        phase = self.phases.get(interval, 0)
+        self.phases[interval] = (phase + self.PHASE_STEP) % 1
+        entry = self.Entry(instance, interval, self.clock.monotonic() + phase * interval)
+        self.entries[instance.id] = entry
+        heapq.heappush(self.heap, (entry.deadline, next(self.counter), entry))
+        if self.task is None or self.task.done():
+            self.wakeup = asyncio.Event()
+            self.task = asyncio.get_running_loop().create_task(self.run())
+        self.wakeup.set()
+
+    def remove(self, id):
+        # the entry is dropped from the heap when it's due
+        self.entries.pop(id, None)
+
+    async def run(self):
+        while True:
+            while len(self.heap) > 0 and self.entries.get(self.heap[0][2].instance.id) is not self.heap[0][2]:
+                heapq.heappop(self.heap)
+            if len(self.heap) == 0:
+                timeout = None
+            else:
+                timeout = self.heap[0][0] - self.clock.monotonic()
+            if timeout is None or timeout > 0:
+                self.wakeup.clear()
+                try:
+                    await self.clock.wait_for(self.wakeup.wait(), timeout)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+
+            now = self.clock.monotonic()
+            due = []
+            while len(self.heap) > 0 and self.heap[0][0] <= now + self.tick:
+                deadline, _, entry = heapq.heappop(self.heap)
+                if self.entries.get(entry.instance.id) is entry:
+                    due.append(entry)
+            await self.sample(due, now)
+
+    async def sample(self, entries, now):
+        values = await asyncio.gather(*[self._read(entry, now) for entry in entries])
+        batch = []
+        for entry, value in zip(entries, values):
+            if self.entries.get(entry.instance.id) is not entry:
+                continue
+            if value is not None:
+                batch.append((entry.instance, value))
+            entry.deadline += entry.interval
+            if entry.deadline < self.clock.monotonic():
+                # the sensor fell behind, skip the missed samples
+                entry.deadline = self.clock.monotonic() + entry.interval
+            heapq.heappush(self.heap, (entry.deadline, next(self.counter), entry))
+        try:
+            self.cbpi.sensor.publish_batch(batch)
+        except Exception as e:
+            self.logger.error("Failed to publish sensor values - {}".format(e))
+
+    async def _read(self, entry, now):
+        entry.jitter = max(now - entry.deadline, 0)
+        entry.max_jitter = max(entry.max_jitter, entry.jitter)
+        entry.total_jitter += entry.jitter
+        entry.samples += 1
+        try:
+            return await self.clock.wait_for(entry.instance.read(), entry.interval)
+        except Exception as e:
+            entry.errors += 1
+            self.logger.error("Failed to read sensor {} - {}".format(entry.instance.id, e))
+            return None
+
+    def metrics(self):
+        '''
+        Sampling jitter per sensor in milliseconds
+        '''
+        return {id: dict(interval=entry.interval, samples=entry.samples, errors=entry.errors,
+                         jitter=round(entry.jitter * 1000, 1), max_jitter=round(entry.max_jitter * 1000, 1),
+                         mean_jitter=round(entry.total_jitter * 1000 / entry.samples, 1) if entry.samples > 0 else 0)
+                for id, entry in self.entries.items()}
+
+    async def close(self):
+        self.entries = {}
+        self.heap = []
+        if self.task is not None:
+            self.task.cancel()
+            await asyncio.gather(self.task, return_exceptions=True)
+            self.task = None
+
 
 class SensorController(BasicController):
     def __init__(self, cbpi):
         super(SensorController, self).__init__(cbpi, Sensor, "sensor.json")
         self.update_key = "sensorupdate"
         self.sorting = True
+        self.scheduler = SensorScheduler(cbpi, tick=float(self.cbpi.static_config.get("sensor_tick", 0.05)))
+        # sensor id -> SensorReading of the last pushed value
+        self.readings = {}
+        self.waiters = {}
+        # sensor id -> methods called with every new reading
+        self.listeners = {}
+        # seconds after which a value is stale if the sensor doesn't deliver values more rarely
+        self.max_age = float(self.cbpi.static_config.get("sensor_max_age", 300))
+        # method(id, reading, max_age) -> True if the reading is stale, replaces the default policy
+        self.staleness_policy = None
+        # sensor id -> FilterChain
+        self.filters = {}
+        self.filter_path = self.cbpi.config_folder.get_file_path("sensor_filter.json")
+
+    async def init(self):
+        self.load_filters()
+        await super().init()
+
+    def load_filters(self):
+        if os.path.exists(self.filter_path) is False:
+            return
+        try:
+            with open(self.filter_path) as file:
+                data = json.load(file)
+            for id, spec in data.get("data", {}).items():
+                self.filters[id] = FilterChain(spec)
+        except Exception as e:
+            logging.error("Failed to load sensor filters - {}".format(e))
+
+    def _save_filters(self):
+        return dict(data={id: chain.spec for id, chain in self.filters.items()})
+
+    def set_filter(self, id, spec):
+        '''
+        Set the filters of a sensor. The filtered value is recomputed from the recent raw values.
+
+        :param id: sensor id
+        :param spec: list of filters, e.g. [{"type": "median", "window": 5}], an empty list removes the filters
+        :return: None
+        '''
+        if spec is None or len(spec) == 0:
+            self.filters.pop(id, None)
+        elif id in self.filters:
+            value = self.filters[id].configure(spec)
+            if value is not None and id in self.readings:
+                self.set_reading(id, round(value, 2))
+        else:
+            self.filters[id] = FilterChain(spec)
+        self.cbpi.persistence.mark_dirty(self.filter_path, self._save_filters)
+
+    def get_filter(self, id):
+        chain = self.filters.get(id)
+        return chain.spec if chain is not None else []
+
+    def filter_value(self, id, value):
+        '''
+        Apply the filters of a sensor to a raw value
+        '''
+        chain = self.filters.get(id)
+        if chain is None or value is None:
+            return value
+        try:
+            return round(chain.push(value, self.cbpi.clock.monotonic()), 2)
+        except (TypeError, ValueError):
+            return value
+
+    def publish_batch(self, items):
+        '''
+        Filter, log and push the new values of several sensors at once
+
+        :param items: list of (sensor instance, raw value)
+        :return: None
+        '''
+        values = []
+        logged = []
+        for instance, value in items:
+            value = self.filter_value(instance.id, value)
+            values.append((instance, value))
+            if getattr(instance.log_data, "__func__", None) is CBPiSensor.log_data:
+                logged.append((instance.id, value))
+            else:
+                # the sensor logs on its own
+                try:
+                    instance.log_data(value)
+                except Exception as e:
+                    logging.error("Failed to log sensor value {} - {}".format(instance.id, e))
+        try:
+            self.cbpi.log.log_batch(logged)
+        except Exception as e:
+            logging.error("Failed to log sensor values - {}".format(e))
+        for instance, value in values:
+            instance.push_update(value, ws=False)
+        self.cbpi.ws.send_all([dict(topic="sensorstate", id=instance.id, value=value) for instance, value in values])
 
     def create_dict(self, data):
         try:
             instance = data.get("instance")
-            state =instance.get_state()
+            state = self._filtered_state(data.get("id"), instance.get_state())
         except Exception as e:
             logging.error("Failed to create sensor dict {} ".format(e))
-            state = dict() 
+            state = dict()
 
         return dict(name=data.get("name"), id=data.get("id"), type=data.get("type"), state=state,props=data.get("props", []))
-    
+
+    async def start(self, id):
+        await super().start(id)
+        item = self.find_by_id(id)
+        if item is not None and item.instance is not None and item.instance.running is True and item.instance.sampling_interval is not None and id not in self.scheduler.entries:
+            self.scheduler.add(item.instance)
+
+    async def stop(self, id):
+        self.scheduler.remove(id)
+        await super().stop(id)
+        self.readings.pop(id, None)
+        item = self.find_by_id(id)
+        if item is not None and item.instance is not None:
+            item.instance.stopped.set()
+
+    async def delete(self, id):
+        await super().delete(id)
+        if id in self.filters:
+            self.set_filter(id, [])
+
+    async def shutdown(self, app):
+        await self.scheduler.close()
+        await super().shutdown(app)
+
+    def set_reading(self, id, value):
+        '''
+        Store the last value of a sensor. Called by push_update of the sensor.
+        '''
+        reading = SensorReading(value, self.cbpi.clock.monotonic(), "good")
+        self.readings[id] = reading
+        for future in self.waiters.pop(id, []):
+            if future.done() is False:
+                future.set_result(reading)
+        for method in list(self.listeners.get(id, [])):
+            try:
+                method(id, reading)
+            except Exception as e:
+                self.logger.error("Sensor listener for {} failed - {}".format(id, e))
+
+    def subscribe(self, id, method):
+        '''
+        Call method(id, reading) whenever the sensor pushes a value
+
+        :param id: sensor id
+        :param method: callable
+        :return: None
+        '''
+        self.listeners.setdefault(id, []).append(method)
+
+    def unsubscribe(self, id, method):
+        try:
+            self.listeners[id].remove(method)
+            if len(self.listeners[id]) == 0:
+                del self.listeners[id]
+        except (KeyError, ValueError):
+            pass
+
+    def get_reading(self, id, max_age=None):
+        '''
+        :param id: sensor id
+        :param max_age: seconds after which the value is stale, the staleness policy is used if None
+        :return: SensorReading with quality good, stale or missing
+        '''
+        reading = self.readings.get(id)
+        if reading is None:
+            return SensorReading()
+        return SensorReading(reading.value, reading.timestamp, "stale" if self.is_stale(id, reading, max_age) else "good")
+
+    def is_stale(self, id, reading, max_age=None):
+        if self.staleness_policy is not None:
+            return self.staleness_policy(id, reading, max_age)
+        if max_age is None:
+            max_age = self.max_age
+            try:
+                interval = self.find_by_id(id).instance.expected_interval()
+                if interval is None:
+                    # push sensors like iSpindel report whenever they like
+                    return False
+                max_age = max(max_age, 3 * interval)
+            except AttributeError:
+                pass
+        return reading.age(self.cbpi.clock.monotonic()) > max_age
+
+    async def wait_for_fresh(self, id, max_age=None, timeout=None):
+        '''
+        Wait until the sensor has a value which is not stale
+
+        :param id: sensor id
+        :param max_age: seconds, the staleness policy is used if None
+        :param timeout: seconds to wait, raises asyncio.TimeoutError
+        :return: SensorReading, quality is missing if the sensor doesn't exist
+        '''
+        reading = self.get_reading(id, max_age)
+        if reading.quality == "good" or self.find_by_id(id) is None:
+            # nothing to wait for if the sensor doesn't exist
+            return reading
+        future = asyncio.get_running_loop().create_future()
+        self.waiters.setdefault(id, []).append(future)
+        try:
+            return await self.cbpi.clock.wait_for(future, timeout)
+        finally:
+            waiters = self.waiters.get(id, [])
+            if future in waiters:
+                waiters.remove(future)
+                if len(waiters) == 0:
+                    del self.waiters[id]
+
     def get_sensor_value(self, id):
         if id is None:
             return None
         try:
-            return self.find_by_id(id).instance.get_state()
+            return self._filtered_state(id, self.find_by_id(id).instance.get_state())
         except Exception as e:
             logging.error("Failed read sensor value {} {} ".format(id, e))
-            return None
\ No newline at end of file
+            return None
+
+    def _filtered_state(self, id, state):
+        # the instance keeps the raw value
+        if id in self.filters and id in self.readings and isinstance(state, dict):
+            return dict(state, value=self.readings[id].value)
+        return state
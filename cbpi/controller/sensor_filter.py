@@ -0,0 +1,205 @@
+import time
+
+
+class RingBuffer:
+    '''
+    Fixed size buffer of the last values, backed by a numpy array
+    '''
+
+    def __init__(self, size):
+        import numpy as np
+        self.np = np
+        self.data = np.zeros(size)
+        self.size = size
+        self.count = 0
+
+    def append(self, value):
+        self.data[self.count % self.size] = value
+        self.count += 1
+
+    def extend(self, values):
+        for value in values[-self.size:]:
+            self.append(value)
+
+    def values(self):
+        if self.count <= self.size:
+            return self.data[:self.count]
+        return self.np.roll(self.data, -(self.count % self.size))
+
+
+class MedianFilter:
+    '''
+    Median of the last window values
+    '''
+
+    def __init__(self, window=5):
+        self.window = int(window)
+        if self.window < 1:
+            raise ValueError("window has to be at least 1")
+        self.history = RingBuffer(self.window)
+        self.np = self.history.np
+
+    def push(self, value, timestamp):
+        self.history.append(value)
+        return float(self.np.median(self.history.values()))
+
+    def batch(self, values, timestamps):
+        np = self.np
+        self.history = RingBuffer(self.window)
+        self.history.extend(values)
+        result = np.empty(len(values))
+        head = min(self.window - 1, len(values))
+        for i in range(head):
+            result[i] = np.median(values[:i + 1])
+        if len(values) >= self.window:
+            result[head:] = np.median(np.lib.stride_tricks.sliding_window_view(values, self.window), axis=1)
+        return result
+
+
+class HampelFilter(MedianFilter):
+    '''
+    Replaces outliers by the median of the last window values.
+    A value is an outlier if it's more than threshold scaled median absolute deviations away from the median.
+    '''
+
+    def __init__(self, window=7, threshold=3):
+        super().__init__(window)
+        self.threshold = float(threshold)
+        if self.threshold < 0:
+            raise ValueError("threshold must not be negative")
+
+    def _filter(self, value, window):
+        np = self.np
+        median = np.median(window)
+        mad = 1.4826 * np.median(np.abs(window - median))
+        return median if mad > 0 and abs(value - median) > self.threshold * mad else value
+
+    def push(self, value, timestamp):
+        self.history.append(value)
+        return float(self._filter(value, self.history.values()))
+
+    def batch(self, values, timestamps):
+        np = self.np
+        self.history = RingBuffer(self.window)
+        self.history.extend(values)
+        result = np.array(values, dtype=float)
+        head = min(self.window - 1, len(values))
+        for i in range(head):
+            result[i] = self._filter(values[i], values[:i + 1])
+        if len(values) >= self.window:
+            windows = np.lib.stride_tricks.sliding_window_view(values, self.window)
+            medians = np.median(windows, axis=1)
+            mads = 1.4826 * np.median(np.abs(windows - medians[:, None]), axis=1)
+            current = values[self.window - 1:]
+            outliers = (mads > 0) & (np.abs(current - medians) > self.threshold * mads)
+            result[head:] = np.where(outliers, medians, current)
+        return result
+
+
+class EMAFilter:
+    '''
+    Exponential moving average, alpha is the weight of the new value
+    '''
+
+    def __init__(self, alpha=0.3):
+        self.alpha = float(alpha)
+        if not 0 < self.alpha <= 1:
+            raise ValueError("alpha has to be in (0, 1]")
+        self.value = None
+
+    def push(self, value, timestamp):
+        self.value = value if self.value is None else self.alpha * value + (1 - self.alpha) * self.value
+        return self.value
+
+    def batch(self, values, timestamps):
+        self.value = None
+        return [self.push(value, timestamp) for value, timestamp in zip(values, timestamps)]
+
+
+class RateLimitFilter:
+    '''
+    Limits the change of the value to max_change per second
+    '''
+
+    def __init__(self, max_change=1):
+        self.max_change = float(max_change)
+        if self.max_change < 0:
+            raise ValueError("max_change must not be negative")
+        self.value = None
+        self.timestamp = None
+
+    def push(self, value, timestamp):
+        if self.value is not None:
+            limit = self.max_change * max(timestamp - self.timestamp, 0)
+            value = min(max(value, self.value - limit), self.value + limit)
+        self.value = value
+        self.timestamp = timestamp
+        return value
+
+    def batch(self, values, timestamps):
+        self.value = None
+        return [self.push(value, timestamp) for value, timestamp in zip(values, timestamps)]
+
+
+class FilterChain:
+    '''
+    Filters applied to the values of a sensor in the given order, e.g.
+    [{"type": "hampel", "window": 7, "threshold": 3}, {"type": "median", "window": 5}, {"type": "ema", "alpha": 0.3}, {"type": "rate_limit", "max_change": 0.5}]
+
+    The raw values are kept, so the output is recomputed from them when the filters change.
+    '''
+
+    TYPES = dict(median=MedianFilter, hampel=HampelFilter, ema=EMAFilter, rate_limit=RateLimitFilter)
+
+    def __init__(self, spec, history=256):
+        self.raw = RingBuffer(history)
+        self.timestamps = RingBuffer(history)
+        self.spec = []
+        self.stages = []
+        self.value = None
+        self.configure(spec)
+
+    @classmethod
+    def create_stages(cls, spec):
+        if isinstance(spec, list) is False:
+            raise ValueError("Filter has to be a list")
+        stages = []
+        for item in spec:
+            options = dict(item)
+            name = options.pop("type", None)
+            if name not in cls.TYPES:
+                raise ValueError("Unknown filter {}".format(name))
+            try:
+                stages.append(cls.TYPES[name](**options))
+            except (TypeError, ValueError) as e:
+                # unknown or out of range options
+                raise ValueError("Invalid options for filter {} - {}".format(name, e))
+        return stages
+
+    def configure(self, spec):
+        '''
+        Replace the filters and recompute the output from the kept raw values
+        :return: filtered value of the last raw value or None
+        '''
+        self.stages = self.create_stages(spec)
+        self.spec = spec
+        values, timestamps = self.raw.values().copy(), self.timestamps.values().copy()
+        if len(values) == 0:
+            return None
+        for stage in self.stages:
+            values = self.raw.np.asarray(stage.batch(values, timestamps), dtype=float)
+        self.value = float(values[-1])
+        return self.value
+
+    def push(self, value, timestamp=None):
+        '''
+        :param timestamp: monotonic time of the value in seconds, now if None
+        '''
+        timestamp = time.monotonic() if timestamp is None else timestamp
+        value = float(value)
+        self.raw.append(value)
+        self.timestamps.append(timestamp)
+        for stage in self.stages:
+            value = stage.push(value, timestamp)
+        self.value = value
+        return value
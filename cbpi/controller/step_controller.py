@@ -10,7 +10,6 @@ import os
 from os.path import isfile, join
 import shortuuid
 from cbpi.api.dataclasses import NotificationAction, Props, Step
-from tabulate import tabulate
 
 from ..api.step import StepMove, StepResult, StepState
 
@@ -124,11 +123,12 @@ class StepController:
 
     async def save(self):
         logging.debug("save profile")
-        data = dict(basic=self.basic_data, steps=list(map(lambda item: item.to_dict(), self.profile)))
-        with open(self.path, "w") as file:
-            json.dump(data, file, indent=4, sort_keys=True)
+        self.cbpi.persistence.mark_dirty(self.path, self._save_data)
         self.push_udpate()
 
+    def _save_data(self):
+        return dict(basic=self.basic_data, steps=list(map(lambda item: item.to_dict(), self.profile)))
+
     async def start(self):
         
         if self.find_by_status(StepState.ACTIVE) is not None:
@@ -324,8 +324,7 @@ class StepController:
             item["status"] = "I"
             item["id"] = shortuuid.uuid()
         list(map(lambda item: add_runtime_data(item), data.get("steps")))
-        with open(self.path, "w") as file:
-            json.dump(data, file, indent=4, sort_keys=True)
+        await self.cbpi.persistence.write(self.path, data)
         self.load()
         self.push_udpate(complete=True)
 
@@ -336,8 +335,7 @@ class StepController:
             pass
         
         data = dict(basic=dict(), steps=[])
-        with open(self.path, "w") as file:
-            json.dump(data, file, indent=4, sort_keys=True)
+        await self.cbpi.persistence.write(self.path, data)
         
         self.load()
         self.push_udpate(complete=True)
@@ -1,7 +1,6 @@
 import logging
 import os
 import shutil
-import psutil
 import pathlib
 import json
 import aiohttp
@@ -168,6 +167,8 @@ class SystemController:
 
     async def systeminfo(self):
         logging.info("SYSTEMINFO")
+        # psutil is only needed for the system page
+        import psutil
         system = "" 
         temp = 0
         cpuload = 0
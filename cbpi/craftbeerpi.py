@@ -17,7 +17,7 @@ from aiohttp import web
 from aiohttp_auth import auth
 from aiohttp_session import session_middleware
 from aiohttp_session.cookie_storage import EncryptedCookieStorage
-from aiohttp_swagger import setup_swagger
+from cbpi.api.clock import create_clock
 from cbpi.api.exceptions import CBPiException
 from voluptuous import MultipleInvalid
 
@@ -35,13 +35,14 @@ from cbpi.controller.upload_controller import UploadController
 from cbpi.controller.fermentation_controller import FermentationController
 
 from cbpi.controller.system_controller import SystemController
-from cbpi.controller.satellite_controller import SatelliteController
 
 from cbpi.controller.log_file_controller import LogController
+from cbpi.controller.persistence_controller import PersistenceController
 
 from cbpi.eventbus import CBPiEventBus
 from cbpi.http_endpoints.http_login import Login
 from cbpi.utils import *
+from cbpi.utils.startup import Startup
 from cbpi.websocket import CBPiWebSocket
 from cbpi.http_endpoints.http_actor import ActorHttpEndpoints
 
@@ -99,6 +100,7 @@ class CraftBeerPi:
 
         self.config_folder = configFolder
         self.static_config = load_config(configFolder.get_file_path("config.yaml"))
+        self.clock = create_clock(self.static_config)
         
         logger.info("Init CraftBeerPI")
 
@@ -114,6 +116,7 @@ class CraftBeerPi:
 
         self.bus = CBPiEventBus(self.app.loop, self)
         self.job = JobController(self)
+        self.persistence = PersistenceController(self)
         self.config = ConfigController(self)
         self.ws = CBPiWebSocket(self)
         self.actor = ActorController(self)
@@ -130,6 +133,8 @@ class CraftBeerPi:
         self.notification : NotificationController = NotificationController(self)
         self.satellite = None
         if str(self.static_config.get("mqtt", False)).lower() == "true":
+            # the mqtt client is only imported if mqtt is enabled
+            from cbpi.controller.satellite_controller import SatelliteController
             self.satellite: SatelliteController = SatelliteController(self)
         self.dashboard = DashboardController(self)
 
@@ -233,6 +238,7 @@ class CraftBeerPi:
         
         :return: 
         '''
+        from aiohttp_swagger import setup_swagger
         long_description = """
         This is the api for CraftBeerPi
         """
@@ -249,7 +255,7 @@ class CraftBeerPi:
     def push_update(self, topic, data, retain=False) -> None:
 
         if self.satellite is not None:
-            asyncio.create_task(self.satellite.publish(topic=topic, message=json.dumps(data), retain=retain))
+            self.satellite.push(topic, data, retain)
 
     async def call_initializer(self, app):
         self.initializer = sorted(self.initializer, key=lambda k: k['order'])
@@ -258,9 +264,11 @@ class CraftBeerPi:
             await i["method"]()
 
     def _print_logo(self):
-        from pyfiglet import Figlet
-        f = Figlet(font='big')
-        logger.info("\n%s" % f.renderText("CraftBeerPi %s " % self.version))
+        # rendering the logo with pyfiglet is slow, skip it if the log level hides it anyway
+        if logger.isEnabledFor(logging.INFO):
+            from pyfiglet import Figlet
+            f = Figlet(font='big')
+            logger.info("\n%s" % f.renderText("CraftBeerPi %s " % self.version))
         logger.info("www.CraftBeerPi.com")
         logger.info("(c) 2021/2022 Manuel Fritsch / Alexander Vollkopf")
 
@@ -281,22 +289,28 @@ class CraftBeerPi:
 
         self._print_logo()
 
-        await self.job.init()
-        
-        await self.config.init()
-        if self.satellite is not None:
-            await self.satellite.init()
         self._setup_http_index()
-        self.plugin.load_plugins()
-        self.plugin.load_plugins_from_evn()
-        await self.fermenter.init()
-        await self.sensor.init()
-        await self.step.init()
-        
-        await self.actor.init()
-        await self.kettle.init()
-        await self.call_initializer(self.app)
-        await self.dashboard.init()
+
+        async def load_plugins():
+            self.plugin.load_plugins()
+            self.plugin.load_plugins_from_evn()
+            await self.config.apply_defaults()
+
+        # independent services are started concurrently
+        self.startup = Startup()
+        self.startup.add("job", self.job.init)
+        self.startup.add("config", self.config.init)
+        if self.satellite is not None:
+            self.startup.add("satellite", self.satellite.init)
+        self.startup.add("plugins", load_plugins, depends=["job", "config"] + (["satellite"] if self.satellite is not None else []))
+        self.startup.add("sensor", self.sensor.init, depends=["plugins"])
+        self.startup.add("actor", self.actor.init, depends=["plugins"])
+        self.startup.add("kettle", self.kettle.init, depends=["sensor", "actor"])
+        self.startup.add("fermenter", self.fermenter.init, depends=["sensor", "actor"])
+        self.startup.add("step", self.step.init, depends=["kettle"])
+        self.startup.add("initializer", lambda: self.call_initializer(self.app), depends=["fermenter", "step"])
+        self.startup.add("dashboard", self.dashboard.init, depends=["initializer"])
+        await self.startup.run()
 
 
         self._swagger_setup()
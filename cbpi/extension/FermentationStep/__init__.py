@@ -14,7 +14,6 @@ from socket import timeout
 from typing import KeysView
 from cbpi.api.config import ConfigType
 from cbpi.api.base import CBPiBase
-import numpy as np
 import warnings
 
 
@@ -47,7 +46,7 @@ class FermenterNotificationStep(CBPiFermentationStep):
         self.summary=""
         self.AutoNext = False if self.props.get("AutoNext", "No") == "No" else True
         if self.timer is None:
-            self.timer = Timer(1 ,on_update=self.on_timer_update, on_done=self.on_timer_done)
+            self.timer = Timer(1 ,on_update=self.on_timer_update, on_done=self.on_timer_done, clock=self.clock)
         await self.push_update()
 
     async def on_stop(self):
@@ -57,7 +56,7 @@ class FermenterNotificationStep(CBPiFermentationStep):
 
     async def run(self):
         while self.running == True:
-            await asyncio.sleep(1)
+            await self.clock.sleep(1)
             if self.timer.is_running is not True:
                 self.timer.start()
                 self.timer.is_running = True
@@ -99,7 +98,7 @@ class FermenterTargetTempStep(CBPiFermentationStep):
             await self.setAutoMode(True)
         self.summary = "Waiting for Target Temp"
         if self.fermenter is not None and self.timer is None:
-            self.timer = Timer(1 ,on_update=self.on_timer_update, on_done=self.on_timer_done)
+            self.timer = Timer(1 ,on_update=self.on_timer_update, on_done=self.on_timer_done, clock=self.clock)
         await self.push_update()
 
     async def on_stop(self):
@@ -110,30 +109,28 @@ class FermenterTargetTempStep(CBPiFermentationStep):
         await self.push_update()
 
     async def run(self):
-        while self.get_sensor_value(self.props.get("Sensor", None)).get("value") > 900:
-            await asyncio.sleep(1)
-        self.starttemp= self.get_sensor_value(self.props.get("Sensor", None)).get("value") 
+        self.starttemp = await self.wait_for_sensor(self.props.get("Sensor", None), [getattr(self.fermenter, "heater", None), getattr(self.fermenter, "cooler", None)])
         if self.fermenter.target_temp >= self.starttemp:
             logging.info("warmup")
             while self.running == True:
-                sensor_value = self.get_sensor_value(self.props.get("Sensor", None)).get("value")
-                if sensor_value >= self.fermenter.target_temp and self.timer.is_running is not True:
+                sensor_value = self.get_good_sensor_value(self.props.get("Sensor", None))
+                if sensor_value is not None and sensor_value >= self.fermenter.target_temp and self.timer.is_running is not True:
                     self.timer.start()
                     self.timer.is_running = True
-                await asyncio.sleep(1)
+                await self.clock.sleep(1)
         elif self.fermenter.target_temp <= self.starttemp:
             logging.info("Cooldown")
             while self.running == True:
-                sensor_value = self.get_sensor_value(self.props.get("Sensor", None)).get("value")
-                if sensor_value <= self.fermenter.target_temp and self.timer.is_running is not True:
+                sensor_value = self.get_good_sensor_value(self.props.get("Sensor", None))
+                if sensor_value is not None and sensor_value <= self.fermenter.target_temp and self.timer.is_running is not True:
                     self.timer.start()
                     self.timer.is_running = True
-                await asyncio.sleep(1)
+                await self.clock.sleep(1)
         await self.push_update()
         return StepResult.DONE
 
     async def reset(self):
-        self.timer = Timer(1 ,on_update=self.on_timer_update, on_done=self.on_timer_done)
+        self.timer = Timer(1 ,on_update=self.on_timer_update, on_done=self.on_timer_done, clock=self.clock)
         self.timer.is_running == False
 
     async def setAutoMode(self, auto_state):
@@ -163,9 +160,9 @@ class FermenterStep(CBPiFermentationStep):
             self.cbpi.notify(self.name, 'Timer started', NotificationType.INFO)
             self.timer.start()
             self.timer.is_running = True
-            self.endtime = time.time() + self.fermentationtime
+            self.endtime = self.clock.time() + self.fermentationtime
             await self.update_endtime()
-            estimated_completion_time = datetime.fromtimestamp(time.time()+ self.fermentationtime)
+            estimated_completion_time = datetime.fromtimestamp(self.clock.time()+ self.fermentationtime)
             self.cbpi.notify(self.name, 'Timer started. Estimated completion: {}'.format(estimated_completion_time.strftime("%d.%m, %H:%M")), NotificationType.INFO)
         else:
             self.cbpi.notify(self.name, 'Timer is already running', NotificationType.WARNING)
@@ -203,7 +200,7 @@ class FermenterStep(CBPiFermentationStep):
             timeM=int(self.props.get("TimerM", 0))
             self.fermentationtime=(timeM+(60*timeH)+(1440*timeD)) *60
         else:
-            self.fermentationtime = self.endtime - time.time()
+            self.fermentationtime = self.endtime - self.clock.time()
 
         self.AutoMode = True if self.props.get("AutoMode", "No") == "Yes" else False
         if self.fermenter is not None:
@@ -215,13 +212,13 @@ class FermenterStep(CBPiFermentationStep):
 
         if self.fermenter is not None and self.timer is None:
             logging.info("Set Timer")
-            self.timer = Timer(self.fermentationtime ,on_update=self.on_timer_update, on_done=self.on_timer_done)
+            self.timer = Timer(self.fermentationtime ,on_update=self.on_timer_update, on_done=self.on_timer_done, clock=self.clock)
             self.timer.is_running = False
         elif self.fermenter is not None:
             try:
                 if self.timer.is_running == True:
                     self.timer.start()
-                    self.endtime = time.time() + self.fermentationtime
+                    self.endtime = self.clock.time() + self.fermentationtime
                     await self.update_endtime()
             except:
                 pass
@@ -229,7 +226,7 @@ class FermenterStep(CBPiFermentationStep):
         if self.endtime != 0 and self.timer is not None and self.timer.is_running == False:
             self.timer.start()
             self.timer.is_running = True
-            estimated_completion_time = datetime.fromtimestamp(time.time()+ self.fermentationtime)
+            estimated_completion_time = datetime.fromtimestamp(self.clock.time()+ self.fermentationtime)
             self.cbpi.notify(self.name, 'Timer restarted. Estimated completion: {}'.format(estimated_completion_time.strftime("%d.%m, %H:%M")), NotificationType.INFO)
 
 
@@ -248,38 +245,36 @@ class FermenterStep(CBPiFermentationStep):
         timeH=int(self.props.get("TimerH", 0))
         timeM=int(self.props.get("TimerM", 0))
         self.fermentationtime=(timeM+(60*timeH)+(1440*timeD)) *60
-        self.timer = Timer(self.fermentationtime ,on_update=self.on_timer_update, on_done=self.on_timer_done)
+        self.timer = Timer(self.fermentationtime ,on_update=self.on_timer_update, on_done=self.on_timer_done, clock=self.clock)
         self.endtime = 0
         self.timer.is_running == False
 
     async def run(self):
-        while self.get_sensor_value(self.props.get("Sensor", None)).get("value") > 900:
-            await asyncio.sleep(1)
-        self.starttemp= self.get_sensor_value(self.props.get("Sensor", None)).get("value")
+        self.starttemp = await self.wait_for_sensor(self.props.get("Sensor", None), [getattr(self.fermenter, "heater", None), getattr(self.fermenter, "cooler", None)])
 
         if self.fermenter.target_temp >= self.starttemp:
             logging.info("warmup")
             while self.running == True:
-                await asyncio.sleep(1)
-                sensor_value = self.get_sensor_value(self.props.get("Sensor", None)).get("value")
-                if sensor_value >= self.fermenter.target_temp and self.timer.is_running is not True:
+                await self.clock.sleep(1)
+                sensor_value = self.get_good_sensor_value(self.props.get("Sensor", None))
+                if sensor_value is not None and sensor_value >= self.fermenter.target_temp and self.timer.is_running is not True:
                     self.timer.start()
                     self.timer.is_running = True
-                    self.endtime = time.time() + self.fermentationtime
+                    self.endtime = self.clock.time() + self.fermentationtime
                     await self.update_endtime()
-                    estimated_completion_time = datetime.fromtimestamp(time.time()+ self.fermentationtime)
+                    estimated_completion_time = datetime.fromtimestamp(self.clock.time()+ self.fermentationtime)
                     self.cbpi.notify(self.name, 'Timer started. Estimated completion: {}'.format(estimated_completion_time.strftime("%d.%m, %H:%M")), NotificationType.INFO)
         elif self.fermenter.target_temp <= self.starttemp:
             logging.info("cooldown")
             while self.running == True:
-                await asyncio.sleep(1)
-                sensor_value = self.get_sensor_value(self.props.get("Sensor", None)).get("value")
-                if sensor_value <= self.fermenter.target_temp and self.timer.is_running is not True:
+                await self.clock.sleep(1)
+                sensor_value = self.get_good_sensor_value(self.props.get("Sensor", None))
+                if sensor_value is not None and sensor_value <= self.fermenter.target_temp and self.timer.is_running is not True:
                     self.timer.start()
                     self.timer.is_running = True
-                    self.endtime = time.time() + self.fermentationtime
+                    self.endtime = self.clock.time() + self.fermentationtime
                     await self.update_endtime()
-                    estimated_completion_time = datetime.fromtimestamp(time.time()+ self.fermentationtime)
+                    estimated_completion_time = datetime.fromtimestamp(self.clock.time()+ self.fermentationtime)
                     self.cbpi.notify(self.name, 'Timer started. Estimated completion: {}'.format(estimated_completion_time.strftime("%d.%m, %H:%M")), NotificationType.INFO)
 
         return StepResult.DONE
@@ -295,6 +290,26 @@ class FermenterStep(CBPiFermentationStep):
         except Exception as e:
             logging.error("Failed to switch on FermenterLogic {} {}".format(self.fermenter.id, e))
 
+def ramp_schedule(start_temp, target_temp, rate):
+    '''
+    Breakpoints of a ramp, the target temp rounded to 0.1° only changes at these times.
+
+    :param start_temp: temperature at the start of the ramp
+    :param target_temp: temperature at the end of the ramp
+    :param rate: degrees per day
+    :return: list of (seconds after the start, target temp)
+    '''
+    start, end = round(start_temp * 10), round(target_temp * 10)
+    rate = abs(float(rate)) * 10 / 86400
+    if rate == 0 or start == end:
+        return [(0, round(target_temp * 10) / 10)]
+    direction = 1 if end > start else -1
+    schedule = [(0, start / 10)]
+    for value in range(start + direction, end + direction, direction):
+        # the rounded value changes halfway between two tenths
+        schedule.append((abs(value - direction / 2 - start_temp * 10) / rate, value / 10))
+    return schedule
+
 @parameters([Property.Number(label="Temp", configurable=True, description = "Ramp to this temp"),
              Property.Number(label="Pressure", configurable=True, description="Step Pressure"),
              Property.Number(label="RampRate", configurable=True, description = "Ramp x °C/F per  day. Default: 1"),
@@ -314,6 +329,8 @@ class FermenterRampTempStep(CBPiFermentationStep):
         if self.AutoMode == True:
             await self.setAutoMode(False)
         self.cbpi.notify(self.name, self.props.get("Notification","Target Temp reached. Please add malt and klick next to move on."))
+        # the ramp is over, next() moves on to the next step
+        self.finished.set()
         await self.next(self.fermenter.id)
         return StepResult.DONE
         
@@ -323,15 +340,14 @@ class FermenterRampTempStep(CBPiFermentationStep):
 
     async def on_start(self):
         self.shutdown = False
+        self.finished = asyncio.Event()
         self.AutoMode = True if self.props.get("AutoMode","No") == "Yes" else False
         self.rate=float(self.props.get("RampRate",1))
         logging.info(self.rate)
         self.target_temp = round(float(self.props.get("Temp", 0))*10)/10
         logging.info(self.target_temp)
         self.fermenter.target_pressure = float(self.props.get("Pressure", 0))
-        while self.get_sensor_value(self.props.get("Sensor", None)).get("value") > 900:
-            await asyncio.sleep(1)
-        self.starttemp = self.get_sensor_value(self.props.get("Sensor", None)).get("value")
+        self.starttemp = await self.wait_for_sensor(self.props.get("Sensor", None), [getattr(self.fermenter, "heater", None), getattr(self.fermenter, "cooler", None)])
 
         self.current_target_temp = self.starttemp
         if self.fermenter is not None:
@@ -340,63 +356,57 @@ class FermenterRampTempStep(CBPiFermentationStep):
             await self.setAutoMode(True)
         self.summary = "Ramping to {}° with {}° per day".format(self.target_temp,self.rate)
         if self.fermenter is not None and self.timer is None:
-            self.timer = Timer(1 ,on_update=self.on_timer_update, on_done=self.on_timer_done)
+            self.timer = Timer(1 ,on_update=self.on_timer_update, on_done=self.on_timer_done, clock=self.clock)
         await self.push_update()
 
     async def on_stop(self):
+        self.finished.set()
         await self.timer.stop()
         self.summary = ""
         if self.AutoMode == True:
             await self.setAutoMode(False)
+        # keep the target temp the ramp stopped at
+        self.cbpi.fermenter.save()
         await self.push_update()
 
-    async def calc_target_temp(self):
-        delta_time = time.time() - self.starttime
-        current_target_temp = round((self.starttemp + delta_time * self.ratesecond)*10)/10
-#        logging.info(current_target_temp)
-        if current_target_temp != self.current_target_temp:
-            self.current_target_temp = current_target_temp
-            await self.set_fermenter_target_temp(self.fermenter.id, self.current_target_temp)
-            #self.fermenter.target_temp = self.current_target_temp
-            await self.push_update()
-
-        pass
+    def on_sensor_value(self, id, reading):
+        if reading.value is None or self.timer is None or self.timer.is_running is True:
+            return
+        if (self.warmup and reading.value >= self.target_temp) or (not self.warmup and reading.value <= self.target_temp):
+            self.timer.start()
+            self.timer.is_running = True
 
     async def run(self): 
-        self.delta_temp = self.target_temp-self.starttemp
+        self.warmup = self.target_temp >= self.starttemp
+        logging.info("warmup" if self.warmup else "Cooldown")
+        self.schedule = ramp_schedule(self.starttemp, self.target_temp, self.rate)
+        self.starttime = self.clock.monotonic()
+
+        # the timer starts as soon as the sensor reaches the target temp
+        sensor = self.props.get("Sensor", None)
+        self.cbpi.sensor.subscribe(sensor, self.on_sensor_value)
         try:
-            self.deltadays = abs(self.delta_temp / self.rate)
-            self.deltaseconds = self.deltadays * 24 * 60 * 60
-            self.ratesecond = self.delta_temp/self.deltaseconds
-        except Exception as e:
-            logging.info(e)
-        self.starttime=time.time()
-        
-        if self.target_temp >= self.starttemp:
-            logging.info("warmup")
-            while self.running == True:
-                if self.current_target_temp != self.target_temp:
-                    await self.calc_target_temp()
-                sensor_value = self.get_sensor_value(self.props.get("Sensor", None)).get("value")
-                if sensor_value >= self.target_temp and self.timer.is_running is not True:
-                    self.timer.start()
-                    self.timer.is_running = True
-                await asyncio.sleep(1)
-        elif self.target_temp <= self.starttemp:
-            logging.info("Cooldown")
-            while self.running == True:
-                if self.current_target_temp != self.target_temp:
-                    await self.calc_target_temp()
-                sensor_value = self.get_sensor_value(self.props.get("Sensor", None)).get("value")
-                if sensor_value <= self.target_temp and self.timer.is_running is not True:
-                    self.timer.start()
-                    self.timer.is_running = True
-                await asyncio.sleep(1)
+            self.on_sensor_value(sensor, self.get_sensor_reading(sensor))
+            for index, (seconds, temp) in enumerate(self.schedule):
+                try:
+                    # sleep until the next breakpoint unless the timer ends the ramp first
+                    await self.clock.wait_for(self.finished.wait(), max(seconds - (self.clock.monotonic() - self.starttime), 0))
+                    break
+                except asyncio.TimeoutError:
+                    pass
+                self.current_target_temp = temp
+                # the final target is saved, the steps in between are only pushed
+                await self.cbpi.fermenter.set_target_temp(self.fermenter.id, temp, persist=index == len(self.schedule) - 1)
+                await self.push_update()
+            # wait until the timer has ended or the step is stopped
+            await self.finished.wait()
+        finally:
+            self.cbpi.sensor.unsubscribe(sensor, self.on_sensor_value)
         await self.push_update()
         return StepResult.DONE
 
     async def reset(self):
-        self.timer = Timer(1 ,on_update=self.on_timer_update, on_done=self.on_timer_done)
+        self.timer = Timer(1 ,on_update=self.on_timer_update, on_done=self.on_timer_done, clock=self.clock)
         self.timer.is_running == False
 
     async def setAutoMode(self, auto_state):
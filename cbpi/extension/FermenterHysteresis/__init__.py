@@ -65,9 +65,19 @@ class FermenterHysteresis(CBPiFermenterLogic):
             heater = self.cbpi.actor.find_by_id(self.heater)
             cooler = self.cbpi.actor.find_by_id(self.cooler)
 
+            await self.wait_for_sensor(self.fermenter.sensor, [self.heater, self.cooler])
             while self.running == True:
                 
-                sensor_value = float(self.get_sensor_value(self.fermenter.sensor).get("value"))
+                sensor_value = self.get_good_sensor_value(self.fermenter.sensor)
+                if sensor_value is None:
+                    # missing or stale value
+                    if self.heater:
+                        await self.actor_off(self.heater)
+                    if self.cooler:
+                        await self.actor_off(self.cooler)
+                    await self.clock.sleep(1)
+                    continue
+                sensor_value = float(sensor_value)
                 target_temp = float(self.get_fermenter_target_temp(self.id))
 
                 try:
@@ -95,7 +105,7 @@ class FermenterHysteresis(CBPiFermenterLogic):
                     if self.cooler and (cooler_state == True):
                         await self.actor_off(self.cooler)
 
-                await asyncio.sleep(1)
+                await self.clock.sleep(1)
 
         except asyncio.CancelledError as e:
             pass
@@ -131,20 +141,30 @@ class FermenterSpundingHysteresis(CBPiFermenterLogic):
             await self.actor_off(self.valve)
             #logging.info("Closing Spunding Valve")
 
+            await self.wait_for_sensor(self.fermenter.pressure_sensor, [self.valve])
             while self.running:
                 target_pressure=float(self.fermenter.target_pressure)
-                current_pressure = float(self.get_sensor_value(self.fermenter.pressure_sensor).get("value"))
+                current_pressure = self.get_good_sensor_value(self.fermenter.pressure_sensor)
+                if current_pressure is None:
+                    # missing or stale value, keep the valve closed
+                    await self.actor_off(self.valve)
+                    await self.clock.sleep(1)
+                    continue
+                current_pressure = float(current_pressure)
                 #logging.info(f'Target: {target_pressure} | Current: {current_pressure}')
                 if current_pressure >= (target_pressure + self.spunding_offset) and target_pressure !=0:
                     while current_pressure >= target_pressure:
                         await self.actor_on(self.valve) 
-                        await asyncio.sleep(self.valverelease)
+                        await self.clock.sleep(self.valverelease)
                         await self.actor_off(self.valve) 
-                        await asyncio.sleep(self.pause)
-                        current_pressure = float(self.get_sensor_value(self.fermenter.pressure_sensor).get("value"))
+                        await self.clock.sleep(self.pause)
+                        current_pressure = self.get_good_sensor_value(self.fermenter.pressure_sensor)
+                        if current_pressure is None:
+                            break
+                        current_pressure = float(current_pressure)
                         #logging.info("Value higher than target: Spunding loop is running")
 
-                await asyncio.sleep(1)
+                await self.clock.sleep(1)
         else:
             logging.info("No valve or pressure sensor defined")
 
@@ -157,9 +177,19 @@ class FermenterSpundingHysteresis(CBPiFermenterLogic):
             heater = self.cbpi.actor.find_by_id(self.heater)
             cooler = self.cbpi.actor.find_by_id(self.cooler)
 
+            await self.wait_for_sensor(self.fermenter.sensor, [self.heater, self.cooler])
             while self.running == True:
                 
-                sensor_value = float(self.get_sensor_value(self.fermenter.sensor).get("value"))
+                sensor_value = self.get_good_sensor_value(self.fermenter.sensor)
+                if sensor_value is None:
+                    # missing or stale value
+                    if self.heater:
+                        await self.actor_off(self.heater)
+                    if self.cooler:
+                        await self.actor_off(self.cooler)
+                    await self.clock.sleep(1)
+                    continue
+                sensor_value = float(sensor_value)
                 target_temp = float(self.get_fermenter_target_temp(self.id))
 
                 try:
@@ -187,7 +217,7 @@ class FermenterSpundingHysteresis(CBPiFermenterLogic):
                     if self.cooler and (cooler_state == True):
                         await self.actor_off(self.cooler)
 
-                await asyncio.sleep(1)
+                await self.clock.sleep(1)
     
     async def run(self):
         try:
@@ -9,17 +9,15 @@ from cbpi.api.dataclasses import Kettle, Props, Fermenter
 @parameters([])
 class CustomSensor(CBPiSensor):
 
+    sampling_interval = 1
+
     def __init__(self, cbpi, id, props):
         super(CustomSensor, self).__init__(cbpi, id, props)
         self.value = 0
 
-    async def run(self):
-        while self.running:
-            self.value = random.randint(10, 100)
-            self.log_data(self.value)
-
-            self.push_update(self.value)
-            await asyncio.sleep(1)
+    async def read(self):
+        self.value = random.randint(10, 100)
+        return self.value
 
     def get_state(self):
         return dict(value=self.value)
@@ -30,6 +28,8 @@ class CustomSensor(CBPiSensor):
              Property.Fermenter(label="Fermenter",description="Fermenter")])
 class DummyPressure(CBPiSensor):
 
+    sampling_interval = 1
+
     def __init__(self, cbpi, id, props):
         super(DummyPressure, self).__init__(cbpi, id, props)
         self.value = float(self.props.get("Pressure",0))
@@ -37,28 +37,25 @@ class DummyPressure(CBPiSensor):
         self.fermenter=self.get_fermenter(fermenter)
         self.valve=self.fermenter.valve
 
-    async def run(self):
+    async def start(self):
+        await super().start()
         self.uprate=float(self.props.get("PressureIncrease",0))/3600
         self.decrease=float(self.props.get("PressureDecrease",0))
         logging.info(self.uprate)
         logging.info(self.decrease)
 
-        while self.running:
-            valve_state=self.get_actor_state(self.valve)
-            fermenter_instance=self.fermenter.instance
-            if fermenter_instance:
-                fermenter_state=fermenter_instance.state
-            else:
-                fermenter_state = False
-            if valve_state == False and fermenter_state:
-                self.value = self.value + self.uprate
-            elif valve_state and fermenter_state:
-                self.value=self.value-self.decrease
-
-            self.log_data(self.value)
-
-            self.push_update(round(self.value,2))
-            await asyncio.sleep(1)
+    async def read(self):
+        valve_state=self.get_actor_state(self.valve)
+        fermenter_instance=self.fermenter.instance
+        if fermenter_instance:
+            fermenter_state=fermenter_instance.state
+        else:
+            fermenter_state = False
+        if valve_state == False and fermenter_state:
+            self.value = self.value + self.uprate
+        elif valve_state and fermenter_state:
+            self.value=self.value-self.decrease
+        return round(self.value,2)
 
     def get_state(self):
         return dict(value=self.value)
@@ -8,12 +8,30 @@ import re
 import logging
 from cbpi.api.dataclasses import NotificationAction, NotificationType
 
+# values of keys without a running sensor, picked up when a sensor with the key starts
 cache = {}
+# key -> running sensors with the key
+sensors = {}
+
+def publish(key, value, timestamp=None):
+    '''
+    Pass a value to the sensors with the key
+
+    :return: True if a sensor with the key is running
+    '''
+    listeners = sensors.get(key)
+    if not listeners:
+        cache[key] = value
+        return False
+    for sensor in list(listeners):
+        sensor.on_value(value, timestamp)
+    return True
 
 @parameters([Property.Text(label="Key", configurable=True, description="Http Key"),
              Property.Number(label="Timeout", configurable="True",unit="sec",description="Timeout in seconds to send notification (default:60 | deactivated: 0)")
 ])
 class HTTPSensor(CBPiSensor):
+
     def __init__(self, cbpi, id, props):
         super(HTTPSensor, self).__init__(cbpi, id, props)
         self.running = True
@@ -24,46 +42,87 @@ class HTTPSensor(CBPiSensor):
         self.nextchecktime=self.starttime+self.timeout
         self.sensor=self.get_sensor(self.id)
         self.lastdata=time.time()
+        self.last_timestamp = None
+        self.received = asyncio.Event()
+
+    async def start(self):
+        await super().start()
+        self.key = self.props.get("Key")
+        sensors.setdefault(self.key, []).append(self)
+        cache_value = cache.pop(self.key, None)
+        if cache_value is not None:
+            self.on_value(cache_value)
+
+    async def stop(self):
+        self.unregister()
+        self.received.set()
+
+    async def on_stop(self):
+        self.unregister()
+
+    def unregister(self):
+        listeners = sensors.get(self.props.get("Key"), [])
+        if self in listeners:
+            listeners.remove(self)
+            if len(listeners) == 0:
+                del sensors[self.props.get("Key")]
 
     async def Confirm(self, **kwargs):
         self.nextchecktime = time.time() + self.timeout
         self.notificationsend = False
-        pass
+        self.received.set()
 
     async def message(self):
         target_timestring= datetime.fromtimestamp(self.lastdata)
         self.cbpi.notify("HTTPSensor Timeout", "Sensor '" + str(self.sensor.name) + "' did not respond.  Last data received: "+target_timestring.strftime("%D %H:%M"), NotificationType.WARNING, action=[NotificationAction("OK", self.Confirm)])
         pass
 
+    def on_value(self, value, timestamp=None):
+        '''
+        Called by the endpoint when a value for the key arrives
+
+        :param value: sensor value
+        :param timestamp: unix time of the measurement, older values than the last one are ignored
+        '''
+        if timestamp is not None:
+            if self.last_timestamp is not None and timestamp < self.last_timestamp:
+                return
+            self.last_timestamp = timestamp
+        try:
+            self.value = float(value)
+        except (TypeError, ValueError):
+            logging.error("HTTPSensor {} invalid value {}".format(self.id, value))
+            return
+        self.publish(self.value)
+        if self.timeout !=0:
+            self.nextchecktime = time.time() + self.timeout
+            self.notificationsend = False
+            self.lastdata=time.time()
+        self.received.set()
+
     async def run(self):
         '''
-        This method is executed asynchronousely 
-        In this example the code is executed every second
+        Values are pushed by the endpoint, the loop only wakes up for the timeout notification
         '''
         while self.running is True:
-            if self.timeout !=0:
-                currenttime=time.time()            
-                if currenttime > self.nextchecktime and self.notificationsend == False:   
-                    await self.message()
-                    self.notificationsend=True
+            self.received.clear()
+            timeout = None
+            if self.timeout != 0 and self.notificationsend == False:
+                timeout = max(self.nextchecktime - time.time(), 0)
             try:
-                cache_value = cache.pop(self.props.get("Key"), None)
-                if cache_value is not None:
-                    self.value = float(cache_value)
-                    self.push_update(self.value)
-                    if self.timeout !=0:
-                        self.nextchecktime = currenttime + self.timeout
-                        self.notificationsend = False
-                        self.lastdata=time.time()
-            except Exception as e:
-                logging.error(e)
-                pass
-            await asyncio.sleep(1)
+                await asyncio.wait_for(self.received.wait(), timeout=timeout)
+            except asyncio.TimeoutError:
+                await self.message()
+                self.notificationsend=True
 
     def get_state(self):
         # return the current state of the sensor
         return dict(value=self.value)
 
+    def expected_interval(self):
+        # values are pushed, a value is expected at least every timeout seconds
+        return self.timeout if self.timeout > 0 else None
+
 class HTTPSensorEndpoint(CBPiExtension):
 
 
@@ -105,7 +164,6 @@ class HTTPSensorEndpoint(CBPiExtension):
                 description: successful operation
         """
 
-        global cache
         key = request.match_info['key']
         value = request.match_info['value']
         if self.pattern_check.match(key) is None:
@@ -114,11 +172,65 @@ class HTTPSensorEndpoint(CBPiExtension):
         if self.pattern_check.match(value) is None:
             return web.json_response(status=422, data={'error': "Data not matching pattern ^[a-zA-Z0-9,.]{0,10}$"})
 
-        
-        cache[key] = value
+        publish(key, value)
 
         return web.Response(status=204)
 
+    @request_mapping(path="/batch", method="POST", auth_required=False)
+    async def http_new_values(self, request):
+        """
+        ---
+        description: Post many sensor values at once, e.g. buffered readings of a gateway
+        tags:
+        - HttpSensor
+        parameters:
+        - in: body
+          name: body
+          description: List of values. The timestamp (unix time) is optional, only the newest value of a key is used.
+          required: true
+          schema:
+            type: array
+            items:
+              type: object
+              properties:
+                key:
+                  type: string
+                value:
+                  type: number
+                timestamp:
+                  type: number
+        responses:
+            "200":
+                description: number of accepted values and keys without a sensor
+            "422":
+                description: invalid data
+        """
+        try:
+            data = await request.json()
+        except ValueError:
+            return web.json_response(status=422, data={'error': "Body is not valid json"})
+        if isinstance(data, list) is False:
+            return web.json_response(status=422, data={'error': "Body has to be a list of key, value and timestamp"})
+
+        latest = {}
+        for position, item in enumerate(data):
+            try:
+                key = str(item["key"])
+                value = float(item["value"])
+                timestamp = item.get("timestamp")
+                timestamp = float(timestamp) if timestamp is not None else None
+            except (KeyError, TypeError, ValueError, AttributeError):
+                return web.json_response(status=422, data={'error': "Invalid entry at position {}".format(position)})
+            if self.pattern_check.match(key) is None:
+                return web.json_response(status=422, data={'error': "Key not matching pattern ^[a-zA-Z0-9,.]{0,10}$"})
+            # entries without timestamp are in order
+            previous = latest.get(key)
+            if previous is None or timestamp is None or previous[1] is None or timestamp >= previous[1]:
+                latest[key] = (value, timestamp)
+
+        unknown = [key for key, (value, timestamp) in latest.items() if publish(key, value, timestamp) is False]
+        return web.json_response(data=dict(accepted=len(data), unknown=unknown))
+
 
 def setup(cbpi):
 
@@ -18,15 +18,21 @@ class Hysteresis(CBPiKettleLogic):
             # self.get_actor_state()
 	    
 
+            await self.wait_for_sensor(self.kettle.sensor, [self.heater])
             while self.running == True:
                 
-                sensor_value = self.get_sensor_value(self.kettle.sensor).get("value")
+                sensor_value = self.get_good_sensor_value(self.kettle.sensor)
+                if sensor_value is None:
+                    # missing or stale value
+                    await self.actor_off(self.heater)
+                    await self.clock.sleep(1)
+                    continue
                 target_temp = self.get_kettle_target_temp(self.id)
                 if sensor_value < target_temp - self.offset_on:
                     await self.actor_on(self.heater)
                 elif sensor_value >= target_temp - self.offset_off:
                     await self.actor_off(self.heater)
-                await asyncio.sleep(1)
+                await self.clock.sleep(1)
 
         except asyncio.CancelledError as e:
             pass
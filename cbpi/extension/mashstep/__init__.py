@@ -14,7 +14,6 @@ from socket import timeout
 from typing import KeysView
 from cbpi.api.config import ConfigType
 from cbpi.api.base import CBPiBase
-import numpy as np
 import warnings
 
 
@@ -43,7 +42,7 @@ class NotificationStep(CBPiStep):
         self.summary=""
         self.AutoNext = False if self.props.get("AutoNext", "No") == "No" else True
         if self.timer is None:
-            self.timer = Timer(1 ,on_update=self.on_timer_update, on_done=self.on_timer_done)
+            self.timer = Timer(1 ,on_update=self.on_timer_update, on_done=self.on_timer_done, clock=self.clock)
         await self.push_update()
 
     async def on_stop(self):
@@ -53,7 +52,7 @@ class NotificationStep(CBPiStep):
 
     async def run(self):
         while self.running == True:
-            await asyncio.sleep(1)
+            await self.clock.sleep(1)
             if self.timer.is_running is not True:
                 self.timer.start()
                 self.timer.is_running = True
@@ -90,7 +89,7 @@ class MashInStep(CBPiStep):
             await self.setAutoMode(True)
         self.summary = "Waiting for Target Temp"
         if self.cbpi.kettle is not None and self.timer is None:
-            self.timer = Timer(1 ,on_update=self.on_timer_update, on_done=self.on_timer_done)
+            self.timer = Timer(1 ,on_update=self.on_timer_update, on_done=self.on_timer_done, clock=self.clock)
         await self.push_update()
 
     async def on_stop(self):
@@ -101,17 +100,18 @@ class MashInStep(CBPiStep):
         await self.push_update()
 
     async def run(self):
+        await self.wait_for_sensor(self.props.get("Sensor", None), [getattr(self.kettle, "heater", None)])
         while self.running == True:
-           await asyncio.sleep(1)
-           sensor_value = self.get_sensor_value(self.props.get("Sensor", None)).get("value")
-           if sensor_value >= int(self.props.get("Temp",0)) and self.timer.is_running is not True:
+           await self.clock.sleep(1)
+           sensor_value = self.get_good_sensor_value(self.props.get("Sensor", None))
+           if sensor_value is not None and sensor_value >= self.props.int("Temp", 0) and self.timer.is_running is not True:
                self.timer.start()
                self.timer.is_running = True
         await self.push_update()
         return StepResult.DONE
 
     async def reset(self):
-        self.timer = Timer(1 ,on_update=self.on_timer_update, on_done=self.on_timer_done)
+        self.timer = Timer(1 ,on_update=self.on_timer_update, on_done=self.on_timer_done, clock=self.clock)
 
     async def setAutoMode(self, auto_state):
         try:
@@ -173,7 +173,7 @@ class MashStep(CBPiStep):
         await self.push_update()
 
         if self.cbpi.kettle is not None and self.timer is None:
-            self.timer = Timer(int(self.props.get("Timer",0)) *60 ,on_update=self.on_timer_update, on_done=self.on_timer_done)
+            self.timer = Timer(int(self.props.get("Timer",0)) *60 ,on_update=self.on_timer_update, on_done=self.on_timer_done, clock=self.clock)
         elif self.cbpi.kettle is not None:
             try:
                 if self.timer.is_running == True:
@@ -192,16 +192,17 @@ class MashStep(CBPiStep):
         await self.push_update()
 
     async def reset(self):
-        self.timer = Timer(int(self.props.get("Timer",0)) *60 ,on_update=self.on_timer_update, on_done=self.on_timer_done)
+        self.timer = Timer(int(self.props.get("Timer",0)) *60 ,on_update=self.on_timer_update, on_done=self.on_timer_done, clock=self.clock)
 
     async def run(self):
+        await self.wait_for_sensor(self.props.get("Sensor", None), [getattr(self.kettle, "heater", None)])
         while self.running == True:
-            await asyncio.sleep(1)
-            sensor_value = self.get_sensor_value(self.props.get("Sensor", None)).get("value")
-            if sensor_value >= int(self.props.get("Temp",0)) and self.timer.is_running is not True:
+            await self.clock.sleep(1)
+            sensor_value = self.get_good_sensor_value(self.props.get("Sensor", None))
+            if sensor_value is not None and sensor_value >= self.props.int("Temp", 0) and self.timer.is_running is not True:
                 self.timer.start()
                 self.timer.is_running = True
-                estimated_completion_time = datetime.fromtimestamp(time.time()+ (int(self.props.get("Timer",0)))*60)
+                estimated_completion_time = datetime.fromtimestamp(self.clock.time()+ (int(self.props.get("Timer",0)))*60)
                 self.cbpi.notify(self.name, 'Timer started. Estimated completion: {}'.format(estimated_completion_time.strftime("%H:%M")), NotificationType.INFO)
         return StepResult.DONE
 
@@ -230,7 +231,7 @@ class WaitStep(CBPiStep):
 
     async def on_start(self):
         if self.timer is None:
-            self.timer = Timer(int(self.props.Timer) * 60, on_update=self.on_timer_update, on_done=self.on_timer_done)
+            self.timer = Timer(int(self.props.Timer) * 60, on_update=self.on_timer_update, on_done=self.on_timer_done, clock=self.clock)
         self.timer.start()
 
     async def on_stop(self):
@@ -239,11 +240,11 @@ class WaitStep(CBPiStep):
         await self.push_update()
 
     async def reset(self):
-        self.timer = Timer(int(self.props.Timer) * 60, on_update=self.on_timer_update, on_done=self.on_timer_done)
+        self.timer = Timer(int(self.props.Timer) * 60, on_update=self.on_timer_update, on_done=self.on_timer_done, clock=self.clock)
 
     async def run(self):
         while self.running == True:
-            await asyncio.sleep(1)
+            await self.clock.sleep(1)
         return StepResult.DONE
 
 
@@ -260,7 +261,7 @@ class ToggleStep(CBPiStep):
 
     async def on_start(self):
         if self.timer is None:
-            self.timer = Timer(1, on_update=self.on_timer_update, on_done=self.on_timer_done)
+            self.timer = Timer(1, on_update=self.on_timer_update, on_done=self.on_timer_done, clock=self.clock)
         self.timer.start()
         self.type=self.props.get("toggle_type","Off")
         self.Actor=self.props.get("Actor", None)
@@ -276,11 +277,11 @@ class ToggleStep(CBPiStep):
         await self.push_update()
 
     async def reset(self):
-        self.timer = Timer(1, on_update=self.on_timer_update, on_done=self.on_timer_done)
+        self.timer = Timer(1, on_update=self.on_timer_update, on_done=self.on_timer_done, clock=self.clock)
 
     async def run(self):
         while self.running == True:
-            await asyncio.sleep(1)
+            await self.clock.sleep(1)
         return StepResult.DONE
 
 @parameters([Property.Number(label="Timer", description="Time in Minutes", configurable=True),
@@ -296,7 +297,7 @@ class ActorStep(CBPiStep):
 
     async def on_start(self):
         if self.timer is None:
-            self.timer = Timer(int(self.props.Timer) * 60, on_update=self.on_timer_update, on_done=self.on_timer_done)
+            self.timer = Timer(int(self.props.Timer) * 60, on_update=self.on_timer_update, on_done=self.on_timer_done, clock=self.clock)
         self.timer.start()
         await self.actor_on(self.props.Actor)
 
@@ -307,11 +308,11 @@ class ActorStep(CBPiStep):
         await self.push_update()
 
     async def reset(self):
-        self.timer = Timer(int(self.props.Timer) * 60, on_update=self.on_timer_update, on_done=self.on_timer_done)
+        self.timer = Timer(int(self.props.Timer) * 60, on_update=self.on_timer_update, on_done=self.on_timer_done, clock=self.clock)
 
     async def run(self):
         while self.running == True:
-            await asyncio.sleep(1)
+            await self.clock.sleep(1)
         return StepResult.DONE
 
 
@@ -383,7 +384,7 @@ class BoilStep(CBPiStep):
             self.kettle.target_temp = int(self.props.get("Temp", 0))
 
         if self.cbpi.kettle is not None and self.timer is None:
-            self.timer = Timer(int(self.props.get("Timer", 0)) *60 ,on_update=self.on_timer_update, on_done=self.on_timer_done)
+            self.timer = Timer(int(self.props.get("Timer", 0)) *60 ,on_update=self.on_timer_update, on_done=self.on_timer_done, clock=self.clock)
 
         elif self.cbpi.kettle is not None:
             try:
@@ -415,9 +416,10 @@ class BoilStep(CBPiStep):
         await self.push_update()
 
     async def reset(self):
-        self.timer = Timer(int(self.props.get("Timer", 0)) *60 ,on_update=self.on_timer_update, on_done=self.on_timer_done)
+        self.timer = Timer(int(self.props.get("Timer", 0)) *60 ,on_update=self.on_timer_update, on_done=self.on_timer_done, clock=self.clock)
 
     async def run(self):
+        await self.wait_for_sensor(self.props.get("Sensor", None), [getattr(self.kettle, "heater", None)])
         if self.first_wort_hop_flag == False and self.first_wort_hop == "Yes":
             self.first_wort_hop_flag = True
             if self.first_wort_hop_text is not None and self.first_wort_hop_text != "":
@@ -426,17 +428,17 @@ class BoilStep(CBPiStep):
                 self.cbpi.notify('First Wort Hop Addition!', 'Please add hops for first wort', NotificationType.INFO)
 
         while self.running == True:
-            await asyncio.sleep(1)
-            sensor_value = self.get_sensor_value(self.props.get("Sensor", None)).get("value")
+            await self.clock.sleep(1)
+            sensor_value = self.get_good_sensor_value(self.props.get("Sensor", None))
             
-            if self.lid_flag == True and sensor_value >= self.lid_temp:
+            if self.lid_flag == True and sensor_value is not None and sensor_value >= self.lid_temp:
                 self.cbpi.notify("Please remove lid!", "Reached temp close to boiling", NotificationType.INFO)
                 self.lid_flag = False
 
-            if sensor_value >= int(self.props.get("Temp", 0)) and self.timer.is_running is not True:
+            if sensor_value is not None and sensor_value >= self.props.int("Temp", 0) and self.timer.is_running is not True:
                 self.timer.start()
                 self.timer.is_running = True
-                estimated_completion_time = datetime.fromtimestamp(time.time()+ (int(self.props.get("Timer", 0)))*60)
+                estimated_completion_time = datetime.fromtimestamp(self.clock.time()+ (int(self.props.get("Timer", 0)))*60)
                 self.cbpi.notify(self.name, 'Timer started. Estimated completion: {}'.format(estimated_completion_time.strftime("%H:%M")), NotificationType.INFO)
             else:
                 for x in range(1, 6):
@@ -473,6 +475,8 @@ class CooldownStep(CBPiStep):
         await self.push_update()
 
     async def on_start(self):
+        # numpy is only needed for the cooldown estimation, so it's not imported on startup
+        import numpy as np
         warnings.simplefilter('ignore', np.RankWarning)
         self.temp_array = []
         self.time_array = []
@@ -483,10 +487,10 @@ class CooldownStep(CBPiStep):
 
         self.cbpi.notify(self.name, 'Cool down to {}°'.format(self.target_temp), NotificationType.INFO)
         if self.timer is None:
-            self.timer = Timer(1,on_update=self.on_timer_update, on_done=self.on_timer_done)
-        self.start_time=time.time()
-        self.temp_array.append(self.get_sensor_value(self.props.get("Sensor", None)).get("value"))
-        self.time_array.append(time.time())
+            self.timer = Timer(1,on_update=self.on_timer_update, on_done=self.on_timer_done, clock=self.clock)
+        self.start_time=self.clock.time()
+        self.temp_array.append(await self.wait_for_sensor(self.props.get("Sensor", None), [getattr(self.kettle, "heater", None)]))
+        self.time_array.append(self.clock.time())
         self.next_check = self.start_time + self.Interval * 60
         self.count = 0
         self.initial_date = None
@@ -499,7 +503,7 @@ class CooldownStep(CBPiStep):
         await self.push_update()
 
     async def reset(self):
-        self.timer = Timer(1,on_update=self.on_timer_update, on_done=self.on_timer_done)
+        self.timer = Timer(1,on_update=self.on_timer_update, on_done=self.on_timer_done, clock=self.clock)
 
     async def run(self):
         timestring = datetime.fromtimestamp(self.start_time)
@@ -508,17 +512,18 @@ class CooldownStep(CBPiStep):
         self.summary="Started: {}".format(timestring.strftime("%H:%M"))
         await self.push_update()
         while self.running == True:
-            current_temp = self.get_sensor_value(self.props.get("Sensor", None)).get("value")
-            if self.count == 10:
+            current_temp = self.get_good_sensor_value(self.props.get("Sensor", None))
+            if self.count == 10 and current_temp is not None:
                 self.temp_array.append(current_temp)
-                current_time = time.time()
+                current_time = self.clock.time()
                 if self.initial_date == None:
                     self.initial_date = current_time 
                 self.time_array.append(current_time)
                 self.count = 0
-            if time.time() >= self.next_check:
-                self.next_check = time.time() + (self.Interval * 60)
+            if self.clock.time() >= self.next_check and current_temp is not None:
+                self.next_check = self.clock.time() + (self.Interval * 60)
 
+                import numpy as np
                 cooldown_model = np.poly1d(np.polyfit(self.temp_array, self.time_array, 2))
                 target_time=cooldown_model(self.target_temp)
                 target_timestring= datetime.fromtimestamp(target_time)
@@ -526,12 +531,12 @@ class CooldownStep(CBPiStep):
                 self.cbpi.notify("Cooldown Step","Current: {}°, reaching {}° at {}".format(round(current_temp,1), self.target_temp, target_timestring.strftime("%d.%m %H:%M")), NotificationType.INFO)
                 await self.push_update()
 
-            if current_temp <= self.target_temp and self.timer.is_running is not True:
+            if current_temp is not None and current_temp <= self.target_temp and self.timer.is_running is not True:
                 self.timer.start()
                 self.timer.is_running = True
 
             self.count +=1
-            await asyncio.sleep(1)
+            await self.clock.sleep(1)
 
         return StepResult.DONE
 
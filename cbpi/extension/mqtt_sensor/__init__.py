@@ -3,26 +3,32 @@ import asyncio
 from cbpi.api.dataclasses import NotificationAction, NotificationType
 from cbpi.api import parameters, Property, CBPiSensor
 from cbpi.api import *
+from cbpi.api.extractor import PayloadExtractor
 import logging
-import json
 import time
 from datetime import datetime
 
 @parameters([Property.Text(label="Topic", configurable=True, description="MQTT Topic"),
              Property.Text(label="PayloadDictionary", configurable=True, default_value="",
-                           description="Where to find msg in payload, leave blank for raw payload"),
+                           description="Where to find msg in payload (e.g. StatusSNS.DS18B20[0].Temperature), leave blank for raw payload"),
              Property.Number(label="Timeout", configurable="True",unit="sec",
                             description="Timeout in seconds to send notification (default:60 | deactivated: 0)")])
 class MQTTSensor(CBPiSensor):
 
+    # values are pushed by the broker, read only checks the timeout
+    sampling_interval = 1
+
     def __init__(self, cbpi, id, props):
         super(MQTTSensor, self).__init__(cbpi, id, props)
         self.Topic = self.props.get("Topic", None)
-        self.payload_text = self.props.get("PayloadDictionary", None)
-        if self.payload_text != None:
-            self.payload_text = self.payload_text.split('.')
-        self.mqtt_task = self.cbpi.satellite.subcribe(self.Topic, self.on_message)
-        self.value: float = 999
+        try:
+            self.extractor = PayloadExtractor(self.props.get("PayloadDictionary", None))
+        except ValueError as e:
+            # keep the sensor running, the raw payload may still be a number
+            logging.error("MQTT Sensor {} - {}, using the raw payload".format(self.id, e))
+            self.extractor = PayloadExtractor()
+        self.mqtt_subscription = self.cbpi.satellite.subcribe(self.Topic, self.on_message)
+        self.value: float = None
         self.timeout=int(self.props.get("Timeout", 60))
         self.starttime = time.time()
         self.notificationsend = False
@@ -41,16 +47,11 @@ class MQTTSensor(CBPiSensor):
         pass
 
     async def on_message(self, message):
-        val = json.loads(message)
         try:
-            if self.payload_text is not None:
-                for key in self.payload_text:
-                    val = val.get(key, None)
-
-            if isinstance(val, (int, float, str)):
-                self.value = float(val)
-                self.log_data(self.value)
-                self.push_update(self.value)
+            val = self.extractor.extract(message)
+            if val is not None:
+                self.value = val
+                self.publish(self.value)
                 if self.timeout !=0:
                     self.nextchecktime = time.time() + self.timeout
                     self.notificationsend = False
@@ -58,24 +59,22 @@ class MQTTSensor(CBPiSensor):
         except Exception as e:
             logging.info("MQTT Sensor Error {}".format(e))
 
-    async def run(self):
-        while self.running:
-            if self.timeout !=0:         
-                if time.time() > self.nextchecktime and self.notificationsend == False:   
-                    await self.message()
-                    self.notificationsend=True
-            await asyncio.sleep(1)
+    async def read(self):
+        if self.timeout !=0:         
+            if time.time() > self.nextchecktime and self.notificationsend == False:   
+                await self.message()
+                self.notificationsend=True
+        return None
 
     def get_state(self):
         return dict(value=self.value)
 
+    def expected_interval(self):
+        # values are pushed, a value is expected at least every timeout seconds
+        return self.timeout if self.timeout > 0 else None
+
     async def on_stop(self):
-        if self.mqtt_task.done() is False:
-            self.mqtt_task.cancel()
-            try:
-                await self.mqtt_task
-            except asyncio.CancelledError:
-                pass
+        self.mqtt_subscription.cancel()
 
 
 def setup(cbpi):
@@ -0,0 +1,162 @@
+import asyncio
+import glob
+import logging
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+from cbpi.api.clock import Clock
+
+W1_DEVICES = "/sys/bus/w1/devices"
+
+logger = logging.getLogger(__name__)
+
+
+class OneWireSubscription(object):
+
+    def __init__(self, bus, device, interval, method):
+        self.bus = bus
+        self.device = device
+        self.interval = interval
+        self.method = method
+        self.next_read = 0
+
+    def cancel(self):
+        self.bus.unsubscribe(self)
+
+
+class OneWireBus(object):
+    '''
+    Reads all 1-Wire temperature probes of the system with one task.
+    A probe is read when one of its subscriptions is due. If the kernel supports bulk conversion
+    (w1_bus_master*/therm_bulk_read) all probes of a bus are converted at once, otherwise every
+    probe converts on its own read. Reads run concurrently on a small thread pool.
+
+    subscription = bus.subscribe("28-0000012345", 5, method)  # method(value, timestamp)
+    subscription.cancel()
+    '''
+
+    def __init__(self, path=W1_DEVICES, workers=4, clock=None):
+        self.path = path
+        self.workers = workers
+        self.clock = clock if clock is not None else Clock()
+        self.executor = None
+        self.subscriptions = {}
+        # device -> (value in celsius, timestamp)
+        self.values = {}
+        self.task = None
+        self.wakeup = None
+        self.reads = 0
+        self.bulk_reads = 0
+
+    def devices(self):
+        try:
+            return sorted(name for name in os.listdir(self.path) if name.startswith("28") or name.startswith("10"))
+        except OSError:
+            return []
+
+    def subscribe(self, device, interval, method):
+        '''
+        :param device: 1-Wire device id
+        :param interval: seconds between two readings
+        :param method: called with value in celsius and timestamp after every reading
+        :return: subscription
+        '''
+        subscription = OneWireSubscription(self, device, float(interval), method)
+        self.subscriptions.setdefault(device, []).append(subscription)
+        if self.task is None or self.task.done():
+            self.wakeup = asyncio.Event()
+            self.task = asyncio.get_running_loop().create_task(self.run())
+        self.wakeup.set()
+        return subscription
+
+    def unsubscribe(self, subscription):
+        subscriptions = self.subscriptions.get(subscription.device, [])
+        if subscription in subscriptions:
+            subscriptions.remove(subscription)
+        if len(subscriptions) == 0:
+            self.subscriptions.pop(subscription.device, None)
+
+    async def run(self):
+        while len(self.subscriptions) > 0:
+            now = self.clock.monotonic()
+            due = [subscription for subscriptions in self.subscriptions.values() for subscription in subscriptions if subscription.next_read <= now]
+            if len(due) > 0:
+                await self.read(due)
+                now = self.clock.monotonic()
+                for subscription in due:
+                    subscription.next_read = now + subscription.interval
+            next_read = min((subscription.next_read for subscriptions in self.subscriptions.values() for subscription in subscriptions), default=now)
+            self.wakeup.clear()
+            try:
+                await self.clock.wait_for(self.wakeup.wait(), max(next_read - self.clock.monotonic(), 0))
+            except asyncio.TimeoutError:
+                pass
+        self.task = None
+
+    async def read(self, subscriptions):
+        loop = asyncio.get_running_loop()
+        if self.executor is None:
+            self.executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="onewire")
+        devices = sorted(set(subscription.device for subscription in subscriptions))
+        if len(devices) > 1 and await loop.run_in_executor(self.executor, self.trigger_bulk_conversion) is True:
+            self.bulk_reads += 1
+        values = await asyncio.gather(*[loop.run_in_executor(self.executor, self.read_device, device) for device in devices])
+        timestamp = self.clock.time()
+        for device, value in zip(devices, values):
+            if value is not None:
+                self.values[device] = (value, timestamp)
+        for subscription in subscriptions:
+            result = self.values.get(subscription.device)
+            if result is not None and result[1] == timestamp:
+                try:
+                    subscription.method(*result)
+                except Exception as e:
+                    logger.error("Failed to publish 1-Wire value of {} - {}".format(subscription.device, e))
+
+    def trigger_bulk_conversion(self):
+        '''
+        Start the conversion of all probes on all buses which support it
+        :return: True if a conversion was triggered
+        '''
+        triggered = False
+        for path in glob.glob(os.path.join(self.path, "w1_bus_master*", "therm_bulk_read")):
+            try:
+                with open(path, "w") as file:
+                    file.write("trigger\n")
+                triggered = True
+            except OSError as e:
+                logger.warning("1-Wire bulk conversion failed {} - {}".format(path, e))
+        return triggered
+
+    def read_device(self, device):
+        try:
+            with open(os.path.join(self.path, device, "w1_slave")) as file:
+                content = file.read()
+            self.reads += 1
+            return self.parse(content)
+        except OSError:
+            return None
+
+    @staticmethod
+    def parse(content):
+        '''
+        :param content: w1_slave content, the first line ends with YES if the CRC is valid
+        :return: temperature in celsius or None
+        '''
+        lines = content.split("\n")
+        if len(lines) < 2 or lines[0].strip().endswith("YES") is False or "t=" not in lines[1]:
+            return None
+        try:
+            return float(lines[1].split("t=")[-1]) / 1000
+        except ValueError:
+            return None
+
+    async def close(self, app=None):
+        self.subscriptions = {}
+        if self.task is not None:
+            self.task.cancel()
+            await asyncio.gather(self.task, return_exceptions=True)
+            self.task = None
+        if self.executor is not None:
+            self.executor.shutdown(wait=False)
+            self.executor = None
@@ -0,0 +1,55 @@
+# -*- coding: utf-8 -*-
+from cbpi.api import *
+from cbpi.extension.simulator.model import ThermalModel
+
+
+@parameters([Property.Actor(label="Heater", description="Actor which heats the simulated content"),
+             Property.Actor(label="Cooler", description="Actor which cools the simulated content"),
+             Property.Number(label="HeaterPower", configurable=True, default_value=2000, description="Heater power in W (Default is 2000)"),
+             Property.Number(label="CoolerPower", configurable=True, default_value=0, description="Cooler power in W (Default is 0)"),
+             Property.Number(label="Volume", configurable=True, default_value=20, description="Liters of water (Default is 20)"),
+             Property.Number(label="Loss", configurable=True, default_value=5, description="Heat loss to the ambient in W/K (Default is 5)"),
+             Property.Number(label="Ambient", configurable=True, default_value=20, description="Ambient temperature (Default is 20)"),
+             Property.Number(label="StartTemp", configurable=True, default_value=20, description="Temperature at start (Default is 20)"),
+             Property.Number(label="Speed", configurable=True, default_value=1, description="Simulated seconds per second of the clock (Default is 1)")])
+class SimulatedTemperature(CBPiSensor):
+    '''
+    Temperature of a simulated kettle or fermenter. The heater and cooler actors drive a thermal model,
+    with their power if they are switched on.
+    '''
+
+    sampling_interval = 1
+
+    def __init__(self, cbpi, id, props):
+        super(SimulatedTemperature, self).__init__(cbpi, id, props)
+        self.model = ThermalModel(temperature=self.props.float("StartTemp", 20), ambient=self.props.float("Ambient", 20),
+                                  volume=self.props.float("Volume", 20), loss=self.props.float("Loss", 5),
+                                  heater_power=self.props.float("HeaterPower", 2000), cooler_power=self.props.float("CoolerPower", 0))
+        self.speed = self.props.float("Speed", 1)
+        self.value = round(self.model.temperature, 2)
+        self.last = None
+
+    async def start(self):
+        await super().start()
+        self.last = self.clock.monotonic()
+
+    def actor_power(self, id):
+        actor = self.get_actor(id) if id else None
+        if actor is None or actor.instance is None or actor.instance.state is not True:
+            return 0
+        return min(max(float(getattr(actor.instance, "power", 100)) / 100, 0), 1)
+
+    async def read(self):
+        now = self.clock.monotonic()
+        seconds = (now - self.last) * self.speed
+        self.last = now
+        self.model.step(seconds, self.actor_power(self.props.get("Heater")), self.actor_power(self.props.get("Cooler")))
+        self.value = round(self.model.temperature, 2)
+        return self.value
+
+    def get_state(self):
+        return dict(value=self.value)
+
+
+def setup(cbpi):
+    cbpi.plugin.register("SimulatedTemperature", SimulatedTemperature)
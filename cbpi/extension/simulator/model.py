@@ -0,0 +1,96 @@
+import math
+
+
+class ThermalModel(object):
+    '''
+    Lumped thermal model of a kettle or fermenter.
+    The content is heated by the heater, cooled by the cooler and loses heat to the ambient proportional to the
+    temperature difference. A step is solved exactly for constant power, so long steps stay stable.
+
+    :param temperature: start temperature in °C
+    :param ambient: ambient temperature in °C
+    :param volume: liters of water, 1 l has a thermal mass of 4186 J/K
+    :param loss: heat loss to the ambient in W/K
+    :param heater_power: heater power in W
+    :param cooler_power: cooler power in W
+    '''
+
+    SPECIFIC_HEAT = 4186
+
+    def __init__(self, temperature=20, ambient=20, volume=20, loss=5, heater_power=2000, cooler_power=0):
+        self.temperature = float(temperature)
+        self.ambient = float(ambient)
+        self.capacity = max(float(volume), 0.1) * self.SPECIFIC_HEAT
+        self.loss = max(float(loss), 0)
+        self.heater_power = float(heater_power)
+        self.cooler_power = float(cooler_power)
+        # simulated seconds
+        self.time = 0
+
+    def step(self, seconds, heater=0, cooler=0):
+        '''
+        :param seconds: simulated seconds
+        :param heater: heater power from 0 to 1
+        :param cooler: cooler power from 0 to 1
+        :return: temperature in °C
+        '''
+        power = heater * self.heater_power - cooler * self.cooler_power
+        if self.loss > 0:
+            equilibrium = self.ambient + power / self.loss
+            self.temperature = equilibrium + (self.temperature - equilibrium) * math.exp(-self.loss * seconds / self.capacity)
+        else:
+            self.temperature += power * seconds / self.capacity
+        self.time += seconds
+        return self.temperature
+
+
+class Simulation(object):
+    '''
+    Runs a temperature profile against a model with an on/off controller without CraftBeerPi, e.g. to check
+    a fermentation schedule of several weeks in seconds.
+
+    simulation = Simulation(ThermalModel(volume=50, cooler_power=300), step=10)
+    simulation.run([(3 * 86400, 12), (2 * 86400, 18)])
+    '''
+
+    def __init__(self, model, step=10, hysteresis=0.5):
+        self.model = model
+        self.step = step
+        self.hysteresis = hysteresis
+        self.heater = False
+        self.cooler = False
+        self.switches = 0
+        self.steps = 0
+        self.max_deviation = 0
+
+    def control(self, target):
+        temperature = self.model.temperature
+        heater = self.heater
+        cooler = self.cooler
+        if temperature < target - self.hysteresis:
+            heater, cooler = self.model.heater_power > 0, False
+        elif temperature > target + self.hysteresis:
+            heater, cooler = False, self.model.cooler_power > 0
+        elif (heater and temperature >= target) or (cooler and temperature <= target):
+            heater, cooler = False, False
+        self.switches += (heater != self.heater) + (cooler != self.cooler)
+        self.heater, self.cooler = heater, cooler
+
+    def run(self, profile):
+        '''
+        :param profile: list of (seconds, target temperature)
+        :return: None
+        '''
+        for duration, target in profile:
+            settled = False
+            elapsed = 0
+            while elapsed < duration:
+                self.control(target)
+                self.model.step(self.step, 1 if self.heater else 0, 1 if self.cooler else 0)
+                elapsed += self.step
+                self.steps += 1
+                deviation = abs(self.model.temperature - target)
+                if settled is True:
+                    self.max_deviation = max(self.max_deviation, deviation)
+                elif deviation <= self.hysteresis:
+                    settled = True
@@ -0,0 +1,88 @@
+# -*- coding: utf-8 -*-
+import logging
+from cbpi.api import *
+from cbpi.extension.virtualsensor.expression import Expression
+
+
+@parameters([Property.Text(label="Expression", configurable=True, description="Value computed from other sensors, e.g. (sensor('id1') + sensor('id2')) / 2, sensor('inlet') - sensor('outlet'), mean('id', 300) or rate('id', 600) for the change per minute"),
+             Property.Number(label="Digits", configurable=True, default_value=2, description="Decimal places of the value (Default is 2)")])
+class VirtualSensor(CBPiSensor):
+    '''
+    Sensor with a value computed from other sensors. It's recomputed whenever one of the input sensors pushes
+    a new value. The reading is refreshed every time, the value is only logged and pushed if it changed.
+    '''
+
+    def __init__(self, cbpi, id, props):
+        super(VirtualSensor, self).__init__(cbpi, id, props)
+        self.value = None
+        # value after the filters of the sensor
+        self.published = None
+        self.expression = None
+        self.evaluating = False
+
+    async def start(self):
+        await super().start()
+        self.digits = int(self.props.get("Digits", 2))
+        try:
+            self.expression = Expression(self.props.get("Expression", ""))
+        except ValueError as e:
+            logging.error("VirtualSensor {} - {}".format(self.id, e))
+            return
+        if self.id in self.expression.inputs:
+            logging.error("VirtualSensor {} can't use its own value".format(self.id))
+            self.expression = None
+            return
+        for id in self.expression.inputs:
+            reading = self.cbpi.sensor.get_reading(id)
+            if reading.quality != "missing":
+                self.expression.update(id, reading.value, reading.timestamp)
+            self.cbpi.sensor.subscribe(id, self.on_input)
+        self.evaluate()
+
+    async def stop(self):
+        self.unsubscribe()
+
+    async def on_stop(self):
+        self.unsubscribe()
+
+    def unsubscribe(self):
+        if self.expression is not None:
+            for id in self.expression.inputs:
+                self.cbpi.sensor.unsubscribe(id, self.on_input)
+
+    def on_input(self, id, reading):
+        try:
+            self.expression.update(id, reading.value, reading.timestamp)
+        except (TypeError, ValueError):
+            return
+        self.evaluate()
+
+    def evaluate(self):
+        if self.evaluating is True:
+            # virtual sensors which depend on each other
+            return
+        value = self.expression.evaluate()
+        if value is None:
+            return
+        value = round(value, self.digits)
+        self.evaluating = True
+        try:
+            if value != self.value:
+                self.value = value
+                self.published = self.publish(self.value)
+            else:
+                # keep the reading fresh, a steady value is still a current value
+                self.cbpi.sensor.set_reading(self.id, self.published)
+        finally:
+            self.evaluating = False
+
+    def get_state(self):
+        return dict(value=self.value)
+
+    def expected_interval(self):
+        # depends on the inputs, which are checked themselves
+        return None
+
+
+def setup(cbpi):
+    cbpi.plugin.register("VirtualSensor", VirtualSensor)
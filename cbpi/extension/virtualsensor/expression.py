@@ -0,0 +1,128 @@
+import ast
+import collections
+import operator
+import time
+
+
+class Window(object):
+    '''
+    Values of the last seconds, the sum is kept up to date while values are added and dropped
+    '''
+
+    def __init__(self, seconds):
+        self.seconds = seconds
+        self.values = collections.deque()
+        self.sum = 0
+
+    def add(self, timestamp, value):
+        self.values.append((timestamp, value))
+        self.sum += value
+        while self.values[0][0] < timestamp - self.seconds:
+            self.sum -= self.values.popleft()[1]
+
+    def mean(self):
+        if len(self.values) == 0:
+            raise ValueError("No values")
+        return self.sum / len(self.values)
+
+    def rate(self):
+        # change per minute
+        (first_time, first), (last_time, last) = self.values[0], self.values[-1]
+        if last_time <= first_time:
+            raise ValueError("Not enough values")
+        return (last - first) / (last_time - first_time) * 60
+
+
+class Expression(object):
+    '''
+    Arithmetic expression over sensor values. It's compiled once into nested functions, nothing is passed to eval.
+
+    sensor('id')       last value of the sensor
+    mean('id', 300)    mean of the values of the last 300 seconds
+    rate('id', 600)    change per minute within the last 600 seconds
+
+    Supported are numbers, + - * / ** %, abs, min, max and round, e.g. (sensor('a') + sensor('b')) / 2
+    '''
+
+    OPERATORS = {ast.Add: operator.add, ast.Sub: operator.sub, ast.Mult: operator.mul, ast.Div: operator.truediv,
+                 ast.Pow: operator.pow, ast.Mod: operator.mod}
+    UNARY_OPERATORS = {ast.USub: operator.neg, ast.UAdd: operator.pos}
+    FUNCTIONS = dict(abs=abs, min=min, max=max, round=round)
+
+    def __init__(self, source):
+        self.source = source
+        # sensor id -> last value
+        self.values = {}
+        # sensor id -> windows of the sensor
+        self.windows = {}
+        # ids of the sensors used in the expression
+        self.inputs = set()
+        try:
+            tree = ast.parse(source.strip(), mode="eval")
+        except SyntaxError as e:
+            raise ValueError("Invalid expression {} - {}".format(source, e.msg))
+        self._evaluate = self._compile(tree.body)
+
+    def _compile(self, node):
+        if isinstance(node, ast.Constant) and isinstance(node.value, (int, float)) and isinstance(node.value, bool) is False:
+            # floats only, integer powers could get huge
+            value = float(node.value)
+            return lambda: value
+        if isinstance(node, ast.BinOp) and type(node.op) in self.OPERATORS:
+            method = self.OPERATORS[type(node.op)]
+            left, right = self._compile(node.left), self._compile(node.right)
+            return lambda: method(left(), right())
+        if isinstance(node, ast.UnaryOp) and type(node.op) in self.UNARY_OPERATORS:
+            method = self.UNARY_OPERATORS[type(node.op)]
+            operand = self._compile(node.operand)
+            return lambda: method(operand())
+        if isinstance(node, ast.Call) and isinstance(node.func, ast.Name) and len(node.keywords) == 0:
+            name = node.func.id
+            if name in ("sensor", "mean", "rate"):
+                return self._compile_sensor(name, node.args)
+            if name in self.FUNCTIONS:
+                method = self.FUNCTIONS[name]
+                args = [self._compile(arg) for arg in node.args]
+                return lambda: method(*[arg() for arg in args])
+            raise ValueError("Unknown function {}".format(name))
+        raise ValueError("Unsupported element {} in expression {}".format(type(node).__name__, self.source))
+
+    def _compile_sensor(self, name, args):
+        if len(args) == 0 or isinstance(args[0], ast.Constant) is False or isinstance(args[0].value, str) is False:
+            raise ValueError("{} expects a sensor id in quotes".format(name))
+        id = args[0].value
+        self.inputs.add(id)
+        if name == "sensor":
+            if len(args) != 1:
+                raise ValueError("sensor expects one sensor id")
+            return lambda: self.values[id]
+        if len(args) != 2 or isinstance(args[1], ast.Constant) is False or isinstance(args[1].value, (int, float)) is False or args[1].value <= 0:
+            raise ValueError("{} expects a sensor id and a window in seconds".format(name))
+        window = Window(float(args[1].value))
+        self.windows.setdefault(id, []).append(window)
+        return window.mean if name == "mean" else window.rate
+
+    def update(self, id, value, timestamp=None):
+        '''
+        Add a new value of an input sensor
+
+        :param id: sensor id
+        :param value: sensor value
+        :param timestamp: time.monotonic() of the value
+        '''
+        value = float(value)
+        timestamp = time.monotonic() if timestamp is None else timestamp
+        self.values[id] = value
+        for window in self.windows.get(id, []):
+            window.add(timestamp, value)
+
+    def evaluate(self):
+        '''
+        :return: value or None if an input has no value yet
+        '''
+        try:
+            value = self._evaluate()
+        except (KeyError, IndexError, ValueError, ZeroDivisionError, OverflowError, TypeError):
+            return None
+        # e.g. the root of a negative number
+        return value if isinstance(value, complex) is False else None
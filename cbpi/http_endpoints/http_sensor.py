@@ -228,3 +228,60 @@ class SensorHttpEndpoints():
         await self.controller.call_action(sensor_id, data.get("action"), data.get("parameter"))
 
         return web.Response(status=204)
+
+    @request_mapping(path="/{id}/filter", method="GET", auth_required=False)
+    async def http_get_filter(self, request) -> web.Response:
+        """
+
+        ---
+        description: Get the filters of a Sensor
+        tags:
+        - Sensor
+        parameters:
+        - name: "id"
+          in: "path"
+          description: "Sensor ID"
+          required: true
+          type: "string"
+        responses:
+            "200":
+                description: successful operation
+        """
+        sensor_id = request.match_info['id']
+        return web.json_response(data=self.controller.get_filter(sensor_id))
+
+    @request_mapping(path="/{id}/filter", method="PUT", auth_required=False)
+    async def http_set_filter(self, request) -> web.Response:
+        """
+
+        ---
+        description: Set the filters of a Sensor. Filters are applied in the given order, an empty list removes them.
+        tags:
+        - Sensor
+        parameters:
+        - name: "id"
+          in: "path"
+          description: "Sensor ID"
+          required: true
+          type: "string"
+        - in: body
+          name: body
+          description: List of filters, e.g. [{"type":"hampel","window":7,"threshold":3},{"type":"median","window":5},{"type":"ema","alpha":0.3},{"type":"rate_limit","max_change":0.5}]
+          required: true
+          schema:
+            type: array
+            items:
+              type: object
+        responses:
+            "200":
+                description: successful operation
+            "422":
+                description: invalid filter
+        """
+        sensor_id = request.match_info['id']
+        data = await request.json()
+        try:
+            self.controller.set_filter(sensor_id, data)
+        except ValueError as e:
+            return web.json_response(status=422, data={'error': str(e)})
+        return web.json_response(data=self.controller.get_filter(sensor_id))
@@ -1,8 +1,6 @@
 import datetime
 from json import JSONEncoder
 
-from pandas import Timestamp
-
 class ComplexEncoder(JSONEncoder):
 
     def default(self, obj):
@@ -11,9 +9,7 @@ class ComplexEncoder(JSONEncoder):
             if hasattr(obj, "to_json") and callable(getattr(obj, "to_json")):
                 return obj.to_json()
             elif isinstance(obj, datetime.datetime):
-                return obj.__str__()
-            elif isinstance(obj, Timestamp):
-                #print("TIMe")
+                # includes pandas.Timestamp which is a datetime subclass, so pandas is not imported here
                 return obj.__str__()
             else:
                 #print(type(obj))
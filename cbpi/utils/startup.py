@@ -0,0 +1,128 @@
+import asyncio
+import builtins
+import logging
+import sys
+import time
+
+
+logger = logging.getLogger(__name__)
+
+
+class Startup:
+    '''
+    Runs the startup tasks of CraftBeerPi.
+    Every task declares the tasks it depends on. A task is started as soon as all of its dependencies are done,
+    so independent tasks run concurrently.
+
+    startup = Startup()
+    startup.add("config", cbpi.config.init)
+    startup.add("sensor", cbpi.sensor.init, depends=["config"])
+    await startup.run()
+    '''
+
+    def __init__(self):
+        self.tasks = {}
+        # name -> (start offset, duration) in seconds
+        self.timings = {}
+        self.duration = 0
+
+    def add(self, name, method, depends=()):
+        '''
+        :param name: task name
+        :param method: coroutine function or function without parameters
+        :param depends: names of the tasks which have to be done before
+        :return: None
+        '''
+        self.tasks[name] = (method, tuple(depends))
+
+    async def run(self):
+        for name, (method, depends) in self.tasks.items():
+            for dependency in depends:
+                if dependency not in self.tasks:
+                    raise ValueError("Startup task {} depends on unknown task {}".format(name, dependency))
+        self._check_cycles()
+
+        start = time.perf_counter()
+        futures = {}
+
+        async def run_task(name, method, depends):
+            await asyncio.gather(*[futures[dependency] for dependency in depends])
+            begin = time.perf_counter()
+            try:
+                result = method()
+                if asyncio.iscoroutine(result):
+                    await result
+            except Exception as e:
+                logger.error("Startup task {} failed - {}".format(name, e))
+                raise
+            finally:
+                end = time.perf_counter()
+                self.timings[name] = (begin - start, end - begin)
+
+        for name, (method, depends) in self.tasks.items():
+            futures[name] = asyncio.ensure_future(run_task(name, method, depends))
+        try:
+            await asyncio.gather(*futures.values())
+        finally:
+            for future in futures.values():
+                future.cancel()
+            self.duration = time.perf_counter() - start
+        logger.info("Startup finished in %.3fs\n%s" % (self.duration, self.report()))
+
+    def _check_cycles(self):
+        done = set()
+
+        def visit(name, path):
+            if name in path:
+                raise ValueError("Startup tasks have a circular dependency {}".format(" -> ".join(path + [name])))
+            if name not in done:
+                for dependency in self.tasks[name][1]:
+                    visit(dependency, path + [name])
+                done.add(name)
+
+        for name in self.tasks:
+            visit(name, [])
+
+    def report(self):
+        from tabulate import tabulate
+        rows = [[name, "%.3f" % begin, "%.3f" % duration, ", ".join(self.tasks[name][1])]
+                for name, (begin, duration) in sorted(self.timings.items(), key=lambda item: item[1][0])]
+        return tabulate(rows, headers=["Task", "Start (s)", "Duration (s)", "Depends on"])
+
+
+class ImportProfiler:
+    '''
+    Measures the import time of modules while it's active. The time of a module includes the modules it imports
+    for the first time. Modules loaded with importlib.import_module are not measured.
+
+    with ImportProfiler() as profiler:
+        from cbpi.craftbeerpi import CraftBeerPi
+    print(profiler.report())
+    '''
+
+    def __init__(self):
+        # module name -> seconds
+        self.timings = {}
+        self._import = None
+
+    def __enter__(self):
+        self._import = builtins.__import__
+        builtins.__import__ = self._profiled_import
+        return self
+
+    def __exit__(self, *args):
+        builtins.__import__ = self._import
+
+    def _profiled_import(self, name, globals=None, locals=None, fromlist=(), level=0):
+        if level > 0 or name in sys.modules:
+            return self._import(name, globals, locals, fromlist, level)
+        start = time.perf_counter()
+        try:
+            return self._import(name, globals, locals, fromlist, level)
+        finally:
+            self.timings.setdefault(name, time.perf_counter() - start)
+
+    def report(self, limit=25):
+        from tabulate import tabulate
+        rows = [[name, "%.3f" % duration] for name, duration in sorted(self.timings.items(), key=lambda item: -item[1])[:limit]]
+        return tabulate(rows, headers=["Module", "Import (s)"])
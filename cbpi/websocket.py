@@ -44,6 +44,23 @@ class CBPiWebSocket:
 
             self.cbpi.app.loop.create_task(send_data(ws, data))
 
+    def send_all(self, messages):
+        '''
+        Broadcast several messages with one task per client, e.g. the sensor states of one sampling tick
+        '''
+        if len(messages) == 0:
+            return
+        self.logger.debug("broadcast %s messages to ws clients" % len(messages))
+        for ws in self._clients:
+            async def send_data(ws, messages):
+                try:
+                    for data in messages:
+                        await ws.send_json(data=data, dumps=json_dumps)
+                except Exception as e:
+                    self.logger.error("Error with client %s: %s" % (ws, str(e)))
+
+            self.cbpi.app.loop.create_task(send_data(ws, messages))
+
     async def websocket_handler(self, request):
         
         
@@ -55,6 +55,7 @@ setup(name='cbpi4',
           'shortuuid==1.0.11',
           'tabulate==0.9.0',
           'asyncio-mqtt==0.16.1',
+          'paho-mqtt<2.0',
           'inquirer==3.1.1',
           'colorama==0.4.6',
           'psutil==5.9.4',
@@ -0,0 +1,248 @@
+import asyncio
+import logging
+import struct
+
+from cbpi.controller.satellite_controller import TopicTree
+
+logger = logging.getLogger(__name__)
+
+CONNECT = 1
+CONNACK = 2
+PUBLISH = 3
+PUBACK = 4
+PUBREC = 5
+PUBREL = 6
+PUBCOMP = 7
+SUBSCRIBE = 8
+SUBACK = 9
+UNSUBSCRIBE = 10
+UNSUBACK = 11
+PINGREQ = 12
+PINGRESP = 13
+DISCONNECT = 14
+
+
+def encode_string(value):
+    data = value.encode() if isinstance(value, str) else value
+    return struct.pack("!H", len(data)) + data
+
+
+def encode_packet(packet_type, flags, body):
+    length = len(body)
+    remaining = bytearray()
+    while True:
+        byte = length % 128
+        length = length // 128
+        if length > 0:
+            byte |= 0x80
+        remaining.append(byte)
+        if length == 0:
+            break
+    return bytes([(packet_type << 4) | flags]) + bytes(remaining) + body
+
+
+class Session(object):
+
+    def __init__(self, broker, reader, writer):
+        self.broker = broker
+        self.reader = reader
+        self.writer = writer
+        self.client_id = None
+        self.will = None
+        self.subscriptions = set()
+
+    def send(self, packet_type, flags, body=b""):
+        if self.writer.is_closing() is False:
+            self.writer.write(encode_packet(packet_type, flags, body))
+
+    def deliver(self, topic, payload, retain=False):
+        # the stand-in delivers everything with QoS 0
+        self.send(PUBLISH, 1 if retain else 0, encode_string(topic) + payload)
+
+    async def read_packet(self):
+        header = await self.reader.readexactly(1)
+        multiplier = 1
+        length = 0
+        while True:
+            byte = (await self.reader.readexactly(1))[0]
+            length += (byte & 0x7F) * multiplier
+            multiplier *= 128
+            if byte & 0x80 == 0:
+                break
+        body = await self.reader.readexactly(length)
+        return header[0] >> 4, header[0] & 0x0F, body
+
+    def on_connect(self, body):
+        pos = 2 + struct.unpack("!H", body[:2])[0]
+        flags = body[pos + 1]
+        pos += 4
+
+        def read_field():
+            nonlocal pos
+            size = struct.unpack("!H", body[pos:pos + 2])[0]
+            value = body[pos + 2:pos + 2 + size]
+            pos += 2 + size
+            return value
+
+        self.client_id = read_field().decode()
+        if flags & 0x04:
+            topic = read_field().decode()
+            payload = read_field()
+            self.will = (topic, payload, bool(flags & 0x20))
+        self.send(CONNACK, 0, b"\x00\x00")
+
+    def on_publish(self, flags, body):
+        qos = (flags >> 1) & 0x03
+        size = struct.unpack("!H", body[:2])[0]
+        topic = body[2:2 + size].decode()
+        pos = 2 + size
+        if qos > 0:
+            packet_id = body[pos:pos + 2]
+            pos += 2
+            if qos == 1:
+                self.send(PUBACK, 0, packet_id)
+            else:
+                self.send(PUBREC, 0, packet_id)
+        self.broker.publish(topic, body[pos:], retain=bool(flags & 0x01))
+
+    def on_subscribe(self, body):
+        packet_id = body[:2]
+        pos = 2
+        topics = []
+        while pos < len(body):
+            size = struct.unpack("!H", body[pos:pos + 2])[0]
+            topics.append(body[pos + 2:pos + 2 + size].decode())
+            pos += 3 + size
+        for topic in topics:
+            if topic not in self.subscriptions:
+                self.subscriptions.add(topic)
+                self.broker.tree.add(topic, self)
+        self.send(SUBACK, 0, packet_id + bytes(len(topics)))
+        for retained_topic, payload in list(self.broker.retained.items()):
+            if self in self.broker.tree.match(retained_topic):
+                self.deliver(retained_topic, payload, retain=True)
+
+    def on_unsubscribe(self, body):
+        packet_id = body[:2]
+        pos = 2
+        while pos < len(body):
+            size = struct.unpack("!H", body[pos:pos + 2])[0]
+            topic = body[pos + 2:pos + 2 + size].decode()
+            pos += 2 + size
+            if topic in self.subscriptions:
+                self.subscriptions.discard(topic)
+                self.broker.tree.remove(topic, self)
+        self.send(UNSUBACK, 0, packet_id)
+
+    async def run(self):
+        clean = False
+        try:
+            while True:
+                packet_type, flags, body = await self.read_packet()
+                if packet_type == CONNECT:
+                    self.on_connect(body)
+                elif packet_type == PUBLISH:
+                    self.on_publish(flags, body)
+                elif packet_type == PUBREL:
+                    self.send(PUBCOMP, 0, body[:2])
+                elif packet_type == SUBSCRIBE:
+                    self.on_subscribe(body)
+                elif packet_type == UNSUBSCRIBE:
+                    self.on_unsubscribe(body)
+                elif packet_type == PINGREQ:
+                    self.send(PINGRESP, 0)
+                elif packet_type == DISCONNECT:
+                    clean = True
+                    break
+                await self.writer.drain()
+        except (asyncio.IncompleteReadError, ConnectionError):
+            pass
+        finally:
+            self.close()
+            if clean is False and self.will is not None:
+                self.broker.publish(*self.will)
+
+    def close(self):
+        for topic in self.subscriptions:
+            self.broker.tree.remove(topic, self)
+        self.subscriptions = set()
+        self.broker.sessions.discard(self)
+        self.writer.close()
+
+
+class MQTTBroker(object):
+    '''
+    Minimal in-process MQTT 3.1.1 broker stand-in for tests.
+    Supports wildcard subscriptions and retained messages, everything is delivered with QoS 0.
+    '''
+
+    def __init__(self, host="127.0.0.1", port=0):
+        self.host = host
+        self.port = port
+        self.server = None
+        self.sessions = set()
+        self.tree = TopicTree()
+        self.retained = {}
+        self.received = 0
+        self._waiters = []
+
+    async def start(self):
+        self.server = await asyncio.start_server(self._handle, self.host, self.port)
+        self.port = self.server.sockets[0].getsockname()[1]
+        return self
+
+    async def stop(self):
+        self.disconnect_all()
+        if self.server is not None:
+            self.server.close()
+            await self.server.wait_closed()
+
+    async def _handle(self, reader, writer):
+        session = Session(self, reader, writer)
+        self.sessions.add(session)
+        try:
+            await session.run()
+        except asyncio.CancelledError:
+            # the test loop is shutting down
+            pass
+
+    def disconnect_all(self):
+        '''
+        Drop all client connections, clients have to reconnect
+        '''
+        for session in list(self.sessions):
+            session.close()
+
+    def publish(self, topic, payload, retain=False):
+        if isinstance(payload, str):
+            payload = payload.encode()
+        self.received += 1
+        if retain is True:
+            if len(payload) == 0:
+                self.retained.pop(topic, None)
+            else:
+                self.retained[topic] = payload
+        for session in set(self.tree.match(topic)):
+            session.deliver(topic, payload)
+        for waiter in list(self._waiters):
+            topic_filter, future = waiter
+            if future.done() is False and self._matches(topic_filter, topic):
+                future.set_result((topic, payload))
+            if future.done() is True:
+                self._waiters.remove(waiter)
+
+    def _matches(self, topic_filter, topic):
+        tree = TopicTree()
+        tree.add(topic_filter, True)
+        return len(tree.match(topic)) > 0
+
+    def wait_for(self, topic_filter):
+        '''
+        Future which is resolved with (topic, payload) of the next message matching the filter
+        '''
+        future = asyncio.get_event_loop().create_future()
+        self._waiters.append((topic_filter, future))
+        return future
+
+    def client_count(self):
+        return len(self.sessions)
@@ -1,6 +1,7 @@
 import logging
 from unittest import mock
 from aiohttp.test_utils import unittest_run_loop
+from cbpi.api.dataclasses import Actor, Props
 from tests.cbpi_config_fixture import CraftBeerPiTestCase
 
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(name)s - %(message)s')
@@ -81,3 +82,19 @@ class ActorTestCase(CraftBeerPiTestCase):
     async def test_actor_action(self):
         resp = await self.client.post(path="/actor/1/action", json=dict(name="myAction", parameter=dict(name="Manuel")))
         assert resp.status == 204
+
+    async def test_id_index(self):
+        actor = await self.cbpi.actor.add(Actor(name="IndexActor", type="DummyActor", props=Props({})))
+        try:
+            index = self.cbpi.actor.get_index_by_id(actor.id)
+            assert self.cbpi.actor.data[index] is actor
+            assert self.cbpi.actor.find_by_id(actor.id) is actor
+
+            updated = Actor(id=actor.id, name="IndexActor2", type="DummyActor", props=Props({}))
+            await self.cbpi.actor.update(updated)
+            assert self.cbpi.actor.find_by_id(actor.id) is updated
+            assert self.cbpi.actor.get_index_by_id(actor.id) == index
+        finally:
+            await self.cbpi.actor.delete(actor.id)
+        assert self.cbpi.actor.find_by_id(actor.id) is None
+        assert self.cbpi.actor.find_by_id("3CUJte4bkxDMFCtLX8eqsX").id == "3CUJte4bkxDMFCtLX8eqsX"
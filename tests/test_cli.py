@@ -1,6 +1,10 @@
 import logging
+import os
+import tempfile
 import unittest
+from unittest import mock
 from cbpi.cli import CraftBeerPiCli
+from cbpi.controller.plugin_controller import PluginManifest
 
 from cbpi.configFolder import ConfigFolder
 
@@ -12,5 +16,21 @@ class CLITest(unittest.TestCase):
         cli = CraftBeerPiCli(ConfigFolder("./cbpi-test-config", './logs')) # inside tests folder
         cli.plugins_list()
 
+    def test_plugin_manifest(self):
+        with tempfile.TemporaryDirectory() as folder:
+            path = os.path.join(folder, "plugin_manifest.json")
+            data = PluginManifest(path).load()
+            assert "mashstep" in data["extensions"]
+            assert os.path.exists(path)
+
+            # cached manifest is used without discovery
+            with mock.patch.object(PluginManifest, "discover_plugins", side_effect=AssertionError()):
+                assert PluginManifest(path).load() == data
+
+            with mock.patch.object(PluginManifest, "fingerprint", return_value="changed"):
+                with mock.patch.object(PluginManifest, "discover_plugins", return_value=[]) as discover:
+                    assert PluginManifest(path).load()["plugins"] == []
+                    assert discover.called
+
 if __name__ == '__main__':
     unittest.main()
\ No newline at end of file
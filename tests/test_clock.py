@@ -0,0 +1,108 @@
+import asyncio
+import unittest
+
+from cbpi.api.clock import VirtualClock
+from cbpi.api.timer import Timer, TimerService
+
+
+class VirtualClockTest(unittest.TestCase):
+
+    def test_sleep(self):
+        async def run():
+            clock = VirtualClock(start=0)
+            woken = []
+
+            async def sleeper(seconds):
+                await clock.sleep(seconds)
+                woken.append(clock.monotonic())
+
+            tasks = [asyncio.create_task(sleeper(seconds)) for seconds in (30, 10, 20)]
+            await clock.advance(15)
+            assert woken == [10]
+            await clock.advance(15)
+            assert woken == [10, 20, 30]
+            assert clock.time() == 30
+            await asyncio.gather(*tasks)
+
+            # wait_for times out in virtual time
+            task = asyncio.create_task(clock.wait_for(asyncio.Event().wait(), 60))
+            await clock.advance(59)
+            assert task.done() is False
+            await clock.advance(1)
+            with self.assertRaises(asyncio.TimeoutError):
+                await task
+
+        asyncio.run(run())
+
+    def test_timer(self):
+        async def run():
+            clock = VirtualClock()
+            updates = []
+            done = asyncio.Event()
+
+            async def on_update(timer, count):
+                updates.append(count)
+
+            async def on_done(timer):
+                done.set()
+
+            # two hours are replayed without waiting
+            timer = Timer(7200, on_done=on_done, on_update=on_update, clock=clock)
+            timer.start()
+            await clock.advance(3600)
+            assert updates[-1] == 3600
+            await timer.add(600)
+            await clock.advance(4200)
+            await asyncio.wait_for(done.wait(), 1)
+            assert updates[-1] == 0
+            assert len(updates) == 7801
+            assert clock.monotonic() == 7800
+
+            timer = Timer(600, clock=clock)
+            timer.start()
+            await clock.advance(200)
+            await timer.stop()
+            assert timer.get_time() == "00:06:40"
+
+        asyncio.run(run())
+
+    def test_timer_service(self):
+        async def run():
+            clock = VirtualClock()
+            service = TimerService(clock)
+            done = []
+            updates = []
+
+            async def on_done(timer):
+                done.append((timer.timeout, clock.monotonic()))
+
+            async def on_update(timer, count):
+                updates.append(clock.monotonic())
+
+            timers = [Timer(60 * (i + 1), on_done=on_done, on_update=on_update, service=service) for i in range(15)]
+            for timer in timers:
+                timer.start()
+            await clock.advance(30)
+            # one task for all timers, their updates come together once per second
+            assert service.task is not None
+            assert len(updates) == 15 * 31
+            assert len(set(updates)) == 31
+
+            # pause and resume
+            await timers[0].stop()
+            await asyncio.sleep(0)
+            assert timers[0].is_running() is False
+            assert done == [(60, 30)]
+            await clock.advance(10)
+            timers[0].start()
+            await clock.advance(30)
+            assert done == [(60, 30), (60, 70)]
+
+            await clock.advance(900)
+            assert len(done) == 16
+            assert service.task is None
+            assert len(service.heap) == 0
+            # the expire tasks are referenced until they are done
+            assert len(service.callbacks) == 0
+
+        asyncio.run(run())
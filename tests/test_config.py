@@ -1,10 +1,30 @@
+import os
+import shutil
+import tempfile
 import time
+from unittest.mock import MagicMock
 
 from aiohttp.test_utils import unittest_run_loop
+from cbpi.api.config import ConfigType
+from cbpi.configFolder import ConfigFolder
 from tests.cbpi_config_fixture import CraftBeerPiTestCase
 
 class ConfigTestCase(CraftBeerPiTestCase):
 
+    def configuration(self):
+        # the tests change values, work on a copy of the test config
+        self.temp_folder = tempfile.mkdtemp()
+        config_directory = os.path.join(self.temp_folder, 'config')
+        logs_directory = os.path.join(self.temp_folder, 'logs')
+        shutil.copytree(os.path.join(os.path.dirname(__file__), 'cbpi-test-config'), config_directory)
+        os.makedirs(logs_directory)
+        return ConfigFolder(config_directory, logs_directory)
+
+    def tearDown(self):
+        super().tearDown()
+        # after the app is closed and pending writes are flushed
+        shutil.rmtree(self.temp_folder, ignore_errors=True)
+
     async def test_get(self):
 
         assert self.cbpi.config.get("steps_boil_temp", 1) == "99"
@@ -30,4 +50,40 @@ class ConfigTestCase(CraftBeerPiTestCase):
 
     async def test_get_default(self):
         value = self.cbpi.config.get("HELLO_WORLD", "DefaultValue")
-        assert value == "DefaultValue"
\ No newline at end of file
+        assert value == "DefaultValue"
+    async def test_snapshot(self):
+        settings = self.cbpi.config.snapshot(steps_boil_temp=0, steps_cooldown_temp=0.0, HELLO_WORLD="DefaultValue")
+        assert settings.steps_boil_temp == 99
+        assert settings.HELLO_WORLD == "DefaultValue"
+
+        changes = []
+        self.cbpi.config.subscribe("steps_cooldown_temp", lambda name, value: changes.append((name, value)))
+        await self.cbpi.config.set("steps_cooldown_temp", "25.5")
+        assert settings.steps_cooldown_temp == 25.5
+        assert changes == [("steps_cooldown_temp", "25.5")]
+
+        await self.cbpi.config.set("steps_boil_temp", "invalid")
+        assert settings.steps_boil_temp == 0
+
+        await self.cbpi.config.add("TEST_FLAG", "No", ConfigType.SELECT, "Test flag", [{"label": "Yes", "value": "Yes"}, {"label": "No", "value": "No"}])
+        flags = self.cbpi.config.snapshot(TEST_FLAG=True)
+        assert flags.TEST_FLAG is False
+        for value, expected in (("No", False), ("Yes", True), ("false", False), (False, False), (True, True)):
+            await self.cbpi.config.set("TEST_FLAG", value)
+            assert flags.TEST_FLAG is expected
+
+    async def test_defaults_batch(self):
+        self.cbpi.persistence.mark_dirty = MagicMock()
+        for i in range(10):
+            self.cbpi.config.ensure("TEST_DEFAULT_%s" % i, i, ConfigType.NUMBER, "Test default")
+        self.cbpi.config.ensure("steps_boil_temp", 50, ConfigType.NUMBER, "Default Boil Temperature for Recipe Creation")
+        await self.cbpi.config.apply_defaults()
+
+        assert self.cbpi.persistence.mark_dirty.call_count == 1
+        assert self.cbpi.config.get("TEST_DEFAULT_9") == 9
+        # existing values are kept
+        assert self.cbpi.config.get("steps_boil_temp") == "99"
+
+        # nothing to add, nothing to write
+        await self.cbpi.config.apply_defaults()
+        assert self.cbpi.persistence.mark_dirty.call_count == 1
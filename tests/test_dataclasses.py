@@ -0,0 +1,121 @@
+import logging
+import timeit
+import unittest
+from unittest.mock import MagicMock
+
+from cbpi.api.dataclasses import Actor, Fermenter, FermenterStep, Props
+from cbpi.api.step import StepState
+
+logger = logging.getLogger(__name__)
+
+
+class CachedDictTest(unittest.TestCase):
+
+    def test_props(self):
+        props = Props({"Topic": "a", "Interval": 5})
+        data = props.to_dict()
+        assert props.to_dict() is data
+
+        props.Topic = "b"
+        assert props.to_dict() == {"Topic": "b", "Interval": 5}
+        props["Interval"] = 10
+        assert props.to_dict()["Interval"] == 10
+        props |= {"Interval": 15}
+        assert isinstance(props, Props)
+        assert props.to_dict()["Interval"] == 15
+
+        # nested props are not cached
+        props.Nested = Props({"x": 1})
+        assert props.to_dict()["Nested"] == {"x": 1}
+        props.Nested.x = 2
+        assert props.to_dict()["Nested"] == {"x": 2}
+
+    def test_actor(self):
+        instance = MagicMock()
+        instance.get_state = lambda: dict(state=instance.state)
+        instance.state = False
+        actor = Actor(id="1", name="Heater", props=Props({"GPIO": 5}), type="GPIOActor", instance=instance)
+
+        data = actor.to_dict()
+        assert actor.to_dict() is data
+
+        instance.state = True
+        assert actor.to_dict()["state"] == dict(state=True)
+        actor.power = 50
+        assert actor.to_dict()["power"] == 50
+        actor.props.GPIO = 6
+        assert actor.to_dict()["props"] == {"GPIO": 6}
+
+    def test_fermenter(self):
+        fermenter = Fermenter(id="1", name="Fermenter", props=Props({}))
+        step = FermenterStep(id="s1", name="Step", fermenter=fermenter, props=Props({"Temp": 20}))
+        fermenter.steps.append(step)
+
+        data = fermenter.to_dict()
+        assert fermenter.to_dict() is data
+
+        step.status = StepState.ACTIVE
+        assert fermenter.to_dict()["steps"][0]["status"] == "A"
+        fermenter.target_temp = 18
+        assert fermenter.to_dict()["target_temp"] == 18
+        fermenter.steps.append(FermenterStep(id="s2", name="Step 2", fermenter=fermenter, props=Props({})))
+        assert len(fermenter.to_dict()["steps"]) == 2
+
+
+class PropsTest(unittest.TestCase):
+
+    def test_access(self):
+        props = Props({"Topic": "a", "Empty": "", "Offset": "0.5", "Timer": "60"})
+        assert props.Topic == "a"
+        assert props["Topic"] == "a"
+        assert props.Missing is None
+        assert props.get("Empty", 1) == 1
+        assert "Topic" in props
+
+        assert props.float("Offset", 0) == 0.5
+        assert props.int("Timer", 0) == 60
+        assert props.int("Offset", 0) == 0
+        assert props.float("Topic", 1) == 1
+        assert props.float("Missing", 2) == 2
+
+        props.Offset = 1.5
+        assert props.float("Offset", 0) == 1.5
+        props["Timer"] = "90"
+        assert props.int("Timer", 0) == 90
+        props.update(Timer=30.7, Offset="x")
+        assert props.int("Timer", 0) == 30
+        assert props.float("Offset", 0) == 0
+
+        # props named like a method are read by key, the methods keep working
+        with self.assertLogs(level="WARNING"):
+            props = Props({"values": "1,2", "float": "x", "Temp": 20})
+        assert props["values"] == "1,2"
+        assert props.get("float") == "x"
+        assert callable(props.values)
+        assert props.float("Temp", 0) == 20.0
+
+    def test_slots(self):
+        actor = Actor(id="1")
+        assert hasattr(actor, "__dict__") is False
+        # no shared default props
+        assert Actor().props is not Actor().props
+
+    def test_benchmark(self):
+        props = Props({"GPIO": 5, "Inverted": "No", "OffsetOn": "0.5", "OffsetOff": "0.2"})
+        number = 100000
+        results = dict(
+            attribute=timeit.timeit(lambda: props.GPIO, number=number),
+            get=timeit.timeit(lambda: props.get("Inverted", "No"), number=number),
+            float=timeit.timeit(lambda: props.float("OffsetOn", 0), number=number))
+
+        instance = MagicMock()
+        instance.get_state = lambda: dict(state=False)
+        actors = [Actor(id=str(i), name="Actor %s" % i, props=Props({"GPIO": i, "Inverted": "No"}), instance=instance) for i in range(30)]
+        results["to_dict_30_actors"] = timeit.timeit(lambda: [actor.to_dict() for actor in actors], number=1000) * number / 1000
+
+        for name, duration in results.items():
+            logger.info("Props benchmark: %s %.3fus" % (name, duration * 1000000 / number))
+
+
+if __name__ == '__main__':
+    unittest.main()
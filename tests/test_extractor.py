@@ -0,0 +1,34 @@
+import unittest
+
+from cbpi.api.extractor import PayloadExtractor
+
+
+class PayloadExtractorTest(unittest.TestCase):
+
+    def test_raw_payload(self):
+        extractor = PayloadExtractor()
+        assert extractor.extract("21.5") == 21.5
+        assert extractor.extract(b"-3") == -3.0
+        assert extractor.extract('"18.2"') == 18.2
+        assert extractor.extract("ON") is None
+
+    def test_path(self):
+        payload = '{"Time": "2023-01-01T10:00:00", "StatusSNS": {"DS18B20": [{"Id": "01", "Temperature": 19.4}, {"Id": "02", "Temperature": "20.1"}]}, "values": [1, 2, 3]}'
+        assert PayloadExtractor("StatusSNS.DS18B20[0].Temperature").extract(payload) == 19.4
+        assert PayloadExtractor("$.StatusSNS.DS18B20.1.Temperature").extract(payload) == 20.1
+        assert PayloadExtractor("values[2]").extract(payload) == 3.0
+        assert PayloadExtractor("['StatusSNS']['DS18B20'][0]['Id']").extract(payload) == 1.0
+        assert PayloadExtractor("StatusSNS.DS18B20[5].Temperature").extract(payload) is None
+        assert PayloadExtractor("Time").extract(payload) is None
+        assert PayloadExtractor("missing.key").extract(payload) is None
+        assert PayloadExtractor("values").extract("invalid json") is None
+
+    def test_compile(self):
+        assert PayloadExtractor.compile("a.b[1]['c.d']") == ("a", "b", 1, "c.d")
+        assert PayloadExtractor.compile("a.0") == ("a", ("0", 0))
+        with self.assertRaises(ValueError):
+            PayloadExtractor.compile("a[b")
+
+
+if __name__ == '__main__':
+    unittest.main()
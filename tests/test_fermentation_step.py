@@ -0,0 +1,56 @@
+import asyncio
+import unittest
+
+from aiohttp.test_utils import unittest_run_loop
+from cbpi.api.dataclasses import Fermenter, Sensor
+from cbpi.api.step import StepResult, StepState
+from cbpi.extension.FermentationStep import ramp_schedule
+from tests.cbpi_config_fixture import CraftBeerPiTestCase
+
+
+class RampScheduleTest(unittest.TestCase):
+
+    def test_matches_per_second_target(self):
+        for start, target, rate in ((20.03, 18, 1), (12, 14.5, 0.7), (4.96, 5.2, 3)):
+            schedule = ramp_schedule(start, target, rate)
+            ratesecond = (target - start) / (abs(target - start) / rate * 86400)
+            times = [seconds for seconds, temp in schedule]
+            assert times == sorted(times)
+            assert schedule[-1][1] == round(target * 10) / 10
+            # between two breakpoints the rounded target of the old per second calculation doesn't change
+            for (seconds, temp), (next_seconds, next_temp) in zip(schedule, schedule[1:]):
+                for t in range(int(seconds) + 2, int(next_seconds)):
+                    assert round((start + t * ratesecond) * 10) / 10 == temp
+            # 1° per day are ten wakeups instead of 86400
+            assert len(schedule) == abs(round(target * 10) - round(start * 10)) + 1
+
+    def test_no_ramp(self):
+        assert ramp_schedule(12, 12, 1) == [(0, 12.0)]
+        assert ramp_schedule(12, 14, 0) == [(0, 14.0)]
+
+
+class RampStepTest(CraftBeerPiTestCase):
+
+    @unittest_run_loop
+    async def test_ramp_ends_with_timer(self):
+        sensor = await self.cbpi.sensor.add(Sensor(name="Ramp", type="CustomSensor"))
+        await self.cbpi.sensor.stop(sensor.id)
+        self.cbpi.sensor.set_reading(sensor.id, 20.0)
+        fermenter = await self.cbpi.fermenter.create(Fermenter(name="Ramp", sensor=sensor.id))
+        step = self.cbpi.fermenter.create_step(fermenter.id, dict(name="Ramp", type="FermenterRampTempStep", endtime=0,
+                                               props=dict(Temp=21, RampRate=1, Sensor=sensor.id, AutoMode="No")))
+        fermenter.steps.append(step)
+        try:
+            await self.cbpi.fermenter.start(fermenter.id)
+            await asyncio.sleep(0.2)
+            assert step.instance.task.done() is False
+            assert fermenter.target_temp == 20.0
+
+            # the 1 second timer starts once the sensor reaches the target and ends the step
+            self.cbpi.sensor.set_reading(sensor.id, 21.0)
+            assert await asyncio.wait_for(step.instance.task, 5) == StepResult.NEXT
+            assert step.status == StepState.DONE
+            assert step.instance.finished.is_set()
+        finally:
+            await self.cbpi.fermenter.delete(fermenter.id)
+            await self.cbpi.sensor.delete(sensor.id)
@@ -0,0 +1,77 @@
+import asyncio
+
+from aiohttp.test_utils import unittest_run_loop
+from cbpi.api.dataclasses import Props, Sensor
+from tests.cbpi_config_fixture import CraftBeerPiTestCase
+
+
+class HTTPSensorTestCase(CraftBeerPiTestCase):
+
+    async def get_application(self):
+        # sensors added by the test, deleted again so they don't end up in the test config
+        self.sensors = []
+        return await super().get_application()
+
+    async def add_sensor(self, key):
+        sensor = await self.cbpi.sensor.add(Sensor(name="HTTP {}".format(key), type="HTTPSensor", props=Props({"Key": key, "Timeout": 0})))
+        self.sensors.append(sensor)
+        sensor.instance.log_data = lambda value: None
+        return sensor
+
+    async def delete_sensors(self):
+        for sensor in self.sensors:
+            await self.cbpi.sensor.delete(sensor.id)
+
+    @unittest_run_loop
+    async def test_value(self):
+        try:
+            sensor = await self.add_sensor("single")
+            resp = await self.client.get(path="/httpsensor/single/21.5")
+            assert resp.status == 204
+            # passed to the sensor without polling
+            assert sensor.instance.value == 21.5
+            assert self.cbpi.sensor.get_reading(sensor.id).value == 21.5
+
+            resp = await self.client.get(path="/httpsensor/single/abc$")
+            assert resp.status == 422
+        finally:
+            await self.delete_sensors()
+
+    @unittest_run_loop
+    async def test_batch(self):
+        try:
+            first = await self.add_sensor("first")
+            second = await self.add_sensor("second")
+            data = [dict(key="first", value=20, timestamp=1000),
+                    dict(key="first", value=19, timestamp=900),
+                    dict(key="second", value=1.05),
+                    dict(key="second", value=1.04),
+                    dict(key="other", value=3)]
+            resp = await self.client.post(path="/httpsensor/batch", json=data)
+            assert resp.status == 200
+            result = await resp.json()
+            assert result == dict(accepted=5, unknown=["other"])
+            # the newest value wins
+            assert first.instance.value == 20
+            assert second.instance.value == 1.04
+
+            # older than the last value
+            resp = await self.client.post(path="/httpsensor/batch", json=[dict(key="first", value=18, timestamp=950)])
+            assert first.instance.value == 20
+
+            resp = await self.client.post(path="/httpsensor/batch", json=[dict(key="first")])
+            assert resp.status == 422
+        finally:
+            await self.delete_sensors()
+
+    @unittest_run_loop
+    async def test_stop(self):
+        try:
+            sensor = await self.add_sensor("stop")
+            task = sensor.instance.task
+            await self.cbpi.sensor.stop(sensor.id)
+            await asyncio.wait_for(task, timeout=1)
+            resp = await self.client.get(path="/httpsensor/stop/30")
+            assert sensor.instance.value == 0
+        finally:
+            await self.delete_sensors()
@@ -0,0 +1,149 @@
+import asyncio
+import logging
+import os
+import shutil
+import tempfile
+import time
+
+import yaml
+from cbpi.api.dataclasses import Actor, Props, Sensor
+from cbpi.configFolder import ConfigFolder
+from cbpi.craftbeerpi import CraftBeerPi
+from tests.cbpi_config_fixture import CraftBeerPiTestCase
+from tests.mqtt_broker_fixture import MQTTBroker
+
+logger = logging.getLogger(__name__)
+
+
+class CraftBeerPiMqttTestCase(CraftBeerPiTestCase):
+    '''
+    CraftBeerPi with mqtt enabled, connected to an in-process broker stand-in.
+    The test config is copied to a temp folder so that it stays untouched.
+    '''
+
+    async def get_application(self):
+        self.broker = await MQTTBroker().start()
+        self.temp_folder = tempfile.mkdtemp()
+        self.config_folder = self.configuration()
+        self.cbpi = CraftBeerPi(self.config_folder)
+        await self.cbpi.init_serivces()
+        return self.cbpi.app
+
+    def configuration(self):
+        test_directory = os.path.dirname(__file__)
+        config_directory = os.path.join(self.temp_folder, 'config')
+        logs_directory = os.path.join(self.temp_folder, 'logs')
+        shutil.copytree(os.path.join(test_directory, 'cbpi-test-config'), config_directory)
+        os.makedirs(logs_directory)
+
+        path = os.path.join(config_directory, 'config.yaml')
+        with open(path) as file:
+            static_config = yaml.safe_load(file)
+        static_config.update(mqtt=True, mqtt_host=self.broker.host, mqtt_port=self.broker.port,
+                             mqtt_reconnect_delay=0.5, mqtt_publish_interval=0.1)
+        with open(path, "w") as file:
+            yaml.dump(static_config, file)
+        return ConfigFolder(config_directory, logs_directory)
+
+    async def tearDownAsync(self):
+        await self.broker.stop()
+        shutil.rmtree(self.temp_folder, ignore_errors=True)
+
+    async def wait_until(self, condition, timeout=10):
+        start = time.perf_counter()
+        while condition() is False:
+            if time.perf_counter() - start > timeout:
+                raise asyncio.TimeoutError()
+            await asyncio.sleep(0.001)
+        return time.perf_counter() - start
+
+    async def wait_connected(self):
+        await self.wait_until(lambda: self.cbpi.satellite.connected is True)
+
+
+class MqttTestCase(CraftBeerPiMqttTestCase):
+
+    async def add_mqtt_sensor(self, topic):
+        sensor = Sensor(name="MQTT {}".format(topic), type="MQTTSensor", props=Props({"Topic": topic, "Timeout": 0}))
+        sensor = await self.cbpi.sensor.add(sensor)
+        await self.wait_until(lambda: sensor.instance.mqtt_subscription.topic in self.cbpi.satellite.topic_tree.topics())
+        return sensor
+
+    async def test_sensor_throughput(self):
+        await self.wait_connected()
+        sensor = await self.add_mqtt_sensor("bench/sensor")
+        subscription = sensor.instance.mqtt_subscription
+        # the subscription is sent to the broker before messages are published
+        await asyncio.sleep(0.1)
+
+        count = 500
+        start = time.perf_counter()
+        for i in range(count):
+            self.broker.publish("bench/sensor", str(20 + i % 10))
+        await self.wait_until(lambda: subscription.messages >= count)
+        duration = time.perf_counter() - start
+
+        logger.info("MQTT benchmark: sensor chain %.0f messages/s (%d messages in %.3fs)" % (count / duration, count, duration))
+        assert subscription.messages == count
+        assert subscription.errors == 0
+        assert self.cbpi.sensor.get_sensor_value(sensor.id).get("value") == float(20 + (count - 1) % 10)
+
+    async def test_invalid_payload_path(self):
+        await self.wait_connected()
+        sensor = await self.cbpi.sensor.add(Sensor(name="MQTT invalid", type="MQTTSensor", props=Props({"Topic": "bench/invalid", "PayloadDictionary": "a[b", "Timeout": 0})))
+        # the sensor is created and falls back to the raw payload
+        assert sensor.instance is not None
+        assert sensor.instance.extractor.extract("21.5") == 21.5
+
+    async def test_actor_command_latency(self):
+        await self.wait_connected()
+        actor = self.cbpi.actor.find_by_id("3CUJte4bkxDMFCtLX8eqsX")
+        latencies = []
+        for i in range(10):
+            self.broker.publish("cbpi/actor/{}/on".format(actor.id), "")
+            latencies.append(await self.wait_until(lambda: actor.instance.state is True))
+            self.broker.publish("cbpi/actor/{}/off".format(actor.id), "")
+            latencies.append(await self.wait_until(lambda: actor.instance.state is False))
+
+        # every command arrived (wait_until raises otherwise), the latency is only logged
+        logger.info("MQTT benchmark: actor command latency avg %.1fms max %.1fms" % (1000 * sum(latencies) / len(latencies), 1000 * max(latencies)))
+        assert len(latencies) == 20
+
+        # the state change is published back to the broker
+        update = self.broker.wait_for("cbpi/actorupdate/{}".format(actor.id))
+        self.broker.publish("cbpi/actor/{}/on".format(actor.id), "")
+        topic, payload = await asyncio.wait_for(update, timeout=5)
+        assert b'"state": true' in payload
+
+    async def test_mqtt_actor(self):
+        await self.wait_connected()
+        actor = await self.cbpi.actor.add(Actor(name="MQTT Actor", type="MQTTActor", props=Props({"Topic": "bench/actor"})))
+        # on_start switches the actor off
+        topic, payload = await asyncio.wait_for(self.broker.wait_for("bench/actor"), timeout=5)
+        assert payload == b'{"state": "off", "power": 0}'
+
+        command = self.broker.wait_for("bench/actor")
+        await self.cbpi.actor.on(actor.id, 50)
+        topic, payload = await asyncio.wait_for(command, timeout=5)
+        assert payload == b'{"state": "on", "power": 50}'
+        assert self.broker.retained["bench/actor"] == payload
+
+    async def test_reconnect_recovery(self):
+        await self.wait_connected()
+        sensor = await self.add_mqtt_sensor("bench/reconnect")
+        subscription = sensor.instance.mqtt_subscription
+
+        start = time.perf_counter()
+        self.broker.disconnect_all()
+        await self.wait_until(lambda: self.cbpi.satellite.connected is False)
+        await self.wait_connected()
+
+        # subscriptions are restored after the reconnect
+        while subscription.messages == 0:
+            self.broker.publish("bench/reconnect", "42")
+            await asyncio.sleep(0.01)
+            assert time.perf_counter() - start < 10
+        duration = time.perf_counter() - start
+
+        logger.info("MQTT benchmark: reconnect recovery %.3fs (reconnect delay %.1fs)" % (duration, self.cbpi.satellite.reconnect_delay))
+        assert sensor.instance.value == 42
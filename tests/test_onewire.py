@@ -0,0 +1,89 @@
+import asyncio
+import os
+import tempfile
+import unittest
+
+from cbpi.api.clock import VirtualClock
+from cbpi.extension.onewire.bus import OneWireBus
+
+W1_SLAVE = "72 01 4b 46 7f ff 0e 10 57 : crc=57 {}\n72 01 4b 46 7f ff 0e 10 57 t={}\n"
+
+
+class OneWireBusTest(unittest.TestCase):
+    '''
+    The bus reads from a sysfs stand-in folder
+    '''
+
+    def setUp(self):
+        self.folder = tempfile.TemporaryDirectory()
+        self.path = self.folder.name
+        self.write("28-000000000001", "YES", 21500)
+        self.write("28-000000000002", "YES", 65125)
+        os.makedirs(os.path.join(self.path, "w1_bus_master1"))
+        with open(os.path.join(self.path, "w1_bus_master1", "therm_bulk_read"), "w") as file:
+            file.write("0\n")
+
+    def tearDown(self):
+        self.folder.cleanup()
+
+    def write(self, device, crc, value):
+        os.makedirs(os.path.join(self.path, device), exist_ok=True)
+        with open(os.path.join(self.path, device, "w1_slave"), "w") as file:
+            file.write(W1_SLAVE.format(crc, value))
+
+    def test_devices(self):
+        assert OneWireBus(self.path).devices() == ["28-000000000001", "28-000000000002"]
+        assert OneWireBus.parse(W1_SLAVE.format("NO", 21500)) is None
+
+    def test_intervals(self):
+        bus = OneWireBus(self.path)
+        results = {"fast": [], "slow": []}
+
+        async def run():
+            bus.subscribe("28-000000000001", 0.05, lambda value, timestamp: results["fast"].append(value))
+            bus.subscribe("28-000000000002", 0.2, lambda value, timestamp: results["slow"].append(value))
+            await asyncio.sleep(0.5)
+            await bus.close()
+
+        asyncio.run(run())
+        assert results["fast"][0] == 21.5
+        assert results["slow"][0] == 65.125
+        assert len(results["fast"]) > len(results["slow"]) >= 2
+        # both probes were due on the first read
+        assert bus.bulk_reads >= 1
+        with open(os.path.join(self.path, "w1_bus_master1", "therm_bulk_read")) as file:
+            assert file.read() == "trigger\n"
+        assert bus.values["28-000000000002"][0] == 65.125
+
+    def test_cancel(self):
+        bus = OneWireBus(self.path)
+        results = []
+
+        async def run():
+            subscription = bus.subscribe("28-000000000001", 0.05, lambda value, timestamp: results.append(value))
+            await asyncio.sleep(0.02)
+            subscription.cancel()
+            await asyncio.sleep(0.1)
+            task = bus.task
+            await bus.close()
+            return task
+
+        assert asyncio.run(run()) is None
+        assert len(results) == 1
+
+    def test_clock(self):
+        results = []
+
+        async def run():
+            clock = VirtualClock(start=0)
+            bus = OneWireBus(self.path, clock=clock)
+            bus.subscribe("28-000000000001", 60, lambda value, timestamp: results.append(timestamp))
+            await asyncio.sleep(0.1)
+            # the intervals run in the time of the clock
+            for i in range(2):
+                await clock.advance(60)
+                await asyncio.sleep(0.1)
+            await bus.close()
+
+        asyncio.run(run())
+        assert results == [0, 60, 120]
@@ -0,0 +1,61 @@
+import asyncio
+import json
+import os
+import tempfile
+import unittest
+from unittest.mock import MagicMock
+
+from cbpi.controller.persistence_controller import PersistenceController
+
+
+class PersistenceTest(unittest.TestCase):
+
+    def create(self, interval=0.05):
+        cbpi = MagicMock()
+        cbpi.static_config = dict(persistence_interval=interval)
+        return PersistenceController(cbpi)
+
+    def test_coalescing(self):
+
+        async def run(folder):
+            persistence = self.create()
+            path = os.path.join(folder, "actor.json")
+            data = dict(data=[])
+            for i in range(100):
+                data["data"].append(i)
+                persistence.mark_dirty(path, lambda: data)
+            assert persistence.pending(path) == data
+            assert os.path.exists(path) is False
+
+            await asyncio.sleep(0.2)
+            assert persistence.writes == 1
+            assert persistence.pending(path) is None
+            with open(path) as file:
+                assert json.load(file) == data
+            # no temp files are left behind
+            assert os.listdir(folder) == ["actor.json"]
+
+        with tempfile.TemporaryDirectory() as folder:
+            asyncio.run(run(folder))
+
+    def test_shutdown(self):
+
+        async def run(folder):
+            persistence = self.create(interval=60)
+            path = os.path.join(folder, "config.json")
+            persistence.mark_dirty(path, lambda: dict(value=1))
+            await persistence.shutdown()
+            with open(path) as file:
+                assert json.load(file) == dict(value=1)
+
+            # writes after shutdown are not delayed
+            persistence.mark_dirty(path, lambda: dict(value=2))
+            with open(path) as file:
+                assert json.load(file) == dict(value=2)
+
+        with tempfile.TemporaryDirectory() as folder:
+            asyncio.run(run(folder))
+
+
+if __name__ == '__main__':
+    unittest.main()
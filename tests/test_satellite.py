@@ -0,0 +1,190 @@
+import asyncio
+import os
+import tempfile
+import unittest
+from unittest.mock import AsyncMock, MagicMock
+
+from cbpi.controller.satellite_controller import OutboundQueue, SatelliteController, TopicTree
+
+
+class TopicTreeTest(unittest.TestCase):
+
+    async def on_message(self, message):
+        pass
+
+    async def on_other(self, message):
+        pass
+
+    def test_match(self):
+        tree = TopicTree()
+        tree.add("cbpi/actor/+/on", self.on_message)
+        tree.add("cbpi/updateactor", self.on_other)
+        tree.add("tele/#", self.on_other)
+
+        assert tree.match("cbpi/actor/abc/on") == [self.on_message]
+        assert tree.match("cbpi/actor/abc/off") == []
+        assert tree.match("cbpi/updateactor") == [self.on_other]
+        assert tree.match("tele") == [self.on_other]
+        assert tree.match("tele/sonoff/SENSOR") == [self.on_other]
+        assert tree.match("stat/sonoff/POWER") == []
+
+    def test_system_topics(self):
+        tree = TopicTree()
+        tree.add("#", self.on_message)
+        tree.add("$SYS/broker/uptime", self.on_other)
+
+        assert tree.match("$SYS/broker/uptime") == [self.on_other]
+        assert tree.match("cbpi/sensordata/1") == [self.on_message]
+
+    def test_remove(self):
+        tree = TopicTree()
+        tree.add("sensor/+/temp", self.on_message)
+        tree.add("sensor/+/temp", self.on_other)
+        assert tree.topics() == ["sensor/+/temp"]
+
+        tree.remove("sensor/+/temp", self.on_message)
+        assert tree.match("sensor/1/temp") == [self.on_other]
+
+        tree.remove("sensor/+/temp", self.on_other)
+        assert tree.match("sensor/1/temp") == []
+        assert tree.topics() == []
+
+
+class SubscriptionTest(unittest.TestCase):
+
+    def test_shared_router(self):
+        received = []
+
+        async def on_message(payload):
+            received.append(payload)
+
+        async def run():
+            satellite = SatelliteController(MagicMock())
+            sub1 = satellite.subcribe("tele/+/SENSOR", on_message)
+            sub2 = satellite.subcribe("tele/+/SENSOR", on_message)
+            assert satellite.topic_tree.topics().count("tele/+/SENSOR") == 1
+
+            message = MagicMock()
+            message.payload = b"21.5"
+            for method in satellite.topic_tree.match("tele/probe/SENSOR"):
+                await method(message)
+
+            assert received == ["21.5", "21.5"]
+            assert sub1.to_dict()["messages"] == 1
+
+            sub1.cancel()
+            await sub1
+            assert sub1.done() is True
+            assert satellite.topic_tree.match("tele/probe/SENSOR") == [sub2]
+
+            sub2.cancel()
+            assert "tele/+/SENSOR" not in satellite.topic_tree.topics()
+            assert satellite.get_subscription_stats() == []
+
+        asyncio.run(run())
+
+
+class PublisherTest(unittest.TestCase):
+
+    def test_coalescing(self):
+
+        async def run():
+            cbpi = MagicMock()
+            cbpi.static_config = dict(mqtt_qos=dict(sensordata=0))
+            satellite = SatelliteController(cbpi)
+            satellite.client = MagicMock()
+            satellite.client.publish = AsyncMock()
+            satellite.connected = True
+
+            for value in range(10):
+                satellite.push("cbpi/sensordata/1", dict(id="1", value=value), retain=True)
+            satellite.push("cbpi/notification", dict(title="a"))
+            satellite.push("cbpi/notification", dict(title="b"))
+            await satellite.flush()
+
+            calls = satellite.client.publish.call_args_list
+            assert len(calls) == 3
+            assert calls[0].args[1] == '{"title": "a"}'
+            assert calls[1].args[1] == '{"title": "b"}'
+            assert calls[2].args == ("cbpi/sensordata/1", '{"id": "1", "value": 9}')
+            assert calls[2].kwargs == dict(qos=0, retain=True)
+
+            # unchanged retained state is not published again
+            satellite.push("cbpi/sensordata/1", dict(id="1", value=9), retain=True)
+            await satellite.flush()
+            assert len(satellite.client.publish.call_args_list) == 3
+
+            # a failed publish doesn't count as held by the broker
+            satellite.client.publish.side_effect = [Exception("lost"), None]
+            for attempt in range(2):
+                satellite.push("cbpi/sensordata/1", dict(id="1", value=10), retain=True)
+                await satellite.flush()
+            assert len(satellite.client.publish.call_args_list) == 5
+            assert satellite.retained["cbpi/sensordata/1"] == '{"id": "1", "value": 10}'
+
+        asyncio.run(run())
+
+
+class OutboundQueueTest(unittest.TestCase):
+
+    def test_persistence(self):
+        with tempfile.TemporaryDirectory() as folder:
+            path = os.path.join(folder, "mqtt_queue.json")
+            queue = OutboundQueue(path, maxsize=3)
+            queue._load()
+            queue.append("cbpi/notification", "a")
+            queue.append("cbpi/actorupdate/1", "on", retain=True)
+            queue.append("cbpi/actorupdate/1", "off", retain=True)
+            assert [item["message"] for item in queue] == ["a", "off"]
+
+            # reload after restart
+            queue = OutboundQueue(path, maxsize=3)
+            queue._load()
+            assert [item["message"] for item in queue] == ["a", "off"]
+
+            queue.append("cbpi/notification", "b")
+            queue.append("cbpi/notification", "c")
+            assert [item["message"] for item in queue] == ["off", "b", "c"]
+            assert queue.dropped == 1
+
+            while len(queue) > 0:
+                queue.pop()
+            assert os.path.exists(path) is False
+
+    def test_drain_progress(self):
+        async def run():
+            with tempfile.TemporaryDirectory() as folder:
+                path = os.path.join(folder, "mqtt_queue.json")
+                queue = OutboundQueue(path, maxsize=5)
+                await queue.load()
+                for i in range(5):
+                    queue.append("cbpi/notification", str(i))
+                queue.pop()
+                queue.pop()
+                await queue.flush()
+
+                # restart in the middle of the drain, sent messages are not published again
+                queue = OutboundQueue(path, maxsize=5)
+                await queue.load()
+                assert [item["message"] for item in queue] == ["2", "3", "4"]
+
+                # the acks don't let the file grow without bounds
+                for i in range(20):
+                    queue.append("cbpi/notification", str(i))
+                    queue.pop()
+                await queue.flush()
+                with open(path) as file:
+                    assert len(file.readlines()) < 10
+
+        asyncio.run(run())
+
+    def test_keep_transitions(self):
+        with tempfile.TemporaryDirectory() as folder:
+            queue = OutboundQueue(os.path.join(folder, "mqtt_queue.json"), collapse_retained=False)
+            queue.append("cbpi/actorupdate/1", "on", retain=True)
+            queue.append("cbpi/actorupdate/1", "off", retain=True)
+            assert [item["message"] for item in queue] == ["on", "off"]
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -1,4 +1,9 @@
+import asyncio
+from unittest import mock
+
 from aiohttp.test_utils import unittest_run_loop
+from cbpi.api.base import CBPiBase
+from cbpi.api.dataclasses import Props, Sensor
 from tests.cbpi_config_fixture import CraftBeerPiTestCase
 
 
@@ -35,3 +40,104 @@ class SensorTestCase(CraftBeerPiTestCase):
         # # Delete Sensor
         resp = await self.client.delete(path="/sensor/%s" % sensor_id)
         assert resp.status == 204
+
+    @unittest_run_loop
+    async def test_scheduler(self):
+        pushed = []
+        sensors = []
+        clazz = self.cbpi.sensor.types["CustomSensor"]["class"]
+        try:
+            for i in range(4):
+                with mock.patch.object(clazz, "sampling_interval", 0.1):
+                    sensor = await self.cbpi.sensor.add(Sensor(name="Scheduled {}".format(i), type="CustomSensor"))
+                sensors.append(sensor)
+                sensor.instance.log_data = lambda value: None
+                sensor.instance.push_update = lambda value, sensor=sensor, **kwargs: pushed.append((sensor.id, value))
+            ids = [sensor.id for sensor in sensors]
+
+            entries = [self.cbpi.sensor.scheduler.entries[id] for id in ids]
+            # same interval, different phases
+            assert len(set(round(entry.deadline, 3) for entry in entries)) == 4
+
+            pushed.clear()
+            with mock.patch.object(self.cbpi.ws, "send_all") as send_all:
+                await asyncio.sleep(0.5)
+            # the states of one tick are broadcast together
+            messages = [message for call in send_all.call_args_list for message in call.args[0] if message["id"] in ids]
+            assert len(messages) == len(pushed)
+            metrics = self.cbpi.sensor.scheduler.metrics()
+            for id in ids:
+                assert metrics[id]["samples"] >= 3
+                assert len([value for sensor_id, value in pushed if sensor_id == id]) >= 3
+
+            # stopped sensors are not sampled anymore
+            await self.cbpi.sensor.stop(sensors[0].id)
+            assert sensors[0].id not in self.cbpi.sensor.scheduler.metrics()
+            assert sensors[0].instance.stopped.is_set()
+            count = len(pushed)
+            await asyncio.sleep(0.25)
+            assert sensors[0].id not in [id for id, value in pushed[count:]]
+        finally:
+            for sensor in sensors:
+                await self.cbpi.sensor.delete(sensor.id)
+
+    @unittest_run_loop
+    async def test_readings(self):
+        clazz = self.cbpi.sensor.types["CustomSensor"]["class"]
+        with mock.patch.object(clazz, "sampling_interval", 0.05):
+            sensor = await self.cbpi.sensor.add(Sensor(name="Reading", type="CustomSensor"))
+        try:
+            sensor.instance.log_data = lambda value: None
+
+            reading = await self.cbpi.sensor.wait_for_fresh(sensor.id, timeout=5)
+            assert reading.quality == "good"
+            assert reading.value == sensor.instance.value
+            assert self.cbpi.sensor.get_reading(sensor.id).age() < 1
+            assert self.cbpi.sensor.get_reading(sensor.id, max_age=0).quality == "stale"
+            assert self.cbpi.sensor.get_reading("unknown").quality == "missing"
+
+            self.cbpi.sensor.staleness_policy = lambda id, reading, max_age: True
+            assert self.cbpi.sensor.get_reading(sensor.id).quality == "stale"
+            self.cbpi.sensor.staleness_policy = None
+
+            # no values after the sensor is stopped
+            await self.cbpi.sensor.stop(sensor.id)
+            with self.assertRaises(asyncio.TimeoutError):
+                await self.cbpi.sensor.wait_for_fresh(sensor.id, timeout=0.2)
+            assert sensor.id not in self.cbpi.sensor.waiters
+
+            # a logic waiting for the silent sensor switches its heater off and warns once
+            logic = CBPiBase()
+            logic.cbpi = self.cbpi
+            with mock.patch.object(self.cbpi.actor, "off", mock.AsyncMock()) as off, mock.patch.object(self.cbpi, "notify") as notify:
+                task = asyncio.create_task(logic.wait_for_sensor(sensor.id, ["heater", None], timeout=0.1))
+                await asyncio.sleep(0.35)
+                assert task.done() is False
+                off.assert_called_with("heater")
+                assert off.call_count >= 2
+                assert notify.call_count == 1
+                await self.cbpi.sensor.start(sensor.id)
+                assert await asyncio.wait_for(task, 5) is not None
+            assert logic.get_good_sensor_value(sensor.id) is not None
+        finally:
+            await self.cbpi.sensor.delete(sensor.id)
+
+    @unittest_run_loop
+    async def test_push_sensor_staleness(self):
+        quiet = await self.cbpi.sensor.add(Sensor(name="Quiet", type="HTTPSensor", props=Props({"Key": "quiet", "Timeout": 0})))
+        timed = await self.cbpi.sensor.add(Sensor(name="Timed", type="HTTPSensor", props=Props({"Key": "timed", "Timeout": 1})))
+        try:
+            self.cbpi.sensor.set_reading(quiet.id, 20)
+            self.cbpi.sensor.set_reading(timed.id, 20)
+            with mock.patch.object(self.cbpi.sensor, "max_age", 0):
+                # no interval known, the value doesn't get stale between two reports
+                assert quiet.instance.expected_interval() is None
+                await asyncio.sleep(0.05)
+                assert self.cbpi.sensor.get_reading(quiet.id).quality == "good"
+                # stale after three timeouts
+                assert self.cbpi.sensor.get_reading(timed.id).quality == "good"
+                with mock.patch.object(timed.instance, "timeout", 0.01):
+                    assert self.cbpi.sensor.get_reading(timed.id).quality == "stale"
+        finally:
+            await self.cbpi.sensor.delete(quiet.id)
+            await self.cbpi.sensor.delete(timed.id)
@@ -0,0 +1,102 @@
+import os
+import tempfile
+import unittest
+
+from aiohttp.test_utils import unittest_run_loop
+from cbpi.api.clock import VirtualClock
+from cbpi.api.dataclasses import Sensor
+from cbpi.controller.sensor_filter import FilterChain
+from tests.cbpi_config_fixture import CraftBeerPiTestCase
+
+VALUES = [20.0, 20.1, 20.2, 85.0, 20.3, 20.2, 20.4, -3.0, 20.5, 20.6, 20.5, 20.7]
+
+
+class FilterChainTest(unittest.TestCase):
+
+    def test_median(self):
+        chain = FilterChain([{"type": "median", "window": 3}])
+        result = [chain.push(value) for value in VALUES]
+        assert max(result) < 21 and min(result) > 19
+
+    def test_hampel(self):
+        chain = FilterChain([{"type": "hampel", "window": 5, "threshold": 3}])
+        result = [chain.push(value) for value in VALUES]
+        assert 85.0 not in result and -3.0 not in result
+        # regular values pass unchanged
+        assert result[-1] == 20.7
+
+    def test_ema_and_rate_limit(self):
+        chain = FilterChain([{"type": "ema", "alpha": 0.5}])
+        assert [chain.push(value) for value in [10, 20, 20]] == [10, 15, 17.5]
+        chain = FilterChain([{"type": "rate_limit", "max_change": 0.5}])
+        assert [chain.push(value, timestamp) for timestamp, value in enumerate([10, 20, 20])] == [10, 10.5, 11]
+
+    def test_reconfigure(self):
+        spec = [{"type": "hampel", "window": 5}, {"type": "median", "window": 3}, {"type": "ema", "alpha": 0.3}]
+        chain = FilterChain([])
+        streamed = FilterChain(spec)
+        for timestamp, value in enumerate(VALUES):
+            chain.push(value, timestamp)
+            expected = streamed.push(value, timestamp)
+        # recomputed from the raw values in one batch
+        assert abs(chain.configure(spec) - expected) < 1e-9
+        assert abs(chain.push(20.8, 20) - streamed.push(20.8, 20)) < 1e-9
+
+    def test_invalid(self):
+        for spec in [{"type": "median"}, [{"type": "unknown"}], [{"type": "median", "size": 3}],
+                     [{"type": "median", "window": 0}], [{"type": "median", "window": -2}], [{"type": "hampel", "threshold": -1}],
+                     [{"type": "ema", "alpha": 0}], [{"type": "ema", "alpha": 1.5}], [{"type": "rate_limit", "max_change": -1}],
+                     [{"type": "median", "window": "abc"}]]:
+            with self.assertRaises(ValueError):
+                FilterChain(spec)
+
+
+class SensorFilterTestCase(CraftBeerPiTestCase):
+
+    @unittest_run_loop
+    async def test_filter(self):
+        folder = tempfile.TemporaryDirectory()
+        self.cbpi.sensor.filter_path = os.path.join(folder.name, "sensor_filter.json")
+        sensor = await self.cbpi.sensor.add(Sensor(name="Filtered", type="HTTPSensor"))
+        try:
+            sensor.instance.log_data = lambda value: None
+
+            resp = await self.client.put(path="/sensor/%s/filter" % sensor.id, json=[{"type": "median", "window": 3}])
+            assert resp.status == 200
+            resp = await self.client.put(path="/sensor/%s/filter" % sensor.id, json=[{"type": "unknown"}])
+            assert resp.status == 422
+            resp = await self.client.put(path="/sensor/%s/filter" % sensor.id, json=[{"type": "median", "window": 0}])
+            assert resp.status == 422
+
+            for value in [20, 21, 90]:
+                sensor.instance.publish(value)
+            assert self.cbpi.sensor.get_reading(sensor.id).value == 21
+            assert self.cbpi.sensor.get_sensor_value(sensor.id)["value"] == 21
+
+            resp = await self.client.get(path="/sensor/%s/filter" % sensor.id)
+            assert await resp.json() == [{"type": "median", "window": 3}]
+            await self.cbpi.persistence.flush(self.cbpi.sensor.filter_path)
+            assert os.path.exists(self.cbpi.sensor.filter_path)
+        finally:
+            await self.cbpi.sensor.delete(sensor.id)
+            await self.cbpi.persistence.flush(self.cbpi.sensor.filter_path)
+            folder.cleanup()
+
+    @unittest_run_loop
+    async def test_filter_clock(self):
+        folder = tempfile.TemporaryDirectory()
+        self.cbpi.sensor.filter_path = os.path.join(folder.name, "sensor_filter.json")
+        sensor = await self.cbpi.sensor.add(Sensor(name="Limited", type="HTTPSensor"))
+        try:
+            sensor.instance.log_data = lambda value: None
+            self.cbpi.clock = VirtualClock()
+            self.cbpi.sensor.set_filter(sensor.id, [{"type": "rate_limit", "max_change": 0.5}])
+
+            # the rate limit uses the time of the cbpi clock
+            assert sensor.instance.publish(20) == 20
+            await self.cbpi.clock.advance(4)
+            assert sensor.instance.publish(30) == 22
+        finally:
+            await self.cbpi.sensor.delete(sensor.id)
+            await self.cbpi.persistence.flush(self.cbpi.sensor.filter_path)
+            folder.cleanup()
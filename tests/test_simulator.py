@@ -0,0 +1,63 @@
+import logging
+import time
+import tracemalloc
+import unittest
+
+from aiohttp.test_utils import unittest_run_loop
+from cbpi.api.dataclasses import Actor, Props, Sensor
+from cbpi.extension.simulator.model import Simulation, ThermalModel
+from tests.cbpi_config_fixture import CraftBeerPiTestCase
+
+logger = logging.getLogger(__name__)
+
+
+class ThermalModelTest(unittest.TestCase):
+
+    def test_model(self):
+        # 2000 W heat 20 l by 86 K per hour without losses
+        model = ThermalModel(temperature=10, volume=20, loss=0, heater_power=2000)
+        assert abs(model.step(3600, heater=1) - (10 + 2000 * 3600 / (20 * 4186))) < 1e-6
+        # the content settles at the ambient temperature
+        model = ThermalModel(temperature=60, ambient=20, loss=5)
+        for i in range(100):
+            model.step(3600)
+        assert abs(model.temperature - 20) < 0.01
+
+    def test_fermentation_profile(self):
+        model = ThermalModel(temperature=20, ambient=22, volume=50, loss=3, heater_power=100, cooler_power=300)
+        simulation = Simulation(model, step=10, hysteresis=0.5)
+        profile = [(4 * 86400, 12), (3 * 86400, 14), (5 * 86400, 18), (2 * 86400, 2)]
+
+        tracemalloc.start()
+        start = time.perf_counter()
+        simulation.run(profile)
+        duration = time.perf_counter() - start
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+
+        logger.info("Simulator benchmark: 14 days in %.2fs, %d steps, %d switches, peak memory %.0fkB" % (duration, simulation.steps, simulation.switches, peak / 1024))
+        assert model.time == 14 * 86400
+        assert simulation.max_deviation < 1
+        assert abs(model.temperature - 2) < 1
+
+
+class SimulatorTestCase(CraftBeerPiTestCase):
+
+    @unittest_run_loop
+    async def test_simulated_sensor(self):
+        heater = await self.cbpi.actor.add(Actor(name="Simulated Heater", type="DummyActor"))
+        sensor = None
+        try:
+            sensor = await self.cbpi.sensor.add(Sensor(name="Simulated", type="SimulatedTemperature",
+                                                       props=Props({"Heater": heater.id, "Speed": 3600, "Loss": 0, "StartTemp": 20})))
+            instance = sensor.instance
+            assert await instance.read() == 20
+
+            await self.cbpi.actor.on(heater.id)
+            instance.last -= 0.01
+            # 2000 W for 36 simulated seconds
+            assert await instance.read() > 20.5
+        finally:
+            if sensor is not None:
+                await self.cbpi.sensor.delete(sensor.id)
+            await self.cbpi.actor.delete(heater.id)
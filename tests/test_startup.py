@@ -0,0 +1,62 @@
+import asyncio
+import sys
+import unittest
+
+from cbpi.utils.startup import ImportProfiler, Startup
+
+
+class StartupTest(unittest.TestCase):
+
+    def test_dependencies(self):
+        events = []
+
+        def task(name, delay):
+            async def run():
+                events.append("start " + name)
+                await asyncio.sleep(delay)
+                events.append("done " + name)
+            return run
+
+        async def run():
+            startup = Startup()
+            startup.add("config", task("config", 0.01))
+            startup.add("sensor", task("sensor", 0.1), depends=["config"])
+            startup.add("actor", task("actor", 0.1), depends=["config"])
+            startup.add("kettle", lambda: events.append("kettle"), depends=["sensor", "actor"])
+            await startup.run()
+            return startup
+
+        startup = asyncio.run(run())
+        assert events.index("done config") < events.index("start sensor")
+        # sensor and actor run concurrently
+        assert events.index("start actor") < events.index("done sensor")
+        assert events[-1] == "kettle"
+        # the measured intervals of independent tasks overlap, dependent tasks start after their dependencies
+        sensor, actor, kettle = (startup.timings[name] for name in ("sensor", "actor", "kettle"))
+        assert actor[0] < sensor[0] + sensor[1] and sensor[0] < actor[0] + actor[1]
+        assert kettle[0] >= max(sensor[0] + sensor[1], actor[0] + actor[1]) - 1e-9
+        assert "kettle" in startup.report()
+
+    def test_invalid(self):
+        startup = Startup()
+        startup.add("a", lambda: None, depends=["b"])
+        startup.add("b", lambda: None, depends=["a"])
+        with self.assertRaises(ValueError):
+            asyncio.run(startup.run())
+
+        startup = Startup()
+        startup.add("a", lambda: None, depends=["missing"])
+        with self.assertRaises(ValueError):
+            asyncio.run(startup.run())
+
+
+    def test_import_profiler(self):
+        sys.modules.pop("wave", None)
+        with ImportProfiler() as profiler:
+            import wave
+        assert "wave" in profiler.timings
+        assert "wave" in profiler.report()
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,68 @@
+import asyncio
+import unittest
+from unittest import mock
+
+from aiohttp.test_utils import unittest_run_loop
+from cbpi.api.dataclasses import Props, Sensor
+from cbpi.extension.virtualsensor.expression import Expression
+from tests.cbpi_config_fixture import CraftBeerPiTestCase
+
+
+class ExpressionTest(unittest.TestCase):
+
+    def test_expression(self):
+        expression = Expression("(sensor('a') + sensor('b')) / 2")
+        assert expression.inputs == {"a", "b"}
+        assert expression.evaluate() is None
+        expression.update("a", 20)
+        expression.update("b", "22")
+        assert expression.evaluate() == 21
+
+    def test_windows(self):
+        expression = Expression("mean('a', 10) + rate('a', 60)")
+        for second, value in enumerate([10, 11, 12, 13]):
+            expression.update("a", value, timestamp=second)
+        assert expression.evaluate() == 11.5 + 60
+        # values older than the window are dropped
+        expression = Expression("mean('a', 2)")
+        for second, value in enumerate([10, 11, 12, 13]):
+            expression.update("a", value, timestamp=second)
+        assert expression.evaluate() == 12
+
+    def test_invalid(self):
+        for source in ["__import__('os')", "sensor('a').real", "sensor(a)", "mean('a')", "open('x')", "1 +", "[1, 2]"]:
+            with self.assertRaises(ValueError):
+                Expression(source)
+        expression = Expression("1 / sensor('a')")
+        expression.update("a", 0)
+        assert expression.evaluate() is None
+
+
+class VirtualSensorTestCase(CraftBeerPiTestCase):
+
+    @unittest_run_loop
+    async def test_virtual_sensor(self):
+        clazz = self.cbpi.sensor.types["VirtualSensor"]["class"]
+        with mock.patch.object(clazz, "log_data"):
+            sensor = await self.cbpi.sensor.add(Sensor(name="Delta", type="VirtualSensor", props=Props({"Expression": "sensor('inlet') - sensor('outlet')"})))
+            try:
+                pushed = []
+                push_update = sensor.instance.push_update
+                sensor.instance.push_update = lambda value: (pushed.append(value), push_update(value, mqtt=False, ws=False))
+
+                self.cbpi.sensor.set_reading("inlet", 65)
+                assert sensor.instance.value is None
+                self.cbpi.sensor.set_reading("outlet", 20.5)
+                assert sensor.instance.value == 44.5
+                # only pushed if the result changed, but the reading is refreshed
+                timestamp = self.cbpi.sensor.get_reading(sensor.id).timestamp
+                await asyncio.sleep(0.01)
+                self.cbpi.sensor.set_reading("outlet", 20.5)
+                assert pushed == [44.5]
+                assert self.cbpi.sensor.get_reading(sensor.id).timestamp > timestamp
+                assert self.cbpi.sensor.get_reading(sensor.id).value == 44.5
+
+                await self.cbpi.sensor.stop(sensor.id)
+                assert sensor.instance.on_input not in self.cbpi.sensor.listeners.get("inlet", [])
+            finally:
+                await self.cbpi.sensor.delete(sensor.id)